@@ -6,9 +6,8 @@ import argparse
 
 from tkinter import messagebox
 
-import datetime
-
 import threading
+import multiprocessing
 
 # import multiprocessing.connection as multi_con
 
@@ -16,12 +15,14 @@ import threading
 # ColorTerminal
 from traceLog import traceLog,LogLevel
 import settings as Sets
-from customTypes import ConnectState
-from views import mainView
+from customTypes import ConnectState, PipelineTopology, LineKind, LineRecord
+from views import mainView, hexView
 
 from workers import readerWorker, processWorker, logWriterWorker, highlightWorker, guiWorker
 
 import comManager
+import timeStamp
+import ioLoop
 
 ################################
 # Version information
@@ -45,7 +46,9 @@ class ConnectController:
 
         self._closeProgram = False
 
-        self._readerWorker = None
+        self._workers = None
+        self._readerWorkers = list()
+        self._connectedReaderInfo = list()
         self._processWorker = None
         self._logWriterWorker = None
         self._highlightWorker = None
@@ -54,7 +57,7 @@ class ConnectController:
         self._appState = ConnectState.DISCONNECTED
 
     def linkWorkers(self,workers):
-        self._readerWorker = workers.readerWorker
+        self._workers = workers
         self._processWorker = workers.processWorker
         self._logWriterWorker = workers.logWriterWorker
         self._highlightWorker = workers.highlightWorker
@@ -62,10 +65,34 @@ class ConnectController:
 
     def connectSerial(self):
 
-        traceLog(LogLevel.INFO,"Connect to serial")
+        ports = self._mainView.controlFrame.getSelectedPorts()
+
+        traceLog(LogLevel.INFO,"Connect to serial: " + ", ".join(ports))
+
+        # One reader per port, all feeding the same process queue
+        self._readerWorkers = list()
+        self._connectedReaderInfo = list()
+        for port in ports:
+            reader = readerWorker.ReaderWorker(self._settings,self._mainView,port)
+            reader.linkConnectController(self)
+            reader.linkWorkers(self._workers)
+            self._readerWorkers.append(reader)
+
+        if self._processWorker:
+            # All arrival timestamps of the connection are converted to wall-clock time with the same anchor
+            self._processWorker.setClockAnchor(timeStamp.ClockAnchor())
+            self._processWorker.setPorts(ports)
+
+        if self._logWriterWorker:
+            self._logWriterWorker.setPorts(ports)
+
+        # Binary ports are shown in their own hex view
+        for reader in self._readerWorkers:
+            if reader.ringBuffer:
+                hexView.HexView(self._settings,self._root,reader.port,reader.ringBuffer)
 
-        if self._readerWorker:
-            self._readerWorker.startWorker()
+        for reader in self._readerWorkers:
+            reader.startWorker()
 
         if self._processWorker:
             self._processWorker.startWorker()
@@ -73,6 +100,14 @@ class ConnectController:
         if self._logWriterWorker:
             self._logWriterWorker.startWorker()
 
+    def readerConnected(self,connectInfo):
+        "Called by each reader when its port is open. Connection is done when all readers are connected"
+
+        self._connectedReaderInfo.append(connectInfo)
+
+        if self._appState == ConnectState.CONNECTING and len(self._connectedReaderInfo) == len(self._readerWorkers):
+            self.changeAppState(ConnectState.CONNECTED,", ".join(self._connectedReaderInfo))
+
 
     def disconnectSerial(self,close=False):
         self._closeProgram = close
@@ -83,8 +118,9 @@ class ConnectController:
     def _disconnectSerialProcess(self):
         traceLog(LogLevel.INFO,"Disconnect from serial")
 
-        # Stop serial reader
-        self._readerWorker.stopWorker()
+        # Stop serial readers
+        for reader in self._readerWorkers:
+            reader.stopWorker()
 
         # Empty process queue and stop process thread
         self._processWorker.stopWorker()
@@ -94,12 +130,13 @@ class ConnectController:
 
         # Add disconnect line if connected
         if self._appState == ConnectState.DISCONNECTING:
-            timestamp = datetime.datetime.now()
-            timeString = Sets.timeStampBracket[0] + timestamp.strftime("%H:%M:%S") + Sets.timeStampBracket[1]
+            disconnectTimestamp = timeStamp.now()
 
-            disconnectLine = timeString + Sets.disconnectLineText + self._logWriterWorker.lastLogFileInfo + "\n"
+            # One disconnect line per log file, so each file name can be used as link
+            for logFileInfo in self._logWriterWorker.lastLogFileInfos:
+                disconnectRecord = LineRecord(LineKind.DISCONNECT,disconnectTimestamp,0,Sets.DISCONNECT_LINE_PAYLOAD + logFileInfo)
 
-            self._highlightWorker.highlightQueue.put(disconnectLine)
+                self._highlightWorker.highlightQueue.put(disconnectRecord)
 
 
         traceLog(LogLevel.INFO,"Main worker threads stopped")
@@ -120,6 +157,10 @@ class ConnectController:
 
     def changeAppState(self,newState:ConnectState,extraInfo=""):
 
+        # With several readers, more than one reader can report an error
+        if newState == ConnectState.DISCONNECTING and self._appState in (ConnectState.DISCONNECTING,ConnectState.DISCONNECTED):
+            return
+
         self._appState = newState
 
         if newState == ConnectState.CONNECTING:
@@ -172,12 +213,26 @@ class TextFrameManager:
 
 class Workers:
 
-    def __init__(self,readerWorker_,processWorker_,logWriterWorker_,highlightWorker_,guiWorker_):
-        self.readerWorker = readerWorker_
+    # Reader workers are created per port by the ConnectController
+    # ioLoop is None when the thread I/O engine is used
+    # topology tells the workers how the stages are connected, it is applied when they are linked
+
+    def __init__(self,processWorker_,logWriterWorker_,highlightWorker_,guiWorker_,ioLoop_=None,topology_=None):
         self.processWorker = processWorker_
         self.logWriterWorker = logWriterWorker_
         self.highlightWorker = highlightWorker_
         self.guiWorker = guiWorker_
+        self.ioLoop = ioLoop_
+        self.topology = topology_ if topology_ else PIPELINE_TOPOLOGIES[Sets.TOPOLOGY_SPLIT]
+
+################################
+# Pipeline topologies (PIPELINE_TOPOLOGY setting)
+
+PIPELINE_TOPOLOGIES = {
+    Sets.TOPOLOGY_SPLIT:    PipelineTopology(fuseHighlight=False, highlightPool=False),
+    Sets.TOPOLOGY_FUSED:    PipelineTopology(fuseHighlight=True,  highlightPool=False),
+    Sets.TOPOLOGY_PROCESS:  PipelineTopology(fuseHighlight=False, highlightPool=True),
+}
 
 
 
@@ -185,6 +240,9 @@ class Workers:
 ################################################################
 ################################################################
 
+# Highlight pool processes of a PyInstaller bundle start here (no effect otherwise)
+multiprocessing.freeze_support()
+
 # Input arguments and stdout control
 
 stdoutFilePath = "CTstdout.txt"
@@ -288,8 +346,18 @@ settingsObj.setOption(Sets.ICON_PATH_FULL,iconPathFull)
 ################################################################
 ################################################################
 
+# I/O engine
+ioLoopObj = None
+if settingsObj.get(Sets.IO_ENGINE) == Sets.IO_ENGINE_ASYNCIO:
+    traceLog(LogLevel.INFO,"Using asyncio I/O engine")
+    ioLoopObj = ioLoop.IoLoop()
+    ioLoopObj.start()
+
+################################################################
+################################################################
+
 # Open message listener
-comManager_ = comManager.ComManager(settingsObj,ctHomeEnvVarFound_,args.logFilePath)
+comManager_ = comManager.ComManager(settingsObj,ctHomeEnvVarFound_,args.logFilePath,ioLoopObj)
 if not comManager_.isListenerRegistered():
     # Application already running, exit
     sys.exit()
@@ -309,13 +377,18 @@ mainViewObj = mainView.MainView(settingsObj,VERSION_,textFrameManagerObj)
 connectControllerObj = ConnectController(settingsObj,mainViewObj)
 
 # Workers
-readerWorkerObj = readerWorker.ReaderWorker(settingsObj,mainViewObj)
+topologyName = settingsObj.get(Sets.PIPELINE_TOPOLOGY)
+if topologyName not in PIPELINE_TOPOLOGIES:
+    traceLog(LogLevel.WARNING,"Unknown pipeline topology %s. Using %s" % (topologyName, Sets.TOPOLOGY_SPLIT))
+    topologyName = Sets.TOPOLOGY_SPLIT
+traceLog(LogLevel.INFO,"Pipeline topology: " + topologyName)
+
 processWorkerObj = processWorker.ProcessWorker(settingsObj)
 logWriterWorkerObj = logWriterWorker.LogWriterWorker(settingsObj,mainViewObj)
 highlightWorkerObj = highlightWorker.HighlightWorker(settingsObj,mainViewObj)
 guiWorkerObj = guiWorker.GuiWorker(settingsObj,mainViewObj)
 # Common class with link to all workers
-workersObj = Workers(readerWorkerObj,processWorkerObj,logWriterWorkerObj,highlightWorkerObj,guiWorkerObj)
+workersObj = Workers(processWorkerObj,logWriterWorkerObj,highlightWorkerObj,guiWorkerObj,ioLoopObj,PIPELINE_TOPOLOGIES[topologyName])
 
 ################################
 # Link modules
@@ -326,9 +399,8 @@ comManager_.linkExternalConnectors(mainViewObj,textFrameManagerObj)
 
 connectControllerObj.linkWorkers(workersObj)
 
-readerWorkerObj.linkConnectController(connectControllerObj)
-readerWorkerObj.linkWorkers(workersObj)
 processWorkerObj.linkWorkers(workersObj)
+logWriterWorkerObj.linkWorkers(workersObj)
 highlightWorkerObj.linkWorkers(workersObj)
 guiWorkerObj.linkWorkers(workersObj)
 
@@ -337,49 +409,6 @@ guiWorkerObj.linkWorkers(workersObj)
 highlightWorkerObj.startWorker()
 guiWorkerObj.startWorker()
 
-# TESTING
-# def down(e):
-#     print("DOWN raw: " + str(e))
-#     print("DOWN: " + e.char)
-#     if e.char == 'n':
-#         addDataToProcessQueue()
-#         pass
-
-# def up(e):
-#     print("UP: " + e.char)
-
-# rootClass_.root.bind('<KeyPress>', down)
-# rootClass_.root.bind('<KeyRelease>', up)
-
-
-
-
-# BULK DATA LOAD FOR DEBUG
-
-# _logFile = r"testing\log_example_small.txt"
-
-# from customTypes import SerialLine
-
-# def addDataToProcessQueue(*args):
-#     with open(_logFile,"r") as file:
-#         lines = file.readlines()
-
-#     print("Debug, lines loaded: " + str(len(lines)))
-
-#     linesToAdd = 3500
-
-#     loops = int(linesToAdd / len(lines))
-
-#     for _ in range(loops):
-#         for line in lines:
-#             timestamp = datetime.datetime.now()
-#             inLine = SerialLine(line,timestamp)
-#             processWorkerObj.processQueue.put(inLine)
-
-#     print("Debug, lines added to view: " + str(loops*len(lines)))
-
-# mainViewObj.root.bind('<Control-n>', addDataToProcessQueue)
-
 
 traceLog(LogLevel.INFO,"Main loop started")
 
@@ -387,9 +416,13 @@ mainViewObj.root.mainloop()
 
 traceLog(LogLevel.INFO,"Main loop done")
 
+highlightWorkerObj.closePool()
+
 ################################
 # Cleanup
 
+if ioLoopObj:
+    ioLoopObj.stop()
 
 if not args.enableConsole:
     sys.stdout.close()
\ No newline at end of file
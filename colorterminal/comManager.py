@@ -1,4 +1,7 @@
+import os
+import socket
 import threading
+import asyncio
 import multiprocessing.connection as multi_con
 import time
 
@@ -7,8 +10,9 @@ from views import fileView
 
 class ComManager:
 
-    def __init__(self,settings,ctHomeEnvVarFound,inputFileName):
+    def __init__(self,settings,ctHomeEnvVarFound,inputFileName,ioLoop=None):
         self._settings = settings
+        self._ioLoop = ioLoop
         self._homeFound = ctHomeEnvVarFound
         self._root = None
 
@@ -24,11 +28,16 @@ class ComManager:
         self._comManagerInitEvent = threading.Event()
         self._externalConnectorsLinkedEvent = threading.Event()
 
-        self._listenerThread = threading.Thread(target=self._listenerProcess,daemon=True,name="ComListener")
-        self._listenerThread.start()
+        self._listenerSocket = None
 
-        # Wait for initial setup to finish (will check if listener is already running)
-        self._comManagerInitEvent.wait()
+        if self._ioLoop:
+            self._registerEventLoopListener()
+        else:
+            self._listenerThread = threading.Thread(target=self._listenerProcess,daemon=True,name="ComListener")
+            self._listenerThread.start()
+
+            # Wait for initial setup to finish (will check if listener is already running)
+            self._comManagerInitEvent.wait()
 
 
     def linkExternalConnectors(self,mainView,textFrameManager):
@@ -37,6 +46,10 @@ class ComManager:
 
         self._externalConnectorsLinkedEvent.set()
 
+        # Connections are accepted once the views are ready
+        if self._listenerSocket:
+            self._ioLoop.runCoroutine(self._listenerCoroutine())
+
     def isListenerRegistered(self):
         return self._listenerRegistered
 
@@ -78,6 +91,66 @@ class ComManager:
 
         self._comManagerInitEvent.set()
 
+    ##############
+    # Event Loop Listener
+    # Used with the asyncio I/O engine. Same protocol as multi_con.Listener, but the socket is owned by the I/O loop
+
+    def _registerEventLoopListener(self):
+
+        listenerSocket = socket.socket(socket.AF_INET,socket.SOCK_STREAM)
+        # Same as multi_con.Listener
+        if os.name == "posix":
+            listenerSocket.setsockopt(socket.SOL_SOCKET,socket.SO_REUSEADDR,1)
+
+        try:
+            listenerSocket.bind(self._address)
+            listenerSocket.listen()
+        except OSError:
+            listenerSocket.close()
+            traceLog(LogLevel.INFO,"ComManager: Socket address already used. Com listener likely already running")
+            self._clientSend(self._filePath)
+            return
+
+        listenerSocket.setblocking(False)
+        self._listenerSocket = listenerSocket
+        self._listenerRegistered = True
+        traceLog(LogLevel.DEBUG,"ComManager: Listener registered")
+
+    async def _listenerCoroutine(self):
+
+        traceLog(LogLevel.DEBUG,"ComManager: Listener started")
+
+        if self._filePath:
+            self._root.after(10,self._openFile,self._filePath)
+
+        loop = asyncio.get_running_loop()
+
+        with self._listenerSocket:
+            while self._listenerFlag:
+                conn, _ = await loop.sock_accept(self._listenerSocket)
+                # Authentication and receive are short blocking calls, so they are done outside the loop
+                loop.run_in_executor(None,self._receiveFromConnection,conn)
+
+    def _receiveFromConnection(self,conn):
+        conn.setblocking(True)
+        connection = multi_con.Connection(conn.detach())
+        try:
+            multi_con.deliver_challenge(connection,self._authKey)
+            multi_con.answer_challenge(connection,self._authKey)
+            msg = connection.recv()
+            self._root.after(10,self._openFile,msg)
+        except EOFError:
+            pass
+        except multi_con.AuthenticationError:
+            traceLog(LogLevel.WARNING,"ComManager: Listener authentication error")
+        except Exception as e:
+            traceLog(LogLevel.ERROR,"ComManager: Listener exception [%s]: %s" % (str(type(e).__name__), str(e)))
+        finally:
+            connection.close()
+
+    ##############
+    # Client
+
     def _clientSend(self,data):
         try:
             client = multi_con.Client(address=self._address,authkey=self._authKey)
@@ -7,12 +7,40 @@ class ConnectState(Enum):
     DISCONNECTED = 4
 
 class SerialLine:
-    def __init__(self, data, timestamp):
+    __slots__ = ("data", "timestamp", "port", "partial")
+    def __init__(self, data, timestamp, port = "", partial = False):
         self.data = data
         self.timestamp = timestamp
+        self.port = port
+        self.partial = partial
 
-class PrintLine:
-    def __init__(self, line, lineTags, updatePreviousLine = False):
-        self.line = line
-        self.lineTags = lineTags
-        self.updatePreviousLine = updatePreviousLine
\ No newline at end of file
+class LineKind:
+    LINE = 0
+    PARTIAL = 1     # Incomplete line. Shown until replaced by the next partial or the completed line
+    CONNECT = 2
+    DISCONNECT = 3
+    HIDDEN = 4      # Number of hidden lines, shown instead of the lines
+    RESET = 5       # Window is cleared, the following lines are shown from the start (filter changed)
+
+class LineRecord:
+    """Line after the process stage. Fields are kept separate through the pipeline, text is only made by the sinks (see lineRenderer).
+    timestamp: Arrival (monotonic ns), delta: Time since previous line (ns)
+    tags: (tagName, start, end) with positions in payload. End None tags the whole line
+    updatePreviousLine: Replace last line in window instead of adding a line"""
+    __slots__ = ("kind", "timestamp", "delta", "payload", "port", "tags", "updatePreviousLine")
+    def __init__(self, kind, timestamp, delta, payload, port = "", tags = None, updatePreviousLine = False):
+        self.kind = kind
+        self.timestamp = timestamp
+        self.delta = delta
+        self.payload = payload
+        self.port = port
+        self.tags = tags
+        self.updatePreviousLine = updatePreviousLine
+
+class PipelineTopology:
+    "How the stages between the process queue and the GUI are run"
+    def __init__(self, fuseHighlight, highlightPool):
+        # Highlight runs in the process thread, there is no queue between the two stages
+        self.fuseHighlight = fuseHighlight
+        # Line color rules are matched in a process pool
+        self.highlightPool = highlightPool
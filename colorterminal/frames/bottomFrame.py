@@ -11,7 +11,7 @@ class BottomFrame:
 
         self._bottomFrame = tk.Frame(self._root)
 
-        self._statLabel1 = tk.Label(self._bottomFrame,text="Lines in window buffer 0/" + str(self._settings.get(Sets.TEXTAREA_MAX_LINE_BUFFER)), width=30, anchor=tk.W)
+        self._statLabel1 = tk.Label(self._bottomFrame,text="Lines in window buffer 0/" + str(self._settings.get(Sets.TEXTAREA_MAX_LINE_BUFFER)), width=45, anchor=tk.W)
         self._statLabel1.pack(side=tk.LEFT)
 
         self._statLabel2 = tk.Label(self._bottomFrame,text="", width=30, anchor=tk.W)
@@ -22,8 +22,11 @@ class BottomFrame:
 
         self._bottomFrame.pack(side=tk.BOTTOM, fill=tk.X)
 
-    def updateWindowBufferLineCount(self,count):
-        self._statLabel1.config(text="Lines in window buffer " + str(count) + "/" + str(self._settings.get(Sets.TEXTAREA_MAX_LINE_BUFFER)))
+    def updateWindowBufferLineCount(self,count,droppedLines=0):
+        text = "Lines in window buffer " + str(count) + "/" + str(self._settings.get(Sets.TEXTAREA_MAX_LINE_BUFFER))
+        if droppedLines > 0:
+            text += " (" + str(droppedLines) + " skipped)"
+        self._statLabel1.config(text=text)
 
     def updateLogFileLineCount(self,count):
         self._statLabel2.config(text="Lines in log file " + str(count))
@@ -9,7 +9,8 @@ from traceLog import traceLog,LogLevel
 import settings as Sets
 from customTypes import ConnectState
 
-from views import optionsView, fileView
+from views import optionsView, fileView, replayView
+import transports
 
 class ControlFrame:
 
@@ -53,8 +54,10 @@ class ControlFrame:
         # reloadBufferButton_ = tk.Button(topFrame_,text="Reload buffer", command=reloadBufferCommand, width=10)
         # reloadBufferButton_.pack(side=tk.LEFT)
 
-        # hideLinesButton_ = tk.Button(topFrame_,text="Hide Lines", command=hideLinesCommand, width=10)
-        # hideLinesButton_.pack(side=tk.LEFT)
+        # Line filter on/off (filter is set in options). Button is sunken while lines are hidden
+        self._hideLinesButton = tk.Button(self._topFrame,text="Hide Lines", command=self._hideLinesCommand, width=10)
+        self._hideLinesButton.pack(side=tk.LEFT)
+        self._updateHideLinesButton(self._settings.get(Sets.FILTER_HIDE_LINES) == Sets.FILTER_ON)
 
         # self._lineWrapToggleButton = tk.Button(self._topFrame,text="Line Wrap", command=self._lineWrapToggleCommmand, width=10)
         # self._lineWrapToggleButton.pack(side=tk.LEFT)
@@ -63,7 +66,10 @@ class ControlFrame:
         self._clearButton.pack(side=tk.LEFT,padx=(0,30))
 
         self._openFileButton = tk.Button(self._topFrame,text="Open File", command=self._openFileCommand, width=8)
-        self._openFileButton.pack(side=tk.LEFT,padx=(0,30))
+        self._openFileButton.pack(side=tk.LEFT)
+
+        self._replayButton = tk.Button(self._topFrame,text="Replay", command=self._replayFileCommand, width=8)
+        self._replayButton.pack(side=tk.LEFT,padx=(0,30))
 
         self._optionsButton = tk.Button(self._topFrame,text="Options", command=self._showOptionsView, width=8)
         self._optionsButton.pack(side=tk.LEFT,padx=(0,30))
@@ -75,6 +81,22 @@ class ControlFrame:
         self._serialPortOption = tk.OptionMenu(self._topFrame,self._serialPortVar,*self._serialPortList)
         self._serialPortOption.pack(side=tk.LEFT)
 
+        self._baudrateVar = tk.StringVar(self._topFrame)
+        self._baudrateOption = tk.OptionMenu(self._topFrame,self._baudrateVar,*Sets.BAUDRATES,command=self._updateBaudrate)
+        self._baudrateOption.pack(side=tk.LEFT)
+
+        # Binary ports are shown in a hex view and captured to a binary log file
+        self._binaryVar = tk.BooleanVar(self._topFrame,False)
+        self._binaryCheckbutton = tk.Checkbutton(self._topFrame,text="Binary",variable=self._binaryVar,command=self._updateDataMode)
+        self._binaryCheckbutton.pack(side=tk.LEFT)
+
+        # Additional ports read at the same time as the selected port
+        self._extraPortVars = dict()
+        self._extraPortsButton = tk.Menubutton(self._topFrame,text="More ports",relief=tk.RAISED,width=12)
+        self._extraPortsMenu = tk.Menu(self._extraPortsButton,tearoff=False)
+        self._extraPortsButton["menu"] = self._extraPortsMenu
+        self._extraPortsButton.pack(side=tk.LEFT)
+
         self._serialPortLabel = tk.Label(self._topFrame,text="", anchor=tk.W)
         self._serialPortLabel.pack(side=tk.LEFT)
 
@@ -120,13 +142,27 @@ class ControlFrame:
     def getSerialPortVar(self):
         return self._serialPortVar.get()
 
+    def getSelectedPorts(self):
+        "Selected port followed by any additional ports"
+        ports = [self._serialPortVar.get()]
+        for port in self._serialPortList:
+            if port != ports[0] and port in self._extraPortVars and self._extraPortVars[port].get():
+                ports.append(port)
+        return ports
+
     def enablePortButtons(self):
         self._serialPortReloadButton.config(state=tk.NORMAL)
         self._serialPortOption.config(state=tk.NORMAL)
+        self._baudrateOption.config(state=tk.NORMAL)
+        self._binaryCheckbutton.config(state=tk.NORMAL)
+        self._extraPortsButton.config(state=tk.NORMAL)
 
     def disablePortButtons(self):
         self._serialPortReloadButton.config(state=tk.DISABLED)
         self._serialPortOption.config(state=tk.DISABLED)
+        self._baudrateOption.config(state=tk.DISABLED)
+        self._binaryCheckbutton.config(state=tk.DISABLED)
+        self._extraPortsButton.config(state=tk.DISABLED)
 
     ##############
     # Internal
@@ -155,13 +191,27 @@ class ControlFrame:
 
         self._textArea.config(state=tk.NORMAL)
         self._textArea.delete(1.0,tk.END)
+        self._textFrame.lineStore.clear()
         self._textArea.config(state=tk.DISABLED)
 
         self._bottomFrame.updateWindowBufferLineCount(0)
 
+        # Cleared lines are not shown again when the filter changes
+        self._highlightWorker.clearHistory()
+
     def _hideLinesCommand(self):
-        self._highlightWorker.toggleHideLines()
-        # self._reloadBufferCommand() # Must be replaced with Elided tags
+        hideLines = self._highlightWorker.toggleHideLines()
+        self._updateHideLinesButton(hideLines)
+        if hideLines:
+            self._settings.setOption(Sets.FILTER_HIDE_LINES,Sets.FILTER_ON)
+        else:
+            self._settings.setOption(Sets.FILTER_HIDE_LINES,Sets.FILTER_OFF)
+
+    def _updateHideLinesButton(self,hideLines):
+        if hideLines:
+            self._hideLinesButton.config(relief=tk.SUNKEN)
+        else:
+            self._hideLinesButton.config(relief=tk.RAISED)
 
     def _lineWrapToggleCommmand(self):
         lineWrapState = self._settings.get(Sets.TEXTAREA_LINE_WRAP)
@@ -180,6 +230,28 @@ class ControlFrame:
         if fileName:
             fileView.FileView(self._settings,self._root,self._textFrameManager,fileName)
 
+    def _replayFileCommand(self,*args):
+
+        if self._connectController.getAppState() != ConnectState.DISCONNECTED:
+            traceLog(LogLevel.WARNING,"Replay only possible when disconnected")
+            return
+
+        fileName = filedialog.askopenfilename(initialdir = os.path.join(self._settings.get(Sets.CT_HOMEPATH_FULL),self._settings.get(Sets.LOG_FILE_PATH)),\
+                                            title = "Select log file to replay",\
+                                            filetypes = (("Log files","*"+Sets.LOG_FILE_TYPE),))
+
+        if fileName:
+            # Replay is connected as any other source, so lines go through the live pipeline
+            source = transports.SOURCE_REPLAY + fileName
+            self._serialPorts[source] = dict()
+            self._serialPorts[source]["description"] = "Replay of " + os.path.basename(fileName)
+            self._serialPorts[source]["available"] = True
+            self._serialPortVar.set(source)
+
+            replayView.ReplayView(self._settings,self._root,fileName)
+
+            self._connectController.changeAppState(ConnectState.CONNECTING)
+
 
     def _showOptionsView(self):
         self._textFrame.closeSearch()
@@ -195,12 +267,18 @@ class ControlFrame:
             serialPortDict[comPort.device] = dict()
             serialPortDict[comPort.device]["description"] = comPort.description
             try:
-                with serial.Serial(comPort.device, 115200, timeout=2):
+                with serial.Serial(comPort.device, self._settings.getPortSettings(comPort.device)[Sets.PORT_BAUDRATE], timeout=2):
                     serialPortDict[comPort.device]["available"] = True
             except serial.SerialException:
                 traceLog(LogLevel.DEBUG,"scanSerialPorts: " + comPort.device + " already open")
                 serialPortDict[comPort.device]["available"] = False
 
+        # Custom sources (network ports, pty, file replay, commands) are always listed as available
+        for source in self._settings.get(Sets.CONNECTION_EXTRA_SOURCES):
+            serialPortDict[source] = dict()
+            serialPortDict[source]["description"] = "Custom source"
+            serialPortDict[source]["available"] = True
+
         return serialPortDict
 
     def _reloadSerialPorts(self):
@@ -255,7 +333,7 @@ class ControlFrame:
                 self._serialPortOption.config(state=tk.NORMAL)
                 self._connectButton.config(state=tk.DISABLED)
 
-
+            self._reloadExtraPorts()
 
         else:
             self._serialPortVar.set(self.NO_SERIAL_PORT)
@@ -263,8 +341,52 @@ class ControlFrame:
             self._serialPortOption.config(state=tk.DISABLED)
             self._connectButton.config(state=tk.DISABLED)
 
+    def _reloadExtraPorts(self):
+
+        self._extraPortsMenu.delete(0,"end")
+
+        extraPortVars = dict()
+        for port in self._serialPortList:
+            # Keep selection of ports still present
+            var = self._extraPortVars.get(port,tk.BooleanVar(self._topFrame,False))
+            extraPortVars[port] = var
+
+            if self._serialPorts[port]["available"]:
+                optionState = tk.NORMAL
+            else:
+                optionState = tk.DISABLED
+                var.set(False)
+
+            self._extraPortsMenu.add_checkbutton(label=port,variable=var,command=self._updateExtraPortsButton,state=optionState)
+
+        self._extraPortVars = extraPortVars
+        self._updateExtraPortsButton()
+
+    def _updateExtraPortsButton(self):
+        extraPortCount = len(self.getSelectedPorts()) - 1
+        if extraPortCount > 0:
+            self._extraPortsButton.config(text="More ports (" + str(extraPortCount) + ")")
+        else:
+            self._extraPortsButton.config(text="More ports")
+
     def _updateSerialPortSelect(self,*args):
         if self._serialPortVar.get() == self.NO_SERIAL_PORT:
             self._serialPortLabel.config(text=self.NO_SERIAL_PORT)
         else:
             self._serialPortLabel.config(text=self._serialPorts[self._serialPortVar.get()]["description"])
+            self._baudrateVar.set(self._settings.getPortSettings(self._serialPortVar.get())[Sets.PORT_BAUDRATE])
+            self._binaryVar.set(self._settings.isBinary(self._serialPortVar.get()))
+            self._updateExtraPortsButton()
+
+    def _updateBaudrate(self,baudrate):
+        port = self._serialPortVar.get()
+        if port in self._serialPorts:
+            self._settings.setPortSetting(port,Sets.PORT_BAUDRATE,int(baudrate))
+
+    def _updateDataMode(self):
+        port = self._serialPortVar.get()
+        if port in self._serialPorts:
+            if self._binaryVar.get():
+                self._settings.setPortSetting(port,Sets.PORT_DATA_MODE,Sets.DATA_MODE_BINARY)
+            else:
+                self._settings.setPortSetting(port,Sets.PORT_DATA_MODE,Sets.DATA_MODE_TEXT)
@@ -1,4 +1,6 @@
 import time
+import threading
+import queue
 
 import tkinter as tk
 from tkinter.font import Font
@@ -8,6 +10,8 @@ import settings as Sets
 from views import renameFileView
 import spinner
 import search
+import lineStore
+import ruleEngine
 
 # Import for intellisense
 from workers.highlightWorker import HighlightWorker
@@ -27,6 +31,16 @@ class TextFrame:
 
         self._highlightWorker:HighlightWorker = None
 
+        # Lines in text area (see lineStore). Must be changed together with the text area
+        self.lineStore = lineStore.LineStore()
+
+        # Highlight of lines already in text area: Tags are found in a thread and added in chunks (see addLineColorTagsToText)
+        # Runs not done: run id -> tag names of the run. A new run replaces only runs with the same tag names
+        self._rehighlightRuns = dict()
+        self._lastRehighlightRunId = 0
+        self._rehighlightQueue = queue.Queue()
+        self._rehighlightJob = None
+
         self._textFrame = tk.Frame(self._root)
 
         fontList = tk.font.families()
@@ -154,38 +168,118 @@ class TextFrame:
         self.textArea.tag_delete(tagName)
 
     def addAllLineColorTagsToText(self):
-        for lineColorRowId in self._lineColorMap.keys():
-            self.addLineColorTagToText(self._lineColorMap[lineColorRowId]["regex"],self._lineColorMap[lineColorRowId]["tagName"])
+        self.addLineColorTagsToText([(self._lineColorMap[rowId]["tagName"],self._lineColorMap[rowId]["regex"]) for rowId in sorted(self._lineColorMap.keys())])
 
     def addLineColorTagToText(self,regex,tagName):
+        self.addLineColorTagsToText([(tagName,regex)])
 
-        #### A lot slower! ####
-        # lastline = int(self.textArea.index("end-2c").split(".")[0])
-
-        # for lineNumber in range(1,lastline+1):
-        #     start = str(lineNumber) + ".0"
-        #     end = start + "+1l"
-        #     countVar = tk.StringVar()
-        #     pos = self.textArea.search(regex,start,stopindex=end,count=countVar,nocase=False,regexp=True)
-        #     if pos:
-        #         self.textArea.tag_add(tagName,pos,pos + "+" + countVar.get() + "c")
+    def addLineColorTagsToText(self,rules):
+        """Add tags of rules [(tagName, regex)] to the lines in the text area. Returns at once:
+        Tags are found with the rule engine in a thread, and added to the text area in chunks from the GUI thread.
+        Can be called from any thread"""
+        self._root.after(0,self._startRehighlight,list(rules))
 
-        countVar = tk.StringVar()
-        start = 1.0
-        while True:
-            pos = self.textArea.search(regex,start,stopindex=tk.END,count=countVar,nocase=False,regexp=True)
-            if not pos:
-                break
-            else:
-                self.textArea.tag_add(tagName,pos,pos + "+" + countVar.get() + "c")
-                start = pos + "+1c"
+    ##############
+    # Highlight of lines in text area
+
+    REHIGHLIGHT_CHUNK_LINES = 2000
+    REHIGHLIGHT_APPLY_INTERVAL_MS = 10
+
+    def _startRehighlight(self,rules):
+        # Snapshot is taken in the GUI thread, so it is the same as the text area
+        firstSequence, entries = self.lineStore.snapshot()
+        if not entries or not rules:
+            return
+
+        # Tags of a previous run of the same tags still waiting are not needed, they are found again in this run.
+        # Runs of other tags (e.g. several rules added in one options save) are kept
+        tagNames = frozenset([tagName for tagName, _ in rules])
+        for runId, runTagNames in list(self._rehighlightRuns.items()):
+            if runTagNames & tagNames:
+                del self._rehighlightRuns[runId]
+
+        self._lastRehighlightRunId += 1
+        runId = self._lastRehighlightRunId
+        self._rehighlightRuns[runId] = tagNames
+
+        engine = ruleEngine.RuleEngine(rules,self._settings.get(Sets.HIGHLIGHT_ALL_MATCHES),self._settings.get(Sets.HIGHLIGHT_MAX_SPANS_PER_LINE))
+
+        rehighlightThread = threading.Thread(target=self._rehighlightWorker,args=(runId,engine,firstSequence,entries),\
+                                             daemon=True,name="Rehighlight")
+        rehighlightThread.start()
+
+        if not self._rehighlightJob:
+            self._rehighlightJob = self._root.after(self.REHIGHLIGHT_APPLY_INTERVAL_MS,self._applyRehighlight)
+
+    def _rehighlightWorker(self,runId,engine,firstSequence,entries):
+        "Find tags of entries. Sends chunks of (sequence, entry, tags) for lines with tags"
+
+        for chunkStart in range(0,len(entries),self.REHIGHLIGHT_CHUNK_LINES):
+            if runId not in self._rehighlightRuns:
+                return
+
+            chunkEntries = entries[chunkStart:chunkStart+self.REHIGHLIGHT_CHUNK_LINES]
+            chunk = list()
+            for index, (entry, tags) in enumerate(zip(chunkEntries,engine.locateLines([payload for payload,_ in chunkEntries]))):
+                if tags:
+                    chunk.append((firstSequence+chunkStart+index,entry,tags))
+
+            self._rehighlightQueue.put((runId,chunk))
+
+        self._rehighlightQueue.put((runId,None))
+
+    def _applyRehighlight(self):
+        "Add one chunk of tags to the text area. Runs in the GUI thread until the last chunk is added"
+
+        self._rehighlightJob = None
+        try:
+            runId, chunk = self._rehighlightQueue.get_nowait()
+        except queue.Empty:
+            # Next chunk not ready yet
+            if self._rehighlightRuns:
+                self._rehighlightJob = self._root.after(self.REHIGHLIGHT_APPLY_INTERVAL_MS,self._applyRehighlight)
+            return
+
+        if runId not in self._rehighlightRuns:
+            # Chunk of replaced run, continue with next chunk at once
+            self._rehighlightJob = self._root.after(0,self._applyRehighlight)
+            return
+
+        if chunk is None:
+            del self._rehighlightRuns[runId]
+            # Other runs may still have chunks
+            if self._rehighlightRuns:
+                self._rehighlightJob = self._root.after(0,self._applyRehighlight)
+            return
+
+        # All ranges of a tag in the chunk are added with one call
+        indexesOfTag = dict()
+        # Lines deleted (buffer limit, clear) or replaced since the snapshot are skipped
+        for lineNumber, (sequence, entry, tags) in self.lineStore.findLines(chunk):
+            prefixLength = entry[1]
+            for tagName, start, end in tags:
+                indexes = indexesOfTag.setdefault(tagName,list())
+                indexes.append("%d.%d" % (lineNumber,prefixLength + start))
+                indexes.append("%d.%d" % (lineNumber,prefixLength + end))
+
+        for tagName, indexes in indexesOfTag.items():
+            self.textArea.tag_add(tagName,*indexes)
+
+        self._rehighlightJob = self._root.after(0,self._applyRehighlight)
 
     def createAndAddLineColorTag(self,regex,color):
+        self.createAndAddLineColorTags([(regex,color)])
 
-        tagName = createLineColorTagName(regex)
-        self.createTextFrameLineColorTag(tagName,color)
+    def createAndAddLineColorTags(self,regexColors):
+        "Rules [(regex, color)] are added to the text area in one run"
 
-        self.addLineColorTagToText(regex,tagName)
+        rules = list()
+        for regex, color in regexColors:
+            tagName = createLineColorTagName(regex)
+            self.createTextFrameLineColorTag(tagName,color)
+            rules.append((tagName,regex))
+
+        self.addLineColorTagsToText(rules)
 
 
     ##############
@@ -236,6 +330,9 @@ class TextFrame:
             # Insert new log file name
             self.textArea.insert(pos,newFileName)
 
+            payload, prefixLength = self.lineStore.get(int(lineNumber))
+            self.lineStore.replace(int(lineNumber),payload.replace(oldFileName,newFileName),prefixLength)
+
             # Add link tag to new file name
             self.textArea.tag_add(Sets.LOG_FILE_LINK_TAG,pos,pos + "+" + str(len(newFileName)) + "c")
 
@@ -0,0 +1,102 @@
+import asyncio
+import threading
+import concurrent.futures
+
+from traceLog import traceLog,LogLevel
+
+################################
+# Event loop for non-GUI I/O (used when IO_ENGINE is "asyncio")
+#
+# One thread runs an asyncio event loop. Readers with a file descriptor (POSIX serial ports and pty),
+# the log writer and the single-instance listener all run on this loop instead of in their own threads.
+# A selector loop is used on all platforms, as add_reader is not supported by the Windows proactor loop.
+# Sources without a file descriptor (all serial ports on Windows) fall back to a reader thread.
+# The tkinter mainloop stays on the main thread.
+
+class IoLoop:
+
+    def __init__(self):
+        self.loop = None
+        self._loopThread = None
+
+    ##############
+    # Public Interface
+
+    def start(self):
+        if self._loopThread:
+            traceLog(LogLevel.ERROR,"IoLoop already started")
+            return
+
+        self.loop = asyncio.SelectorEventLoop()
+
+        self._loopThread = threading.Thread(target=self._runLoop,daemon=True,name="IoLoop")
+        self._loopThread.start()
+
+    def stop(self):
+        "Stop event loop. Will block until thread is done"
+        if self._loopThread:
+            self.loop.call_soon_threadsafe(self.loop.stop)
+            self._loopThread.join()
+            self._loopThread = None
+
+    def isLoopThread(self):
+        return threading.current_thread() is self._loopThread
+
+    def call(self,function,*args):
+        "Run function on the loop thread. Can be called from any thread"
+        self.loop.call_soon_threadsafe(function,*args)
+
+    def callAndWait(self,function,*args):
+        "Run function on the loop thread and return the result. Will block until done"
+
+        if self.isLoopThread():
+            return function(*args)
+
+        future = concurrent.futures.Future()
+
+        def runFunction():
+            try:
+                future.set_result(function(*args))
+            except Exception as e:
+                future.set_exception(e)
+
+        self.loop.call_soon_threadsafe(runFunction)
+        return future.result()
+
+    def runCoroutine(self,coroutine):
+        "Schedule coroutine on the loop. Returns concurrent.futures.Future"
+        return asyncio.run_coroutine_threadsafe(coroutine,self.loop)
+
+    def createWakeup(self,callback):
+        """Create function that can be called from any thread (e.g. on each queue put) to run callback on the loop.
+        Calls are coalesced, so a burst of puts gives a single wake-up of the loop"""
+
+        wakeupPending = threading.Event()
+
+        def runCallback():
+            wakeupPending.clear()
+            callback()
+
+        def wakeup():
+            if not wakeupPending.is_set():
+                wakeupPending.set()
+                self.loop.call_soon_threadsafe(runCallback)
+
+        return wakeup
+
+    ##############
+    # Internal
+
+    def _runLoop(self):
+        asyncio.set_event_loop(self.loop)
+        traceLog(LogLevel.DEBUG,"IoLoop started")
+        try:
+            self.loop.run_forever()
+        finally:
+            # Cancel listener and writers still waiting
+            tasks = asyncio.all_tasks(self.loop)
+            for task in tasks:
+                task.cancel()
+            self.loop.run_until_complete(asyncio.gather(*tasks,return_exceptions=True))
+            self.loop.close()
+        traceLog(LogLevel.DEBUG,"IoLoop stopped")
@@ -0,0 +1,50 @@
+import re
+
+################################
+# Line filter
+#
+# A line is hidden when it does not match the include regex, or when it matches the exclude regex.
+# An empty regex is not used, so with both empty no line is hidden.
+# Patterns are compiled once when the filter is built. The filter is never changed after that,
+# so a new filter is built on settings change and swapped in with a single assignment (same as ruleEngine).
+#
+# This module has no imports from ColorTerminal.
+
+class LineFilter:
+
+    def __init__(self,includeRegex="",excludeRegex=""):
+
+        # Regexes that do not compile are not used: (regex, error)
+        self.invalidPatterns = list()
+
+        self._includeSearch = self._compile(includeRegex)
+        self._excludeSearch = self._compile(excludeRegex)
+
+        # Used to find out if the view must be shown again after a settings change
+        self.config = (includeRegex,excludeRegex)
+
+    ##############
+    # Public Interface
+
+    def isActive(self):
+        "True if the filter can hide any line"
+        return self._includeSearch is not None or self._excludeSearch is not None
+
+    def isHidden(self,line):
+        if self._includeSearch and not self._includeSearch(line):
+            return True
+        if self._excludeSearch and self._excludeSearch(line):
+            return True
+        return False
+
+    ##############
+    # Internal
+
+    def _compile(self,regex):
+        if not regex:
+            return None
+        try:
+            return re.compile(regex).search
+        except re.error as e:
+            self.invalidPatterns.append((regex,str(e)))
+            return None
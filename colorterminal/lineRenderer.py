@@ -0,0 +1,56 @@
+import settings as Sets
+import timeStamp
+from customTypes import LineKind
+
+################################
+# Line rendering
+#
+# Line records (customTypes.LineRecord) are only turned into text by the sinks (GUI and log writer).
+# Text of a record is prefix + payload + "\n". Tag positions are relative to the payload, so the sinks
+# add the prefix length.
+#   Line:        [12:34:56.789] ( 0.012) <port> payload    (port tag only when more than one text port is connected)
+#   Hidden:      [12:34:56.789] ( 0.012) Lines hidden: 3
+#   Connect:     [12:34:56] Connected to port
+#   Disconnect:  [12:34:56] Disconnected from port. Log file SerialLog_... (Size 1.000KB)
+#
+# The formatters are safe to use from several threads, so one renderer is shared by all sinks.
+
+class LineRenderer:
+
+    def __init__(self):
+        self._clockAnchor = timeStamp.ClockAnchor()
+        self._showPortTag = False
+
+        self._timeFormatter = timeStamp.TimeStampFormatter("%H:%M:%S",True,Sets.timeStampBracket)
+        self._deltaFormatter = timeStamp.DeltaFormatter(Sets.timeDeltaBracket)
+        self._statusTimeFormatter = timeStamp.TimeStampFormatter("%H:%M:%S",False,Sets.timeStampBracket)
+
+    ##############
+    # Public Interface
+
+    def setClockAnchor(self,clockAnchor):
+        "Wall-clock anchor of the connection. Used to convert arrival timestamps for display"
+        self._clockAnchor = clockAnchor
+
+    def setPorts(self,ports):
+        "Text ports in connection. Lines are tagged with their port when more than one port is connected"
+        self._showPortTag = len(ports) > 1
+
+    def prefix(self,record):
+
+        if record.kind == LineKind.CONNECT or record.kind == LineKind.DISCONNECT:
+            return self._statusTimeFormatter.format(self._clockAnchor.toEpochMs(record.timestamp)) + " "
+
+        timePrefix = self._timeFormatter.format(self._clockAnchor.toEpochMs(record.timestamp)) + " " + self._deltaFormatter.format(record.delta) + " "
+
+        if self._showPortTag and record.kind != LineKind.HIDDEN:
+            return timePrefix + Sets.portTagBracket[0] + record.port + Sets.portTagBracket[1] + " "
+        return timePrefix
+
+    def render(self,record):
+        return self.prefix(record) + record.payload + "\n"
+
+    def renderLines(self,records):
+        "Text of each record in list"
+        prefix = self.prefix
+        return [prefix(record) + record.payload + "\n" for record in records]
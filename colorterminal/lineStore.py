@@ -0,0 +1,88 @@
+import collections
+import itertools
+
+################################
+# Lines of a text widget, kept in Python
+#
+# Each line in the widget has an entry (payload, prefixLength): Text after the prefix (time stamp, port),
+# and the length of the prefix. Highlight positions are found in the payload, as in the highlight worker.
+# The store is changed together with the widget (GUI thread only), so line n in the widget is entry n-1.
+#
+# Lines have a sequence number, counting from the first line ever added. Lines deleted from the top do not
+# change the sequence number of the other lines, so work computed from a snapshot (e.g. highlight of a new rule)
+# can be added to the widget later: A line is found by sequence number, and is only used if it is the same entry.
+
+class LineStore:
+
+    def __init__(self):
+        self._lines = collections.deque()
+        # Sequence number of first line in store
+        self._firstSequence = 0
+
+    def __len__(self):
+        return len(self._lines)
+
+    ##############
+    # Changes (same as in the widget)
+
+    def append(self,payload,prefixLength=0):
+        self._lines.append((payload,prefixLength))
+
+    def extend(self,entries):
+        "Add list of (payload, prefixLength)"
+        self._lines.extend(entries)
+
+    def replaceLast(self,payload,prefixLength=0):
+        if self._lines:
+            self._lines.pop()
+        self._lines.append((payload,prefixLength))
+
+    def replace(self,lineNumber,payload,prefixLength=0):
+        "Replace line in widget line number (from 1)"
+        self._lines[lineNumber-1] = (payload,prefixLength)
+
+    def deleteLast(self):
+        if self._lines:
+            self._lines.pop()
+
+    def deleteFirst(self,count=1):
+        count = min(count,len(self._lines))
+        for _ in range(count):
+            self._lines.popleft()
+        self._firstSequence += count
+
+    def clear(self):
+        self._firstSequence += len(self._lines)
+        self._lines.clear()
+
+    ##############
+    # Lookup
+
+    def get(self,lineNumber):
+        "Entry of widget line number (from 1)"
+        return self._lines[lineNumber-1]
+
+    def snapshot(self):
+        "(sequence of first line, list of entries)"
+        return self._firstSequence, list(self._lines)
+
+    def findLines(self,items):
+        """Items are (sequence, entry, ...) sorted by sequence. Returns list of (widget line number, item)
+        for the lines still in the store. Lines deleted or replaced since the entry was taken are left out"""
+
+        if not items:
+            return []
+
+        # Entries in the sequence range of items are copied once, as indexing a deque is slow in the middle
+        firstIndex = max(items[0][0] - self._firstSequence,0)
+        lastIndex = items[-1][0] - self._firstSequence
+        if lastIndex < 0:
+            return []
+        entries = list(itertools.islice(self._lines,firstIndex,lastIndex+1))
+
+        found = list()
+        for item in items:
+            index = item[0] - self._firstSequence
+            if firstIndex <= index <= lastIndex and index - firstIndex < len(entries) and entries[index - firstIndex] is item[1]:
+                found.append((index + 1,item))
+        return found
@@ -0,0 +1,200 @@
+import re
+import time
+import threading
+
+from traceLog import traceLog,LogLevel
+import settings as Sets
+
+################################
+# Replay of saved log files
+#
+# Lines are parsed from a SerialLog file, the timestamp and delta prefix is removed
+# and the payload is played back with original timing, N times faster or as fast as possible.
+
+# [HH:MM:SS.mmm] (delta) payload
+_logLineRegex = re.compile("^\\" + Sets.timeStampBracket[0] + "(\\d{2}):(\\d{2}):(\\d{2})\\.(\\d{3})\\" + Sets.timeStampBracket[1] + \
+                           " \\" + Sets.timeDeltaBracket[0] + "[ \\d:.]+\\" + Sets.timeDeltaBracket[1] + " (.*)$")
+
+SECONDS_PER_DAY = 24*60*60
+
+# Speed used to replay as fast as possible
+SPEED_MAX = 0
+
+# Max number of bytes returned in one read
+MAX_READ_SIZE = 65536
+
+# Engines of active replays, so views can find the engine of a replay source
+_activeEngines = dict()
+_activeEnginesLock = threading.Lock()
+
+def getActiveEngine(filePath):
+    with _activeEnginesLock:
+        return _activeEngines.get(filePath,None)
+
+def prefixLength(line):
+    "Length of the timestamp and delta prefix of a log file line. 0 for lines without prefix (connect lines)"
+    match = _logLineRegex.match(line)
+    if match:
+        return match.start(5)
+    return 0
+
+def parseLogFile(filePath):
+    """Parse saved log file into list of (offset in seconds, line data).
+    Connect and disconnect lines are skipped. Lines without timestamp get the offset of the previous line"""
+
+    entries = list()
+
+    firstSeconds = None
+    lastSeconds = 0
+    dayOffset = 0
+
+    with open(filePath,"r",encoding="utf-8",errors="backslashreplace") as file:
+        for line in file:
+            line = line.rstrip("\r\n")
+
+            match = _logLineRegex.match(line)
+            if match:
+                seconds = int(match.group(1))*3600 + int(match.group(2))*60 + int(match.group(3)) + int(match.group(4))/1000 + dayOffset
+                # Passing midnight
+                if seconds < lastSeconds - SECONDS_PER_DAY/2:
+                    dayOffset += SECONDS_PER_DAY
+                    seconds += SECONDS_PER_DAY
+                if firstSeconds is None:
+                    firstSeconds = seconds
+                lastSeconds = seconds
+                data = match.group(5)
+            elif Sets.CONNECT_LINE_TEXT.strip() in line or Sets.disconnectLineText.strip() in line:
+                continue
+            else:
+                data = line
+
+            offset = 0
+            if firstSeconds is not None:
+                offset = lastSeconds - firstSeconds
+
+            entries.append((offset,(data + "\n").encode("utf-8")))
+
+    return entries
+
+
+class ReplayEngine:
+    "Plays back log file entries. All methods are thread safe"
+
+    def __init__(self,filePath,speed=1.0):
+        self.filePath = filePath
+
+        self._entries = parseLogFile(filePath)
+
+        self._condition = threading.Condition()
+
+        self._position = 0
+        self._paused = False
+        self._speed = speed
+
+        # Playback clock. Entry at _anchorPosition is due at _anchorTime
+        self._anchorPosition = 0
+        self._anchorTime = time.monotonic()
+
+        traceLog(LogLevel.INFO,"Replay of %s: %d lines loaded" % (filePath, len(self._entries)))
+
+    ##############
+    # Public Interface
+
+    def register(self):
+        with _activeEnginesLock:
+            _activeEngines[self.filePath] = self
+
+    def unregister(self):
+        with _activeEnginesLock:
+            if _activeEngines.get(self.filePath,None) is self:
+                del _activeEngines[self.filePath]
+
+    def getDueData(self,timeout):
+        "Get data of all entries due for playback. If no entries are due, wait up to timeout for the next one"
+
+        with self._condition:
+            data = self._collectDueData()
+            if not data:
+                waitTime = timeout
+                if not self._paused and self._position < len(self._entries):
+                    waitTime = min(timeout,self._getDueTime(self._position) - time.monotonic())
+                if waitTime > 0:
+                    self._condition.wait(waitTime)
+                data = self._collectDueData()
+            return data
+
+    def pause(self):
+        with self._condition:
+            self._paused = True
+            self._condition.notify_all()
+
+    def resume(self):
+        with self._condition:
+            self._paused = False
+            self._setAnchor(self._position)
+            self._condition.notify_all()
+
+    def isPaused(self):
+        return self._paused
+
+    def setSpeed(self,speed):
+        "Speed factor of playback. SPEED_MAX plays back as fast as possible"
+        with self._condition:
+            self._speed = speed
+            self._setAnchor(self._position)
+            self._condition.notify_all()
+
+    def getSpeed(self):
+        return self._speed
+
+    def seek(self,fraction):
+        "Continue playback from fraction (0.0 to 1.0) of the file"
+        with self._condition:
+            self._position = min(max(int(fraction*len(self._entries)),0),len(self._entries))
+            self._setAnchor(self._position)
+            self._condition.notify_all()
+
+    def getProgress(self):
+        "Returns (lines played, total lines, offset in seconds of last played line)"
+        with self._condition:
+            offset = 0
+            if self._position > 0:
+                offset = self._entries[self._position-1][0]
+            return (self._position, len(self._entries), offset)
+
+    def isDone(self):
+        return self._position >= len(self._entries)
+
+    ##############
+    # Internal
+
+    def _setAnchor(self,position):
+        self._anchorPosition = position
+        self._anchorTime = time.monotonic()
+
+    def _getDueTime(self,position):
+        if self._speed == SPEED_MAX:
+            return self._anchorTime
+        anchorOffset = 0
+        if self._anchorPosition < len(self._entries):
+            anchorOffset = self._entries[self._anchorPosition][0]
+        return self._anchorTime + (self._entries[position][0] - anchorOffset)/self._speed
+
+    def _collectDueData(self):
+
+        if self._paused:
+            return b""
+
+        now = time.monotonic()
+        dueEntries = list()
+        dueSize = 0
+
+        while self._position < len(self._entries) and dueSize < MAX_READ_SIZE:
+            if self._getDueTime(self._position) > now:
+                break
+            data = self._entries[self._position][1]
+            dueEntries.append(data)
+            dueSize += len(data)
+            self._position += 1
+
+        return b"".join(dueEntries)
@@ -0,0 +1,66 @@
+################################
+# Ring buffer for raw binary capture
+#
+# Data is read directly into a preallocated bytearray (readinto on a memoryview slice),
+# so there is no per-byte Python work and no allocation per read.
+# Positions are absolute byte counts since the start of the capture. Only the last
+# "size" bytes are kept. There is a single writer (reader thread), any number of readers.
+
+class RingBuffer:
+
+    def __init__(self,size):
+        self.size = size
+        self._buffer = bytearray(size)
+        self._view = memoryview(self._buffer)
+
+        # Total number of bytes written. Only updated after the data is in the buffer
+        self.totalBytes = 0
+
+    ##############
+    # Writer
+
+    def readFrom(self,source,maxSize):
+        """Read up to maxSize bytes from source (serial.Serial or transport) into the buffer.
+        Returns memoryview of the new data. The view is only valid until the buffer wraps around to it"""
+
+        start = self.totalBytes % self.size
+        end = start + min(maxSize,self.size - start)
+
+        count = source.readinto(self._view[start:end])
+        if not count:
+            return self._view[start:start]
+
+        self.totalBytes += count
+        return self._view[start:start+count]
+
+    ##############
+    # Readers
+
+    def getRange(self):
+        "Returns (first, end) absolute positions of the data currently in the buffer"
+        total = self.totalBytes
+        return (max(total - self.size,0), total)
+
+    def getBytes(self,position,length):
+        """Copy of data from absolute position. Returns (position, data).
+        Data no longer in the buffer is skipped, so the returned position can be later than requested"""
+
+        first, total = self.getRange()
+        position = max(position,first)
+        length = min(length,total - position)
+        if length <= 0:
+            return (position, b"")
+
+        start = position % self.size
+        if start + length <= self.size:
+            data = bytes(self._view[start:start+length])
+        else:
+            data = bytes(self._view[start:]) + bytes(self._view[:start+length-self.size])
+
+        # Writer can have overwritten the start of the data while copying
+        overwritten = (self.totalBytes - self.size) - position
+        if overwritten > 0:
+            data = data[overwritten:]
+            position += overwritten
+
+        return (position, data)
@@ -0,0 +1,480 @@
+import re
+from time import perf_counter_ns
+
+try:
+    # Python 3.11 and later
+    from re import _parser as _regexParser
+    from re import _constants as _regexConstants
+except ImportError:
+    import sre_parse as _regexParser
+    import sre_constants as _regexConstants
+
+################################
+# Line color rule engine
+#
+# Rules are (tagName, regex) in priority order, the last rule has the highest priority (same as the tag order in the text frame).
+# Patterns are compiled once when the engine is built. The engine is never changed after that,
+# so a new engine is built on settings change and swapped in with a single assignment.
+#
+# Most lines match no rule, and most rules contain a literal that must be part of every match (e.g. "Main::" in "Main::.*error").
+# These literals are found when the engine is built, and a single scan of the line tells which of them are in the line.
+# Only the rules with a literal in the line are searched, so the cost of a line does not grow with the number of rules.
+# The scan is one regex, an alternation of all literals (longest first) in a lookahead, so literals overlapping each other
+# are all found: At each position the longest literal is found, and all literals inside it are known from the build.
+#
+# With few rules, or for rules without a literal, the combined prefilter is used instead: All rules that can be combined are joined in one alternation,
+# and a single search tells if any of them can match.
+# Rules with named groups, backreferences, conditional groups or global inline flags (e.g. "(?i)") change meaning when joined,
+# so they are always searched on their own.
+#
+# Modes:
+#   First match: The first match of each rule gives a tag (tagName, start, end)
+#   All matches: Every match of each rule is tagged. Spans of a rule are merged, and where rules overlap
+#                only the rule with the highest priority is kept. Tags of a rule are next to each other
+#                in the result, so they can be added with one call. At most maxSpans matches are used per line
+#
+# Rule counters: When a dict of RuleCounter (by tagName) is given, each search of a rule is counted.
+# Time is not taken in these searches: Rules rejected by the prefilter or literal scan are never searched,
+# but a slow regex still costs time inside the combined prefilter. Instead every 8th line is used to search
+# one rule on its own with timing, taking the rules in turn. So each rule is timed on a sample of all lines,
+# also lines it does not match, and a slow regex shows up on its own rule.
+# The dict is filled with counters for the rules of the engine. Counters already in it are kept,
+# so a new engine with the same rules continues counting.
+#
+# This module has no imports from ColorTerminal, so it can be used in the highlight pool processes.
+
+_defaultFlags = re.compile("").flags
+
+# Literal scan is used when at least this number of rules have a literal
+_LITERAL_SCAN_MIN_RULES = 16
+
+# Max number of different sets of literals found in lines, that are kept
+_SEARCHES_CACHE_SIZE = 1024
+
+def _isCombinable(regex,pattern):
+    if pattern.groupindex or pattern.flags != _defaultFlags:
+        return False
+    # Group numbers change when rules are joined
+    try:
+        if _hasGroupReference(_regexParser.parse(regex)):
+            return False
+    except Exception:
+        return False
+    try:
+        re.compile("(?:" + regex + ")")
+    except re.error:
+        return False
+    return True
+
+# Parser opcodes (re._constants)
+_LITERAL = _regexConstants.LITERAL
+_SUBPATTERN = _regexConstants.SUBPATTERN
+_BRANCH = _regexConstants.BRANCH
+_REPEATS = tuple(getattr(_regexConstants,name) for name in ("MAX_REPEAT","MIN_REPEAT","POSSESSIVE_REPEAT") if hasattr(_regexConstants,name))
+_ATOMIC_GROUP = getattr(_regexConstants,"ATOMIC_GROUP",None)
+_GROUPREF = _regexConstants.GROUPREF
+_GROUPREF_EXISTS = _regexConstants.GROUPREF_EXISTS
+
+def _hasGroupReference(value):
+    "True if the parsed pattern refers to a group: backreference (\\1, (?P=name)) or conditional group ((?(1)...))"
+    if isinstance(value,tuple) and value and (value[0] is _GROUPREF or value[0] is _GROUPREF_EXISTS):
+        return True
+    if isinstance(value,(list,tuple,_regexParser.SubPattern)):
+        return any(_hasGroupReference(item) for item in value)
+    return False
+
+def _sequenceLiterals(items):
+    """Literals of which at least one is part of every match of the parsed sequence, or None if not known.
+    If there are several choices, the one with the longest shortest literal is used (best filter)"""
+
+    candidates = list()
+    run = list()
+
+    for op, av in items:
+        if op == _LITERAL:
+            run.append(chr(av))
+            continue
+
+        if run:
+            candidates.append(["".join(run)])
+            run = list()
+
+        literals = None
+        if op == _SUBPATTERN:
+            # (group, add flags, remove flags, pattern). Local flags, e.g. (?i:...), change how literals match
+            if not av[1] and not av[2]:
+                literals = _sequenceLiterals(av[-1])
+        elif op in _REPEATS:
+            minCount, maxCount, pattern = av
+            if minCount >= 1:
+                literals = _sequenceLiterals(pattern)
+        elif op == _BRANCH:
+            # One literal from each branch
+            literals = list()
+            for branch in av[1]:
+                branchLiterals = _sequenceLiterals(branch)
+                if not branchLiterals:
+                    literals = None
+                    break
+                literals.extend(branchLiterals)
+        elif op == _ATOMIC_GROUP:
+            literals = _sequenceLiterals(av)
+        # Anything else (classes, any, anchors, lookarounds) gives no literal
+
+        if literals:
+            candidates.append(literals)
+
+    if run:
+        candidates.append(["".join(run)])
+
+    if not candidates:
+        return None
+
+    return max(candidates,key=lambda literals: min(len(literal) for literal in literals))
+
+def _requiredLiterals(regex):
+    "Literals of which at least one is in every match of regex, or None (rule must always be searched)"
+    try:
+        parsed = _regexParser.parse(regex)
+    except Exception:
+        return None
+
+    # Case insensitive and verbose patterns are not matched as plain text
+    flags = parsed.state.flags
+    if flags & (re.IGNORECASE | re.VERBOSE):
+        return None
+
+    literals = _sequenceLiterals(parsed)
+    if not literals or not all(literals):
+        return None
+    return literals
+
+def _subtractSpans(spans,claimedSpans):
+    "Parts of spans not covered by claimedSpans. Both lists sorted and not overlapping"
+    result = list()
+    claimedIndex = 0
+    for start, end in spans:
+        # Skip claimed spans ending before this span
+        while claimedIndex < len(claimedSpans) and claimedSpans[claimedIndex][1] <= start:
+            claimedIndex += 1
+        index = claimedIndex
+        while start < end:
+            if index >= len(claimedSpans) or claimedSpans[index][0] >= end:
+                result.append((start,end))
+                break
+            claimedStart, claimedEnd = claimedSpans[index]
+            if claimedStart > start:
+                result.append((start,claimedStart))
+            start = max(start,claimedEnd)
+            index += 1
+    return result
+
+def _mergeSpans(spans):
+    "Sort and join overlapping or adjacent spans"
+    spans.sort()
+    merged = [spans[0]]
+    for start, end in spans[1:]:
+        if start <= merged[-1][1]:
+            if end > merged[-1][1]:
+                merged[-1] = (merged[-1][0],end)
+        else:
+            merged.append((start,end))
+    return merged
+
+# Every n:th line, one rule is searched on its own with timing
+_PROFILE_LINE_INTERVAL = 8
+
+# Time histogram of rule counters. Bucket n holds searches taking less than 2^n ns (any 64 bit time has a bucket)
+_HISTOGRAM_BUCKETS = 64
+
+class RuleCounter:
+    """Searches of one rule. Evaluations and hits are of the searches done for the tags of lines.
+    Time and histogram are of the timed searches of the rule on its own, on a sample of all lines.
+    Lines is the number of lines the timed searches stand for"""
+    __slots__ = ("evaluations", "hits", "timedEvaluations", "timeNs", "histogram", "lines")
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.evaluations = 0
+        self.hits = 0
+        self.timedEvaluations = 0
+        self.timeNs = 0
+        self.histogram = [0]*_HISTOGRAM_BUCKETS
+        self.lines = 0
+
+    def merge(self,other):
+        self.evaluations += other.evaluations
+        self.hits += other.hits
+        self.timedEvaluations += other.timedEvaluations
+        self.timeNs += other.timeNs
+        self.histogram = [count + otherCount for count,otherCount in zip(self.histogram,other.histogram)]
+        self.lines += other.lines
+
+    def copy(self):
+        counter = RuleCounter()
+        counter.merge(self)
+        return counter
+
+    def meanNs(self):
+        if self.timedEvaluations == 0:
+            return 0
+        return self.timeNs/self.timedEvaluations
+
+    def isUsed(self):
+        return self.evaluations > 0 or self.timedEvaluations > 0
+
+    def totalNs(self):
+        "Estimated time of the rule on all lines (searched on its own)"
+        return self.meanNs()*self.lines
+
+    def percentileNs(self,percentile):
+        "Upper limit of the histogram bucket holding the percentile (e.g. 99)"
+        if self.timedEvaluations == 0:
+            return 0
+        limit = self.timedEvaluations*percentile/100
+        count = 0
+        for bucket, bucketCount in enumerate(self.histogram):
+            count += bucketCount
+            if count >= limit:
+                return 2**bucket
+        return 2**(_HISTOGRAM_BUCKETS-1)
+
+class RuleEngine:
+
+    def __init__(self,rules,allMatches=False,maxSpans=64,ruleCounters=None):
+
+        self.allMatches = allMatches
+        self._maxSpans = max(maxSpans,1)
+
+        # Rules with a regex that does not compile are skipped: (tagName, regex, error)
+        self.invalidRules = list()
+
+        # (tagName, compiled pattern)
+        self._allRules = list()
+
+        # Index in _allRules of rules found by literal: literal -> set of indexes
+        ruleIndexesOfLiteral = dict()
+        # Index of rules combined in the prefilter, and of rules always searched
+        combinedIndexes = list()
+        uncombinedIndexes = list()
+
+        combinedRegexes = list()
+
+        # (regex, pattern, literals)
+        compiledRules = list()
+        for tagName, regex in rules:
+            try:
+                pattern = re.compile(regex)
+            except re.error as e:
+                self.invalidRules.append((tagName,regex,str(e)))
+                continue
+
+            self._allRules.append((tagName,pattern))
+            compiledRules.append((regex,pattern,_requiredLiterals(regex)))
+
+        # With few rules, scanning for literals costs more than it saves
+        useLiterals = sum(1 for _,_,literals in compiledRules if literals) >= _LITERAL_SCAN_MIN_RULES
+
+        for index, (regex, pattern, literals) in enumerate(compiledRules):
+            if literals and useLiterals:
+                for literal in literals:
+                    ruleIndexesOfLiteral.setdefault(literal,set()).add(index)
+            elif _isCombinable(regex,pattern):
+                combinedRegexes.append("(?:" + regex + ")")
+                combinedIndexes.append(index)
+            else:
+                uncombinedIndexes.append(index)
+
+        self._prefilter = None
+        if combinedRegexes:
+            try:
+                self._prefilter = re.compile("|".join(combinedRegexes)).search
+            except re.error:
+                # Search all rules on their own
+                uncombinedIndexes = sorted(uncombinedIndexes + combinedIndexes)
+                combinedIndexes = list()
+
+        self._combinedIndexes = frozenset(combinedIndexes)
+        self._uncombinedIndexes = frozenset(uncombinedIndexes)
+
+        # Literal scan. A literal found in the line selects its own rules and the rules of all literals inside it
+        self._literalSearch = None
+        self._literalFindall = None
+        self._ruleIndexesFound = dict()
+        if ruleIndexesOfLiteral:
+            literals = sorted(ruleIndexesOfLiteral.keys(),key=len,reverse=True)
+            literalAlternation = "|".join(re.escape(literal) for literal in literals)
+            self._literalSearch = re.compile(literalAlternation).search
+            self._literalFindall = re.compile("(?=(" + literalAlternation + "))").findall
+            for literal in literals:
+                indexes = set()
+                for innerLiteral, innerIndexes in ruleIndexesOfLiteral.items():
+                    if innerLiteral in literal:
+                        indexes.update(innerIndexes)
+                self._ruleIndexesFound[literal] = frozenset(indexes)
+
+        # Counter of each rule, or None when searches are not counted
+        counters = [None]*len(self._allRules)
+        if ruleCounters is not None:
+            for index, (tagName, pattern) in enumerate(self._allRules):
+                counters[index] = ruleCounters.setdefault(tagName,RuleCounter())
+
+        # Search functions in the order they are used
+        if allMatches:
+            self._locate = self._locateAll
+            # Highest priority first, so it can claim its spans
+            self._searchOfRule = [(tagName,pattern.search,pattern.finditer,counter) for (tagName,pattern),counter in zip(self._allRules,counters)]
+            self._searchOrder = lambda indexes: sorted(indexes,reverse=True)
+        else:
+            self._locate = self._locateFirst
+            self._searchOfRule = [(tagName,pattern.search,counter) for (tagName,pattern),counter in zip(self._allRules,counters)]
+            self._searchOrder = sorted
+
+        self._uncombinedSearches = [self._searchOfRule[index] for index in self._searchOrder(self._uncombinedIndexes)]
+
+        # (literals found, prefilter match) -> searches
+        self._searchesCache = dict()
+
+        self.ruleCount = len(self._allRules)
+
+        # Timing of rules on their own (see rule counters)
+        self._profiledRules = [(pattern.search,counter) for (_,pattern),counter in zip(self._allRules,counters)]
+        self._profileRuleIndex = 0
+        self._linesUntilProfile = 1
+        if ruleCounters is not None and self._profiledRules:
+            self._locateRules = self._locate
+            self._locate = self._locateProfiled
+
+    ##############
+    # Public Interface
+
+    def locate(self,line):
+        "Tags of all rules matching line: [(tagName, start, end)]"
+        return self._locate(line)
+
+    def locateLines(self,lines):
+        "Same as locate for each line in list"
+        locate = self._locate
+        return [locate(line) for line in lines]
+
+    ##############
+    # Internal
+
+    def _getSearches(self,line):
+        "Searches of the rules that can match line"
+
+        # Most lines have none of the literals, so a plain search is tried before finding which ones are there
+        literalsFound = None
+        if self._literalSearch and self._literalSearch(line):
+            literalsFound = frozenset(self._literalFindall(line))
+
+        prefilterMatch = self._prefilter is not None and self._prefilter(line) is not None
+
+        if literalsFound is None and not prefilterMatch:
+            return self._uncombinedSearches
+
+        # Lines of a log have few different sets of literals, so the searches of each set are kept
+        key = (literalsFound,prefilterMatch)
+        searches = self._searchesCache.get(key)
+        if searches is None:
+            searches = self._createSearches(literalsFound,prefilterMatch)
+            if len(self._searchesCache) >= _SEARCHES_CACHE_SIZE:
+                self._searchesCache.clear()
+            self._searchesCache[key] = searches
+        return searches
+
+    def _createSearches(self,literalsFound,prefilterMatch):
+        indexes = set(self._uncombinedIndexes)
+        if literalsFound:
+            for literal in literalsFound:
+                indexes.update(self._ruleIndexesFound[literal])
+        if prefilterMatch:
+            indexes.update(self._combinedIndexes)
+        return [self._searchOfRule[index] for index in self._searchOrder(indexes)]
+
+    def _locateProfiled(self,line):
+        "Locate, and every n:th line time the next rule on its own"
+
+        self._linesUntilProfile -= 1
+        if self._linesUntilProfile <= 0:
+            self._linesUntilProfile = _PROFILE_LINE_INTERVAL
+
+            search, counter = self._profiledRules[self._profileRuleIndex]
+            self._profileRuleIndex = (self._profileRuleIndex + 1) % len(self._profiledRules)
+
+            startNs = perf_counter_ns()
+            search(line)
+            elapsedNs = perf_counter_ns() - startNs
+            counter.timedEvaluations += 1
+            counter.timeNs += elapsedNs
+            counter.histogram[elapsedNs.bit_length()] += 1
+            # Each rule is timed once per interval * rules lines
+            counter.lines += _PROFILE_LINE_INTERVAL*len(self._profiledRules)
+
+        return self._locateRules(line)
+
+    def _locateFirst(self,line):
+        highlights = list()
+        for tagName, search, counter in self._getSearches(line):
+            match = search(line)
+            # Counted here, as a method call would cost more than most searches
+            if counter is not None:
+                counter.evaluations += 1
+                if match:
+                    counter.hits += 1
+            if match:
+                highlights.append((tagName,match.start(),match.end()))
+        return highlights
+
+    def _locateAll(self,line):
+
+        searches = self._getSearches(line)
+        if not searches:
+            return []
+
+        spanBudget = self._maxSpans
+
+        # Spans already taken by rules with higher priority
+        claimedSpans = list()
+        ruleSpans = list()
+
+        for tagName, search, finditer, counter in searches:
+            # Search is faster than starting finditer, and most rules do not match.
+            # Iteration starts at the first match (unlike slicing, "^" and lookbehind still see the whole line)
+            firstMatch = search(line)
+            spans = list()
+            if firstMatch:
+                for match in finditer(line,firstMatch.start()):
+                    start, end = match.span()
+                    # Empty matches can not be shown
+                    if start == end:
+                        continue
+                    spans.append((start,end))
+                    spanBudget -= 1
+                    if spanBudget <= 0:
+                        break
+
+            if counter is not None:
+                counter.evaluations += 1
+                if firstMatch:
+                    counter.hits += 1
+
+            if spans:
+                spans = _mergeSpans(spans)
+                if claimedSpans:
+                    spans = _subtractSpans(spans,claimedSpans)
+                if spans:
+                    ruleSpans.append((tagName,spans))
+                    claimedSpans = _mergeSpans(claimedSpans + spans)
+
+            if spanBudget <= 0:
+                break
+
+        # Back to priority order, lowest first
+        highlights = list()
+        for tagName, spans in reversed(ruleSpans):
+            for start, end in spans:
+                highlights.append((tagName,start,end))
+        return highlights
@@ -234,8 +234,8 @@ class Search:
                         else:
                             break
 
-                    for _ in range(resultsDeleted):
-                        del self._results[0]
+                    # Lines are deleted in large steps, so all results of the lines are removed with one delete
+                    del self._results[:resultsDeleted]
 
                     # Update index of the selected result
                     self._selectedResultListIndex = self._selectedResultListIndex - resultsDeleted
@@ -3,6 +3,15 @@ import json
 import copy
 
 CONNECTION_DEFAULT_PORT     = "Connection_default_port"
+CONNECTION_READ_MODE        = "Connection_readMode"
+CONNECTION_EXTRA_SOURCES    = "Connection_extraSources"
+CONNECTION_PORT_SETTINGS    = "Connection_portSettings"
+CONNECTION_HIGH_THROUGHPUT_BAUDRATE = "Connection_highThroughputBaudrate"
+CONNECTION_PARTIAL_LINE_TIMEOUT = "Connection_partialLineTimeout"
+CONNECTION_MAX_LINE_LENGTH  = "Connection_maxLineLength"
+CONNECTION_BINARY_BUFFER_SIZE = "Connection_binaryBufferSize"
+
+IO_ENGINE                   = "IoEngine"
 
 DEFAULT_WINDOW_SIZE         = "MainWindow_defaultWindowSize"
 THEME_COLOR                 = "MainWindow_themeColor"
@@ -13,6 +22,7 @@ TEXTAREA_COLOR                      = "TextArea_textColor"
 TEXTAREA_FONT_FAMILY                = "TextArea_fontFamily"
 TEXTAREA_FONT_SIZE                  = "TextArea_fontSize"
 TEXTAREA_MAX_LINE_BUFFER            = "TextArea_maxLineBuffer"
+TEXTAREA_TRIM_LINES                 = "TextArea_trimLines"
 TEXTAREA_LINE_WRAP                  = "TextArea_lineWrap"
 
 SEARCH_MATCH_COLOR          = "Search_MatchColor"
@@ -23,6 +33,35 @@ LOG_FILE_PATH               = "LogFile_logFilePath"
 LOG_FILE_BASE_NAME          = "LogFile_logFileBaseName"
 LOG_FILE_TIMESTAMP          = "LogFile_logFileTimestamp"
 
+REPLAY_SPEED                = "Replay_speed"
+
+QUEUE_DISPLAY_MAX_LINES     = "Queue_displayMaxLines"
+QUEUE_LOG_MEMORY_LINES      = "Queue_logMemoryLines"
+
+PIPELINE_PROCESS_BATCH_SIZE     = "Pipeline_processBatchSize"
+PIPELINE_PROCESS_BATCH_AGE      = "Pipeline_processBatchAge"
+PIPELINE_HIGHLIGHT_BATCH_SIZE   = "Pipeline_highlightBatchSize"
+PIPELINE_HIGHLIGHT_BATCH_AGE    = "Pipeline_highlightBatchAge"
+PIPELINE_LOG_BATCH_SIZE         = "Pipeline_logBatchSize"
+PIPELINE_LOG_BATCH_AGE          = "Pipeline_logBatchAge"
+PIPELINE_TOPOLOGY               = "Pipeline_topology"
+
+GUI_FRAME_BUDGET            = "Gui_frameBudget"
+GUI_WAKEUP_CHECK            = "Gui_wakeupCheck"
+GUI_IDLE_WAKEUP_CHECK       = "Gui_idleWakeupCheck"
+
+HIGHLIGHT_ALL_MATCHES       = "Highlight_allMatches"
+HIGHLIGHT_MAX_SPANS_PER_LINE = "Highlight_maxSpansPerLine"
+HIGHLIGHT_RULE_COUNTERS     = "Highlight_ruleCounters"
+HIGHLIGHT_POOL_PROCESSES    = "Highlight_poolProcesses"
+HIGHLIGHT_POOL_MIN_RULES    = "Highlight_poolMinRules"
+HIGHLIGHT_POOL_CHUNK_SIZE   = "Highlight_poolChunkSize"
+
+FILTER_HIDE_LINES           = "Filter_hideLines"
+FILTER_INCLUDE_REGEX        = "Filter_includeRegex"
+FILTER_EXCLUDE_REGEX        = "Filter_excludeRegex"
+FILTER_HISTORY_LINES        = "Filter_historyLines"
+
 LINE_COLOR_MAP              = "LineColorMap"
 
 CT_HOMEPATH_FULL            = "__TEMP_CTHomePathFull"
@@ -34,7 +73,9 @@ ICON_PATH_FULL              = "__TEMP_IconPathFull"
 # Time Stamp
 timeStampBracket = ["[","]"]
 timeDeltaBracket = ["(",")"]
-timeStampRegex = "\\" + timeStampBracket[0] + ".{12}\\" + timeStampBracket[1] + " \\" + timeDeltaBracket[0] + ".{6,12}\\" + timeDeltaBracket[1]
+
+# Port tag (only added when more than one port is connected)
+portTagBracket = ["<",">"]
 
 # Other Colors
 STATUS_CONNECT_BACKGROUND_COLOR = "#008800"
@@ -46,12 +87,12 @@ SELECTED_LINE_DARKEN_COLOR = -30 # darken 8bit RGB color by this amount
 
 # Connect Status Lines
 CONNECT_LINE_TEXT = " Connected to port\n"
-connectLineRegex = "\\" + timeStampBracket[0] + ".{8}\\" + timeStampBracket[1] + CONNECT_LINE_TEXT
+CONNECT_LINE_PAYLOAD = CONNECT_LINE_TEXT.strip()
 CONNECT_LINE_BACKGROUND_COLOR = "#008800"
 CONNECT_LINE_SELECT_BACKGROUND_COLOR = "#084C08"
 
 disconnectLineText = " Disconnected from port. Log file "
-disconnectLineRegex = "\\" + timeStampBracket[0] + ".{8}\\" + timeStampBracket[1] + disconnectLineText
+DISCONNECT_LINE_PAYLOAD = disconnectLineText.lstrip()
 DISCONNECT_LINE_BACKGROUND_COLOR = "#880000"
 DISCONNECT_LINE_SELECT_BACKGROUND_COLOR = "#4C0808"
 
@@ -64,11 +105,47 @@ HIDELINE_COLOR_TAG = "HIDELINE_COLOR_TAG"
 
 # Log file
 LOG_FILE_TYPE = ".txt"
+LOG_FILE_BINARY_TYPE = ".bin"
 LOG_FILE_LINK_TAG = "LOG_FILE_LINK_TAG"
 
 LINE_WRAP_ON = "on"
 LINE_WRAP_OFF = "off"
 
+FILTER_ON = "on"
+FILTER_OFF = "off"
+
+# Serial read mode
+READ_MODE_LINE = "line" # One readline() per line
+READ_MODE_BULK = "bulk" # Drain all waiting bytes and split lines in bulk
+
+# I/O engine
+IO_ENGINE_THREADS = "threads" # Each reader, log writer and listener in its own thread
+IO_ENGINE_ASYNCIO = "asyncio" # One asyncio event loop thread for all non-GUI I/O
+
+# Pipeline topology (see PIPELINE_TOPOLOGIES in __main__)
+TOPOLOGY_SPLIT = "split"        # Process and highlight stages in their own threads
+TOPOLOGY_FUSED = "fused"        # Highlight runs in the process thread (best for few line color rules)
+TOPOLOGY_PROCESS = "process"    # Own threads, line color rules matched in a process pool (best for many rules on many cores)
+
+# Port settings (stored per port in CONNECTION_PORT_SETTINGS)
+PORT_BAUDRATE = "baudrate"
+PORT_BYTESIZE = "bytesize"
+PORT_PARITY = "parity"
+PORT_STOPBITS = "stopbits"
+PORT_TIMEOUT = "timeout"
+PORT_DATA_MODE = "dataMode"
+
+# Port data mode
+DATA_MODE_TEXT = "text"     # Lines are decoded, timestamped and highlighted
+DATA_MODE_BINARY = "binary" # Raw bytes are captured to ring buffer (hex view) and binary log file
+
+DEFAULT_PORT_SETTINGS = {PORT_BAUDRATE:115200, PORT_BYTESIZE:8, PORT_PARITY:"N", PORT_STOPBITS:1, PORT_TIMEOUT:1.0, PORT_DATA_MODE:DATA_MODE_TEXT}
+
+# Hex view
+HEX_VIEW_BYTES_PER_ROW = 16
+
+BAUDRATES = [9600, 19200, 38400, 57600, 115200, 230400, 460800, 921600, 1000000, 2000000, 3000000, 4000000]
+
 class Settings:
 
     def __init__(self,jsonFileFullPath):
@@ -89,6 +166,19 @@ class Settings:
 
         # Connection
         self.settings[CONNECTION_DEFAULT_PORT]      = settingsJson.get(CONNECTION_DEFAULT_PORT,"")
+        self.settings[CONNECTION_READ_MODE]         = settingsJson.get(CONNECTION_READ_MODE,READ_MODE_BULK)
+        self.settings[CONNECTION_EXTRA_SOURCES]     = settingsJson.get(CONNECTION_EXTRA_SOURCES,[])
+        self.settings[CONNECTION_PORT_SETTINGS]     = settingsJson.get(CONNECTION_PORT_SETTINGS,{})
+        self.settings[CONNECTION_HIGH_THROUGHPUT_BAUDRATE] = settingsJson.get(CONNECTION_HIGH_THROUGHPUT_BAUDRATE,460800)
+        # Idle time in ms before an incomplete line is shown. 0 disables partial line streaming
+        self.settings[CONNECTION_PARTIAL_LINE_TIMEOUT] = settingsJson.get(CONNECTION_PARTIAL_LINE_TIMEOUT,10)
+        # Max bytes of a line. A longer line is broken, so data without newlines does not grow without limit. 0 is no limit
+        self.settings[CONNECTION_MAX_LINE_LENGTH]   = settingsJson.get(CONNECTION_MAX_LINE_LENGTH,16384)
+        # Size in bytes of the ring buffer shown in the hex view of binary ports
+        self.settings[CONNECTION_BINARY_BUFFER_SIZE] = settingsJson.get(CONNECTION_BINARY_BUFFER_SIZE,4*1024*1024)
+
+        # I/O engine (read at startup)
+        self.settings[IO_ENGINE]                    = settingsJson.get(IO_ENGINE,IO_ENGINE_THREADS)
 
         # Main Window
         self.settings[DEFAULT_WINDOW_SIZE]          = settingsJson.get(DEFAULT_WINDOW_SIZE,"1100x600")
@@ -101,6 +191,8 @@ class Settings:
         self.settings[TEXTAREA_FONT_FAMILY]             = settingsJson.get(TEXTAREA_FONT_FAMILY,"Consolas")
         self.settings[TEXTAREA_FONT_SIZE]               = settingsJson.get(TEXTAREA_FONT_SIZE,10)
         self.settings[TEXTAREA_MAX_LINE_BUFFER]         = settingsJson.get(TEXTAREA_MAX_LINE_BUFFER,4000)
+        # When the max line buffer is passed, this many lines more are deleted, so the window is trimmed in large steps
+        self.settings[TEXTAREA_TRIM_LINES]              = settingsJson.get(TEXTAREA_TRIM_LINES,1000)
         self.settings[TEXTAREA_LINE_WRAP]               = settingsJson.get(TEXTAREA_LINE_WRAP,LINE_WRAP_ON)
 
         # Search
@@ -113,6 +205,51 @@ class Settings:
         self.settings[LOG_FILE_BASE_NAME]           = settingsJson.get(LOG_FILE_BASE_NAME,"SerialLog_")
         self.settings[LOG_FILE_TIMESTAMP]           = settingsJson.get(LOG_FILE_TIMESTAMP,"%Y.%m.%d_%H.%M.%S")
 
+        # Replay
+        self.settings[REPLAY_SPEED]                 = settingsJson.get(REPLAY_SPEED,"1")
+
+        # Queues. Limits are in lines (items are single lines or lists of lines)
+        self.settings[QUEUE_DISPLAY_MAX_LINES]      = settingsJson.get(QUEUE_DISPLAY_MAX_LINES,100000)
+        self.settings[QUEUE_LOG_MEMORY_LINES]       = settingsJson.get(QUEUE_LOG_MEMORY_LINES,100000)
+
+        # Pipeline batches. Size in lines, age (max added latency) in ms
+        self.settings[PIPELINE_PROCESS_BATCH_SIZE]      = settingsJson.get(PIPELINE_PROCESS_BATCH_SIZE,2000)
+        self.settings[PIPELINE_PROCESS_BATCH_AGE]       = settingsJson.get(PIPELINE_PROCESS_BATCH_AGE,5)
+        self.settings[PIPELINE_HIGHLIGHT_BATCH_SIZE]    = settingsJson.get(PIPELINE_HIGHLIGHT_BATCH_SIZE,2000)
+        self.settings[PIPELINE_HIGHLIGHT_BATCH_AGE]     = settingsJson.get(PIPELINE_HIGHLIGHT_BATCH_AGE,5)
+        self.settings[PIPELINE_LOG_BATCH_SIZE]          = settingsJson.get(PIPELINE_LOG_BATCH_SIZE,5000)
+        self.settings[PIPELINE_LOG_BATCH_AGE]           = settingsJson.get(PIPELINE_LOG_BATCH_AGE,50)
+        # Stage topology (read at startup)
+        self.settings[PIPELINE_TOPOLOGY]                = settingsJson.get(PIPELINE_TOPOLOGY,TOPOLOGY_SPLIT)
+
+        # GUI refresh. Frame budget is the time in ms used to add lines to the window per refresh,
+        # lines left wait for the next refresh. Wake-up check is how often (ms) the GUI looks for new lines
+        # after lines were shown. When no lines arrive, it backs off to the idle wake-up check
+        self.settings[GUI_FRAME_BUDGET]             = settingsJson.get(GUI_FRAME_BUDGET,12)
+        self.settings[GUI_WAKEUP_CHECK]             = settingsJson.get(GUI_WAKEUP_CHECK,10)
+        self.settings[GUI_IDLE_WAKEUP_CHECK]        = settingsJson.get(GUI_IDLE_WAKEUP_CHECK,100)
+
+        # Line color rules. All matches colors every match of a rule instead of only the first.
+        # Max spans limits the work per line in all matches mode
+        self.settings[HIGHLIGHT_ALL_MATCHES]        = settingsJson.get(HIGHLIGHT_ALL_MATCHES,False)
+        self.settings[HIGHLIGHT_MAX_SPANS_PER_LINE] = settingsJson.get(HIGHLIGHT_MAX_SPANS_PER_LINE,64)
+        # Count and time the searches of each line color rule (shown in options)
+        self.settings[HIGHLIGHT_RULE_COUNTERS]      = settingsJson.get(HIGHLIGHT_RULE_COUNTERS,True)
+
+        # Highlight pool (used by the "process" topology). Number of processes, 0 is one per core.
+        # The pool is only used when there are at least "min rules" line color rules. Chunk size is lines per task
+        self.settings[HIGHLIGHT_POOL_PROCESSES]     = settingsJson.get(HIGHLIGHT_POOL_PROCESSES,0)
+        self.settings[HIGHLIGHT_POOL_MIN_RULES]     = settingsJson.get(HIGHLIGHT_POOL_MIN_RULES,50)
+        self.settings[HIGHLIGHT_POOL_CHUNK_SIZE]    = settingsJson.get(HIGHLIGHT_POOL_CHUNK_SIZE,250)
+
+        # Line filter. When hide lines is on, lines not matching the include regex, or matching the exclude regex,
+        # are not shown (they are still logged). Empty regex is not used.
+        # History lines is the number of lines kept, so the view can be shown again when the filter is changed
+        self.settings[FILTER_HIDE_LINES]            = settingsJson.get(FILTER_HIDE_LINES,FILTER_OFF)
+        self.settings[FILTER_INCLUDE_REGEX]         = settingsJson.get(FILTER_INCLUDE_REGEX,"")
+        self.settings[FILTER_EXCLUDE_REGEX]         = settingsJson.get(FILTER_EXCLUDE_REGEX,"")
+        self.settings[FILTER_HISTORY_LINES]         = settingsJson.get(FILTER_HISTORY_LINES,50000)
+
         # Line Color Map
         self.settings[LINE_COLOR_MAP]               = settingsJson.get(LINE_COLOR_MAP,{})
 
@@ -152,4 +289,20 @@ class Settings:
                 traceLog(LogLevel.WARNING,"Settings file not found. Not able to save setting")
                 pass
 
+    def getPortSettings(self,port):
+        "Get settings for port. Settings not saved for the port are set to default values"
+        portSettings = copy.deepcopy(DEFAULT_PORT_SETTINGS)
+        portSettings.update(self.settings[CONNECTION_PORT_SETTINGS].get(port,{}))
+        return portSettings
+
+    def setPortSetting(self,port,option,value):
+        allPortSettings = self.get(CONNECTION_PORT_SETTINGS)
+        allPortSettings.setdefault(port,{})[option] = value
+        self.setOption(CONNECTION_PORT_SETTINGS,allPortSettings)
+
+    def isBinary(self,port):
+        return self.getPortSettings(port)[PORT_DATA_MODE] == DATA_MODE_BINARY
 
+    def isHighThroughput(self,port):
+        "High-throughput profile is used when the port rate is above what per-line handling can sustain"
+        return self.getPortSettings(port)[PORT_BAUDRATE] >= self.settings[CONNECTION_HIGH_THROUGHPUT_BAUDRATE]
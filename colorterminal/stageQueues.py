@@ -0,0 +1,232 @@
+import time
+import queue
+import threading
+import pickle
+import tempfile
+
+from traceLog import traceLog,LogLevel
+from customTypes import LineKind
+
+################################
+# Bounded queues used between the pipeline stages
+#
+# Both queues keep the queue.Queue interface (put, get, task_done, join) and never block the producer.
+# Limits are in lines, not items, as an item can be a batch of thousands of lines.
+# Log queue items are (port, list of lines), counted by their lines, and (port, binary data), counted as one line.
+# Overflow is handled by a policy instead:
+#   DropOldestQueue: Oldest items are dropped (display path, view can skip lines).
+#                    Connect, disconnect and reset records are never dropped, they are moved to the next item
+#   SpillQueue: Items above the memory limit are written to a temporary file (log path, nothing is lost)
+#
+# A put hook can be set, so consumers running on an event loop are woken up instead of polling
+#
+# Batch protocol: Items are single lines or lists of lines. A stage takes everything waiting with getBatch,
+# up to a number of lines and an age limit, and forwards the result as one list.
+#
+# When two stages are fused, an InlineStage is used instead of a queue: the consumer stage runs in the producer thread
+
+def _lineCount(item):
+    "Lines of a queue item: a line, a list of lines, or (port, list of lines) / (port, binary data) in the log queue"
+    if isinstance(item,tuple) and len(item) == 2:
+        item = item[1]
+    if isinstance(item,list):
+        return len(item)
+    return 1
+
+# Records that change the view (connect lines with file name, view reset), so they must not be dropped
+_KEPT_KINDS = (LineKind.CONNECT, LineKind.DISCONNECT, LineKind.RESET)
+
+def _keptRecords(item):
+    "Records of item that must not be dropped"
+    if not isinstance(item,list):
+        item = [item]
+    return [record for record in item if getattr(record,"kind",None) in _KEPT_KINDS]
+
+class StageQueue(queue.Queue):
+
+    def __init__(self):
+        super().__init__()
+        self._putHook = None
+
+    def setPutHook(self,putHook):
+        "Called after each put, from the thread doing the put. None removes the hook"
+        self._putHook = putHook
+
+    def put(self,item,block=True,timeout=None):
+        super().put(item,block,timeout)
+        putHook = self._putHook
+        if putHook:
+            putHook()
+
+    def getBatch(self,maxLines,maxAge,timeout):
+        """Wait up to timeout seconds for the first item. Then collect items until there are maxLines lines,
+        or maxAge seconds have passed since the first item. Returns list of items, empty on timeout.
+        Items are marked as done when returned"""
+
+        try:
+            items = [self.get(True,timeout)]
+        except queue.Empty:
+            return []
+
+        lines = _lineCount(items[0])
+        deadline = time.monotonic() + maxAge
+
+        while lines < maxLines:
+            try:
+                item = self.get_nowait()
+            except queue.Empty:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self.get(True,remaining)
+                except queue.Empty:
+                    break
+            items.append(item)
+            lines += _lineCount(item)
+
+        for _ in items:
+            self.task_done()
+
+        return items
+
+
+class DropOldestQueue(StageQueue):
+    "Items can be single lines or lists of lines. Number of dropped lines is counted"
+
+    def __init__(self,maxLines):
+        # Queue is unbounded for queue.Queue, as the limit is handled by _put
+        super().__init__()
+        self.maxLines = maxLines
+        self.droppedLines = 0
+        # Lines in queue
+        self._lines = 0
+
+    def _put(self,item):
+        super()._put(item)
+        self._lines += _lineCount(item)
+
+        # The newest item is always kept
+        while self.maxLines > 0 and self._lines > self.maxLines and len(self.queue) > 1:
+            droppedItem = self.queue.popleft()
+            droppedLines = _lineCount(droppedItem)
+            self._lines -= droppedLines
+            # Dropped item will never be marked as done
+            self.unfinished_tasks -= 1
+
+            keptRecords = _keptRecords(droppedItem)
+            self.droppedLines += droppedLines - len(keptRecords)
+            if keptRecords:
+                # Added in front of the next item, so the order is kept
+                nextItem = self.queue[0]
+                if not isinstance(nextItem,list):
+                    nextItem = [nextItem]
+                self.queue[0] = keptRecords + nextItem
+                self._lines += len(keptRecords)
+
+    def _get(self):
+        item = super()._get()
+        self._lines -= _lineCount(item)
+        return item
+
+
+class SpillQueue(StageQueue):
+
+    def __init__(self,maxMemoryLines,name):
+        super().__init__()
+        self.maxMemoryLines = maxMemoryLines
+        self.name = name
+        # Lines in memory
+        self._memoryLines = 0
+
+        self._spillFile = None
+        self._spillItems = 0
+        self._spillReadPosition = 0
+        self._spillWritePosition = 0
+
+        self.spilledItems = 0
+
+    def _qsize(self):
+        return len(self.queue) + self._spillItems
+
+    def _put(self,item):
+        # Once spilling has started, all new items go to file until it is empty, to keep the order
+        if self._spillItems > 0 or (self.maxMemoryLines > 0 and self._memoryLines >= self.maxMemoryLines):
+            self._spill(item)
+        else:
+            self.queue.append(item)
+            self._memoryLines += _lineCount(item)
+
+    def _get(self):
+        if not self.queue:
+            self._unspill()
+        item = self.queue.popleft()
+        self._memoryLines -= _lineCount(item)
+        return item
+
+    def _spill(self,item):
+        if self._spillFile is None:
+            self._spillFile = tempfile.TemporaryFile(prefix="ColorTerminal_" + self.name + "_")
+            traceLog(LogLevel.WARNING,"Queue " + self.name + " full. Spilling to disk")
+
+        self._spillFile.seek(self._spillWritePosition)
+        pickle.dump(item,self._spillFile,protocol=pickle.HIGHEST_PROTOCOL)
+        self._spillWritePosition = self._spillFile.tell()
+
+        self._spillItems += 1
+        self.spilledItems += 1
+
+    def _unspill(self):
+        "Move items from file back to memory"
+
+        self._spillFile.seek(self._spillReadPosition)
+        while self._spillItems > 0 and (not self.queue or self._memoryLines < self.maxMemoryLines):
+            item = pickle.load(self._spillFile)
+            self.queue.append(item)
+            self._memoryLines += _lineCount(item)
+            self._spillItems -= 1
+        self._spillReadPosition = self._spillFile.tell()
+
+        # File segment is empty, start from the beginning again
+        if self._spillItems == 0:
+            self._spillFile.seek(0)
+            self._spillFile.truncate()
+            self._spillReadPosition = 0
+            self._spillWritePosition = 0
+
+
+class InlineStage(DropOldestQueue):
+    """Used instead of a queue between two fused stages. While resumed, put calls the consumer stage with [item],
+    in the thread doing the put. Puts from several threads are serialized.
+    While paused, items wait in the queue (oldest dropped) and are handed to the consumer on resume"""
+
+    def __init__(self,maxLines):
+        super().__init__(maxLines)
+        self._consumer = None
+        self._inlineLock = threading.Lock()
+
+    def resume(self,consumer):
+        with self._inlineLock:
+            items = list()
+            while True:
+                try:
+                    items.append(self.get_nowait())
+                except queue.Empty:
+                    break
+                self.task_done()
+
+            if items:
+                consumer(items)
+
+            self._consumer = consumer
+
+    def pause(self):
+        with self._inlineLock:
+            self._consumer = None
+
+    def put(self,item,block=True,timeout=None):
+        with self._inlineLock:
+            if self._consumer:
+                self._consumer([item])
+            else:
+                super().put(item,block,timeout)
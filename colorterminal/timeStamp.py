@@ -0,0 +1,94 @@
+import time
+
+################################
+# Arrival timestamps
+#
+# Readers stamp data with time.monotonic_ns(). Monotonic time is cheap to read, is an integer
+# and never jumps (NTP adjustments), so deltas between lines are always correct.
+# Wall-clock time is only needed for display. A ClockAnchor is taken once at connect,
+# and all timestamps of the connection are converted using this single offset.
+#
+# All timestamp strings (lines, connect/disconnect lines, trace log) are made by the formatters below.
+# This module has no imports from ColorTerminal, so it can be used by traceLog.
+
+NS_PER_MS = 1000000
+MS_PER_SECOND = 1000
+
+# Deltas below this are looked up instead of formatted
+DELTA_LOOKUP_MS = 10*MS_PER_SECOND
+
+_msStrings = [".%03d" % ms for ms in range(MS_PER_SECOND)]
+
+def now():
+    "Arrival timestamp"
+    return time.monotonic_ns()
+
+class ClockAnchor:
+    "Offset between monotonic clock and wall-clock time, taken once"
+
+    def __init__(self):
+        monotonicNs = time.monotonic_ns()
+        self._wallOffsetNs = time.time_ns() - monotonicNs
+
+    def toEpochMs(self,timestamp):
+        "Wall-clock milliseconds since epoch"
+        return (timestamp + self._wallOffsetNs)//NS_PER_MS
+
+class TimeStampFormatter:
+    """Local time string of epoch milliseconds, e.g. [12:34:56.789].
+    Lines arrive many per second, so the formatted second is cached and only the milliseconds are added per call.
+    Safe to use from several threads"""
+
+    def __init__(self,timeFormat="%H:%M:%S",showMs=True,brackets=("","")):
+        self._timeFormat = timeFormat
+        self._showMs = showMs
+        self._brackets = brackets
+
+        # (second, formatted second). Replaced as one object, so threads never see a mixed state
+        self._cache = (None,"")
+
+    def format(self,epochMs):
+        second, ms = divmod(epochMs,MS_PER_SECOND)
+
+        cachedSecond, secondString = self._cache
+        if second != cachedSecond:
+            secondString = self._brackets[0] + time.strftime(self._timeFormat,time.localtime(second))
+            self._cache = (second,secondString)
+
+        if self._showMs:
+            return secondString + _msStrings[ms] + self._brackets[1]
+        return secondString + self._brackets[1]
+
+    def formatNow(self):
+        return self.format(time.time_ns()//NS_PER_MS)
+
+class DeltaFormatter:
+    "Time since previous line, e.g. ( 0.012). Hours and minutes are only shown when not zero"
+
+    def __init__(self,brackets=("","")):
+        self._brackets = brackets
+        # Most deltas are small, so these are formatted once
+        self._lookup = [self._formatMs(ms) for ms in range(DELTA_LOOKUP_MS)]
+
+    def format(self,deltaNs):
+        deltaMs = deltaNs//NS_PER_MS
+        if 0 <= deltaMs < DELTA_LOOKUP_MS:
+            return self._lookup[deltaMs]
+        return self._formatMs(deltaMs)
+
+    def _formatMs(self,deltaMs):
+
+        seconds, ms = divmod(deltaMs,MS_PER_SECOND)
+        minutes, seconds = divmod(seconds,60)
+        hours, minutes = divmod(minutes,60)
+        # Days are not shown
+        hours %= 24
+
+        hourString = ""
+        if hours != 0:
+            hourString = "{:02d}:".format(hours)
+
+        if minutes != 0:
+            return "%s%s%02d:%02d.%03d%s" % (self._brackets[0],hourString,minutes,seconds,ms,self._brackets[1])
+        else:
+            return "%s%s%2d.%03d%s" % (self._brackets[0],hourString,seconds,ms,self._brackets[1])
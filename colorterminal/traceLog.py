@@ -1,5 +1,6 @@
 from enum import Enum
-import datetime
+
+import timeStamp
 
 class LogLevel(Enum):
     ERROR = 0
@@ -7,9 +8,9 @@ class LogLevel(Enum):
     INFO = 2
     DEBUG = 3
 
+_traceTimeFormatter = timeStamp.TimeStampFormatter("%Y-%m-%d %H:%M:%S")
+
 def traceLog(level,msg):
-    timestamp = datetime.datetime.now()
-    micros = int(timestamp.microsecond/1000)
-    timeString = timestamp.strftime("%Y-%m-%d %H:%M:%S") + "." + '{:03d}'.format(micros)
+    timeString = _traceTimeFormatter.formatNow()
 
     print(timeString + " [" + level.name + "] " + msg)
\ No newline at end of file
@@ -0,0 +1,241 @@
+import os
+import io
+import sys
+import time
+import threading
+import subprocess
+
+import serial
+
+from traceLog import traceLog,LogLevel
+import settings as Sets
+import replay
+
+################################
+# Transports
+#
+# All transports have the same interface as the subset of serial.Serial used by the reader:
+# name, timeout, in_waiting, read(size), readline() and use as context manager.
+# Errors are raised as serial.SerialException, so the reader handles all sources the same way.
+
+SOURCE_FILE = "file://"     # Replay raw file content at full speed, e.g. file://C:\logs\dump.txt
+SOURCE_PTY = "pty://"       # Create POSIX pseudo terminal pair. Other programs write to the slave device
+SOURCE_COMMAND = "cmd://"   # Read stdout of subprocess, e.g. cmd://python device_simulator.py
+SOURCE_REPLAY = "replay://" # Replay saved log file with original timing, e.g. replay://C:\logs\SerialLog_x.txt
+
+# Upper limit of bytes reported as waiting for sources that are never "empty" (file replay)
+MAX_CHUNK_SIZE = 65536
+
+def openTransport(source,portSettings):
+    """Open transport based on source string.
+    Anything not matching one of the custom source prefixes is handled by pyserial,
+    which covers normal ports and URL handlers as socket://, loop:// and rfc2217://"""
+
+    timeout = portSettings[Sets.PORT_TIMEOUT]
+
+    if source.startswith(SOURCE_FILE):
+        return FileTransport(source[len(SOURCE_FILE):],timeout)
+    elif source.startswith(SOURCE_PTY):
+        return PtyTransport(timeout)
+    elif source.startswith(SOURCE_COMMAND):
+        return CommandTransport(source[len(SOURCE_COMMAND):],timeout)
+    elif source.startswith(SOURCE_REPLAY):
+        return ReplayTransport(source[len(SOURCE_REPLAY):],timeout)
+
+    try:
+        return serial.serial_for_url(source,portSettings[Sets.PORT_BAUDRATE],\
+                                     bytesize=portSettings[Sets.PORT_BYTESIZE],\
+                                     parity=portSettings[Sets.PORT_PARITY],\
+                                     stopbits=portSettings[Sets.PORT_STOPBITS],\
+                                     timeout=timeout)
+    except ValueError as e:
+        raise serial.SerialException("Not able to open " + source + ": " + str(e))
+
+def isCustomSource(source):
+    return source.startswith((SOURCE_FILE,SOURCE_PTY,SOURCE_COMMAND,SOURCE_REPLAY))
+
+
+class Transport(io.RawIOBase):
+    "Base class for non-serial transports. readline() is inherited from io.RawIOBase"
+
+    def __init__(self,name,timeout):
+        super().__init__()
+        self.name = name
+        self.timeout = timeout
+
+    def readable(self):
+        return True
+
+    def readinto(self,buffer):
+        "Same as read, but into existing buffer (used by binary capture)"
+        data = self.read(len(buffer))
+        buffer[:len(data)] = data
+        return len(data)
+
+    @property
+    def in_waiting(self):
+        return 0
+
+
+class FileTransport(Transport):
+    "Read file content as fast as possible. At end of file the transport stays open, but idle"
+
+    def __init__(self,filePath,timeout):
+        super().__init__(filePath,timeout)
+        try:
+            self._file = open(filePath,"rb")
+        except OSError as e:
+            raise serial.SerialException("Not able to open file: " + str(e))
+
+        self._fileSize = os.path.getsize(filePath)
+
+    @property
+    def in_waiting(self):
+        return min(self._fileSize - self._file.tell(),MAX_CHUNK_SIZE)
+
+    def read(self,size=1):
+        data = self._file.read(size)
+        if not data:
+            # Behave as an idle port
+            time.sleep(self.timeout)
+        return data
+
+    def close(self):
+        self._file.close()
+        super().close()
+
+
+class PtyTransport(Transport):
+    "POSIX pseudo terminal. The name of the transport is the slave device other programs can write to"
+
+    def __init__(self,timeout):
+
+        if sys.platform.startswith("win"):
+            raise serial.SerialException("Pseudo terminal source is not supported on Windows")
+
+        import tty
+        import select
+        import fcntl
+        import termios
+        self._select = select
+        self._fcntl = fcntl
+        self._termios = termios
+
+        self._masterFd, self._slaveFd = os.openpty()
+        # Raw mode, so data is not altered by the line discipline
+        tty.setraw(self._slaveFd)
+
+        super().__init__(os.ttyname(self._slaveFd),timeout)
+        traceLog(LogLevel.INFO,"Pseudo terminal created: " + self.name)
+
+    def fileno(self):
+        "Master side. Used by the asyncio I/O engine to wait for data"
+        return self._masterFd
+
+    @property
+    def in_waiting(self):
+        buffer = self._fcntl.ioctl(self._masterFd,self._termios.FIONREAD,b"\x00\x00\x00\x00")
+        return int.from_bytes(buffer,sys.byteorder)
+
+    def read(self,size=1):
+        ready,_,_ = self._select.select([self._masterFd],[],[],self.timeout)
+        if not ready:
+            return b""
+        try:
+            return os.read(self._masterFd,size)
+        except OSError as e:
+            raise serial.SerialException("Pseudo terminal read error: " + str(e))
+
+    def close(self):
+        if not self.closed:
+            os.close(self._slaveFd)
+            os.close(self._masterFd)
+        super().close()
+
+
+class CommandTransport(Transport):
+    """Read stdout (and stderr) of subprocess.
+    Pipes cannot be polled with a timeout on all platforms, so a pump thread moves data to a local buffer"""
+
+    def __init__(self,command,timeout):
+        super().__init__(command,timeout)
+
+        try:
+            self._process = subprocess.Popen(command,shell=True,stdin=subprocess.DEVNULL,stdout=subprocess.PIPE,stderr=subprocess.STDOUT,bufsize=0)
+        except OSError as e:
+            raise serial.SerialException("Not able to start command: " + str(e))
+
+        self._buffer = bytearray()
+        self._bufferCondition = threading.Condition()
+        self._processDone = False
+
+        self._pumpThread = threading.Thread(target=self._pump,daemon=True,name="CommandPump")
+        self._pumpThread.start()
+
+    @property
+    def in_waiting(self):
+        with self._bufferCondition:
+            return len(self._buffer)
+
+    def read(self,size=1):
+        with self._bufferCondition:
+            if not self._buffer:
+                if self._processDone:
+                    raise serial.SerialException("Command exited with code " + str(self._process.poll()))
+                self._bufferCondition.wait(self.timeout)
+
+            data = bytes(self._buffer[:size])
+            del self._buffer[:size]
+            return data
+
+    def close(self):
+        if self._process.poll() is None:
+            self._process.terminate()
+        super().close()
+
+    def _pump(self):
+        while True:
+            data = self._process.stdout.read(MAX_CHUNK_SIZE)
+            with self._bufferCondition:
+                if data:
+                    self._buffer += data
+                else:
+                    self._processDone = True
+                self._bufferCondition.notify()
+            if not data:
+                break
+        self._process.wait()
+
+
+class ReplayTransport(Transport):
+    """Play back saved log file with original timing.
+    Speed, pause and seek are controlled through the replay engine (see replay.getActiveEngine)"""
+
+    def __init__(self,filePath,timeout):
+        super().__init__(filePath,timeout)
+
+        try:
+            self._engine = replay.ReplayEngine(filePath)
+        except OSError as e:
+            raise serial.SerialException("Not able to open replay file: " + str(e))
+
+        self._engine.register()
+
+        self._pending = bytearray()
+
+    @property
+    def in_waiting(self):
+        if not self._pending:
+            self._pending += self._engine.getDueData(0)
+        return len(self._pending)
+
+    def read(self,size=1):
+        if not self._pending:
+            self._pending += self._engine.getDueData(self.timeout)
+        data = bytes(self._pending[:size])
+        del self._pending[:size]
+        return data
+
+    def close(self):
+        self._engine.unregister()
+        super().close()
@@ -5,6 +5,7 @@ import tkinter as tk
 from traceLog import traceLog,LogLevel
 import settings as Sets
 import spinner
+import replay
 
 import time
 
@@ -72,6 +73,7 @@ class FileView:
             self._textFrame.textArea.config(state=tk.NORMAL)
             self._textFrame.textArea.insert(tk.END, "".join(self._lines[0:self._firstDrawLines]))
             self._textFrame.textArea.config(state=tk.DISABLED)
+            self._textFrame.lineStore.extend(self._lineStoreEntries(self._lines[0:self._firstDrawLines]))
 
             self._textFrame.addAllLineColorTagsToText()
 
@@ -90,11 +92,21 @@ class FileView:
         self._textFrame.textArea.config(state=tk.NORMAL)
         self._textFrame.textArea.insert(tk.END, "".join(self._lines[self._firstDrawLines:]))
         self._textFrame.textArea.config(state=tk.DISABLED)
+        self._textFrame.lineStore.extend(self._lineStoreEntries(self._lines[self._firstDrawLines:]))
 
         self._textFrame.addAllLineColorTagsToText()
 
         self._textFrame.closeSpinner()
 
+    def _lineStoreEntries(self,lines):
+        "(payload, prefix length) of file lines. Like live lines, only the payload after the timestamp prefix is highlighted"
+        entries = list()
+        for line in lines:
+            line = line.rstrip("\n")
+            length = replay.prefixLength(line)
+            entries.append((line[length:],length))
+        return entries
+
     def _onClosing(self):
 
         self._textFrame.close()
@@ -0,0 +1,143 @@
+import tkinter as tk
+from tkinter.font import Font
+
+import settings as Sets
+import ringBuffer
+
+# Printable ASCII is shown as is, everything else as "."
+_asciiTable = bytes(byte if 32 <= byte < 127 else ord(".") for byte in range(256))
+
+def formatHexRow(position,data):
+    "Offset, hex bytes and ASCII of one row"
+    hexPart = data.hex(" ").ljust(Sets.HEX_VIEW_BYTES_PER_ROW*3-1)
+    return "%010X  %s  %s" % (position,hexPart,data.translate(_asciiTable).decode("ascii"))
+
+class HexView:
+    """Hex/ASCII dump of a binary capture ring buffer.
+    Only the rows visible in the window are rendered, so the cost does not depend on the capture size"""
+
+    def __init__(self,settings,root,port,ring:ringBuffer.RingBuffer):
+        self._settings = settings
+        self._root = root
+        self._ring = ring
+
+        self._bytesPerRow = Sets.HEX_VIEW_BYTES_PER_ROW
+
+        # Absolute row shown at the top. None follows the end of the capture
+        self._topRow = None
+        self._lastRenderState = None
+
+        self._view = tk.Toplevel(self._root)
+        self._view.title("Binary capture: " + port)
+        self._view.protocol("WM_DELETE_WINDOW", self._onClosing)
+        self._view.iconbitmap(self._settings.get(Sets.ICON_PATH_FULL))
+
+        tFont = Font(family=self._settings.get(Sets.TEXTAREA_FONT_FAMILY), size=self._settings.get(Sets.TEXTAREA_FONT_SIZE))
+
+        self._textArea = tk.Text(self._view, height=30, width=10+2+self._bytesPerRow*3+1+self._bytesPerRow, wrap=tk.NONE,\
+                                background=self._settings.get(Sets.TEXTAREA_BACKGROUND_COLOR),\
+                                foreground=self._settings.get(Sets.TEXTAREA_COLOR), font=tFont)
+        self._textArea.config(state=tk.DISABLED)
+
+        self._statusLabel = tk.Label(self._view, text="", anchor=tk.W)
+        self._statusLabel.pack(side=tk.BOTTOM, fill=tk.X)
+
+        self._scrollbar = tk.Scrollbar(self._view, orient=tk.VERTICAL, command=self._scrollCommand)
+        self._scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+
+        self._textArea.pack(anchor=tk.W, fill=tk.BOTH, expand=tk.YES)
+        self._textArea.bind("<MouseWheel>",self._mouseWheel)
+        self._textArea.bind("<Button-4>",lambda event: self._scrollRows(-3))
+        self._textArea.bind("<Button-5>",lambda event: self._scrollRows(3))
+
+        self._updateJob = self._view.after(50,self._update)
+
+    ##############
+    # Internal
+
+    def _onClosing(self):
+        self._view.after_cancel(self._updateJob)
+        self._view.destroy()
+
+    def _getVisibleRows(self):
+        lineHeight = max(Font(font=self._textArea["font"]).metrics("linespace"),1)
+        return max(self._textArea.winfo_height()//lineHeight,1)
+
+    def _getRowRange(self):
+        "Returns (first row, end row) of the data in the ring buffer"
+        first, total = self._ring.getRange()
+        return (first//self._bytesPerRow, (total + self._bytesPerRow - 1)//self._bytesPerRow)
+
+    def _setTopRow(self,row):
+        firstRow, endRow = self._getRowRange()
+        visibleRows = self._getVisibleRows()
+        if row >= endRow - visibleRows:
+            # At the end, follow new data
+            self._topRow = None
+        else:
+            self._topRow = max(row,firstRow)
+        self._render()
+
+    def _scrollRows(self,rows):
+        firstRow, endRow = self._getRowRange()
+        topRow = self._topRow
+        if topRow is None:
+            topRow = max(endRow - self._getVisibleRows(),firstRow)
+        self._setTopRow(topRow + rows)
+
+    def _scrollCommand(self,*args):
+        if args[0] == tk.MOVETO:
+            firstRow, endRow = self._getRowRange()
+            self._setTopRow(firstRow + int(float(args[1])*(endRow - firstRow)))
+        elif args[0] == tk.SCROLL:
+            rows = int(args[1])
+            if args[2] == tk.PAGES:
+                rows *= self._getVisibleRows()
+            self._scrollRows(rows)
+
+    def _mouseWheel(self,event):
+        self._scrollRows(-3 if event.delta > 0 else 3)
+        return "break"
+
+    def _render(self):
+
+        firstRow, endRow = self._getRowRange()
+        visibleRows = self._getVisibleRows()
+
+        topRow = self._topRow
+        if topRow is None or topRow < firstRow:
+            topRow = max(endRow - visibleRows,firstRow)
+
+        # Nothing to do if the window shows the same data
+        renderState = (topRow,visibleRows,self._ring.totalBytes)
+        if renderState == self._lastRenderState:
+            return
+        self._lastRenderState = renderState
+
+        position, data = self._ring.getBytes(topRow*self._bytesPerRow,visibleRows*self._bytesPerRow)
+
+        # Start of data can be overwritten while copying. Keep rows aligned
+        skip = (-position) % self._bytesPerRow
+        position += skip
+        data = data[skip:]
+
+        rows = list()
+        for offset in range(0,len(data),self._bytesPerRow):
+            rows.append(formatHexRow(position + offset,data[offset:offset+self._bytesPerRow]))
+
+        self._textArea.config(state=tk.NORMAL)
+        self._textArea.delete(1.0,tk.END)
+        self._textArea.insert(tk.END,"\n".join(rows))
+        self._textArea.config(state=tk.DISABLED)
+
+        totalRows = max(endRow - firstRow,1)
+        self._scrollbar.set((topRow - firstRow)/totalRows,min((topRow - firstRow + visibleRows)/totalRows,1.0))
+
+        status = "%d bytes captured" % self._ring.totalBytes
+        if firstRow > 0:
+            status += " (first %d bytes no longer in view buffer)" % (firstRow*self._bytesPerRow)
+        self._statusLabel.config(text=status)
+
+    def _update(self):
+        self._render()
+        self._updateJob = self._view.after(100,self._update)
@@ -3,12 +3,15 @@ import os
 import tkinter as tk
 from tkinter.font import Font
 from tkinter.colorchooser import askcolor
+from tkinter import filedialog
 from tkinter.ttk import Notebook
 
 from collections import Counter
 
 from functools import partial
 import threading
+import re
+import csv
 
 from traceLog import traceLog,LogLevel
 import settings as Sets
@@ -30,6 +33,8 @@ class OptionsView:
         self._showing = False
         self._saving = False
 
+        self._ruleCountersJob = None
+
         self._textFrame:TF.TextFrame = None
 
     def linkWorkers(self,workers):
@@ -41,6 +46,10 @@ class OptionsView:
 
     def _onClosing(self,savingSettings=False):
 
+        if self._ruleCountersJob:
+            self._view.after_cancel(self._ruleCountersJob)
+            self._ruleCountersJob = None
+
         # Delete all variable observers
         for settingsLine in list(self._setsDict.values()):
             for entry in list(settingsLine.entries.values()):
@@ -74,6 +83,7 @@ class OptionsView:
         def __init__(self,group):
             super().__init__(group)
             self.lineFrame = None
+            self.countersLabel = None
 
     class Entry:
         def __init__(self,entryType,entryVar):
@@ -120,6 +130,7 @@ class OptionsView:
     GROUP_SEARCH = "groupSearch"
     GROUP_LOGGING = "groupLogging"
     GROUP_LINE_COLORING = "groupLineColoring"
+    GROUP_FILTER = "groupFilter"
 
     EDIT_UP = "editUp"
     EDIT_DOWN = "editDown"
@@ -129,6 +140,8 @@ class OptionsView:
 
     LOG_EXAMPLE_FILE = r"appdata\log_example.txt"
 
+    RULE_COUNTERS_UPDATE_MS = 1000
+
     def _loadLogExample(self):
         log = "[12:34:56.789] Main::test\n[12:34:56.789] Main::TestTwo"
         try:
@@ -221,6 +234,12 @@ class OptionsView:
 
             deleteButton = tk.Button(self._lineColoringFrame,text="Delete",command=partial(self._editLineColorRow,self.EDIT_DELETE))
             deleteButton.grid(row=2,column=2,padx=2)
+
+            exportCountersButton = tk.Button(self._lineColoringFrame,text="Export Stats",command=self._exportRuleCounters)
+            exportCountersButton.grid(row=3,column=2,padx=2,pady=(10,0))
+
+            resetCountersButton = tk.Button(self._lineColoringFrame,text="Reset Stats",command=self._resetRuleCounters)
+            resetCountersButton.grid(row=4,column=2,padx=2)
             self._lastFocusInRowId = ""
             self._lastFocusOutRowId = ""
 
@@ -230,6 +249,27 @@ class OptionsView:
 
             self._deletedLineColorRows = list()
 
+            ###############
+            # Tab: Filter
+
+            self._filterFrame = tk.Frame(self._tabControl,padx=5,pady=5)
+            self._filterFrame.grid(row=0,column=0,sticky=tk.N)
+            self._tabControl.add(self._filterFrame, text="Filter")
+            self._tabList.append(self.GROUP_FILTER)
+
+            setLines = list()
+            setLines.append(self.SettingsLineTemplate(self.GROUP_FILTER, Sets.FILTER_INCLUDE_REGEX, "Show only lines matching", self.ENTRY_TYPE_OTHER))
+            setLines.append(self.SettingsLineTemplate(self.GROUP_FILTER, Sets.FILTER_EXCLUDE_REGEX, "Hide lines matching", self.ENTRY_TYPE_OTHER))
+
+            self._setsDict.update(self._createStandardRows(self._filterFrame,setLines,0))
+
+            # Regex entries are often empty, so width is not taken from the current settings
+            for setLine in setLines:
+                self._setsDict[setLine.setId].entries["entry"].input.config(width=40)
+
+            filterInfoLabel = tk.Label(self._filterFrame,text="Used when Hide Lines is on. Hidden lines are still logged",justify=tk.LEFT)
+            filterInfoLabel.grid(row=len(setLines),column=0,columnspan=2,sticky=tk.W,pady=(10,0))
+
             ###############
             # Tab: Text Area
 
@@ -302,6 +342,8 @@ class OptionsView:
 
             self._tabControl.bind("<<NotebookTabChanged>>",self._tabChanged)
 
+            self._updateRuleCounters()
+
 
             # print("Number of settings " + str(len(self._setsDict)))
 
@@ -369,7 +411,8 @@ class OptionsView:
             for textFrame in textFrames:
                 textFrame.deleteTextTag(deletedRowData["tagName"])
 
-        # Process added or updated line color rows
+        # Process added or updated line color rows. Added rows are highlighted in the text area in one run
+        addedRegexColors = list()
         for rowId in tempLineColorRows.keys():
             if tempLineColorRows[rowId].entries["regex"].isVarUpdated():
                 if tempLineColorRows[rowId].entries["regex"].data.entryVar:
@@ -377,8 +420,7 @@ class OptionsView:
                     for textFrame in textFrames:
                         textFrame.deleteTextTag(oldTagName)
                     # print("Delete edited row id: " + rowId)
-                for textFrame in textFrames:
-                    textFrame.createAndAddLineColorTag(tempLineColorRows[rowId].entries["regex"].var.get(),tempLineColorRows[rowId].entries["color"].var.get())
+                addedRegexColors.append((tempLineColorRows[rowId].entries["regex"].var.get(),tempLineColorRows[rowId].entries["color"].var.get()))
                 # print("Added line color row: " + rowId)
 
             elif tempLineColorRows[rowId].entries["color"].isVarUpdated():
@@ -386,6 +428,9 @@ class OptionsView:
                 for textFrame in textFrames:
                     textFrame.updateTagColor(tagName,tempLineColorRows[rowId].entries["color"].var.get())
 
+        if addedRegexColors:
+            for textFrame in textFrames:
+                textFrame.createAndAddLineColorTags(addedRegexColors)
 
         # Reorder line color tags
         rowIds = sorted(tempLineColorRows.keys())
@@ -560,6 +605,11 @@ class OptionsView:
 
         colorLine.entries[entryName] = colorEntry
 
+        # Rule counters from the highlight worker (see _updateRuleCounters)
+        colorLine.countersLabel = tk.Label(colorLine.lineFrame,text="",width=60,anchor=tk.W)
+        colorLine.countersLabel.grid(row=0,column=5)
+        colorLine.countersLabel.bind("<Button-1>",partial(self._focusInSet,rowId))
+
         return colorLine
 
     def _createStandardRows(self,parent,setLines,startRow):
@@ -695,6 +745,9 @@ class OptionsView:
         self._exampleText.tag_delete(Sets.SEARCH_MATCH_COLOR)
         self._exampleText.tag_delete(Sets.SEARCH_SELECTED_COLOR)
 
+        # Delete filter tag
+        self._exampleText.tag_delete(Sets.HIDELINE_COLOR_TAG)
+
         # Delete all current line color tags
         tagNames = self._exampleText.tag_names()
         for tagName in tagNames:
@@ -760,6 +813,24 @@ class OptionsView:
 
 
 
+        elif group == self.GROUP_FILTER:
+
+            # Lines that would be hidden are shown with the hide line color (in the example the time stamp is part of the line)
+            try:
+                includeRegex = self._setsDict[Sets.FILTER_INCLUDE_REGEX].entries[entryName].var.get()
+                excludeRegex = self._setsDict[Sets.FILTER_EXCLUDE_REGEX].entries[entryName].var.get()
+                includeSearch = re.compile(includeRegex).search if includeRegex else None
+                excludeSearch = re.compile(excludeRegex).search if excludeRegex else None
+            except re.error:
+                pass
+            else:
+                self._exampleText.tag_configure(Sets.HIDELINE_COLOR_TAG,foreground=Sets.HIDE_LINE_FONT_COLOR)
+                lastLine = int(self._exampleText.index("end-1c").split(".")[0])
+                for lineNumber in range(1,lastLine+1):
+                    line = self._exampleText.get("%d.0" % lineNumber,"%d.end" % lineNumber)
+                    if (includeSearch and not includeSearch(line)) or (excludeSearch and excludeSearch(line)):
+                        self._exampleText.tag_add(Sets.HIDELINE_COLOR_TAG,"%d.0" % lineNumber,"%d.0+1l" % lineNumber)
+
         if group == self.GROUP_LINE_COLORING or group == self.GROUP_SEARCH:
 
             # Get line color map from view
@@ -794,6 +865,53 @@ class OptionsView:
             self._exampleText.config(wrap=tk.NONE)
 
 
+    ####################################
+    # Rule Counters
+
+    def _getLineColorRuleCounters(self):
+        "(regex, counter) of each line color row in view. Counter is None for rules not counted"
+        ruleCounters = self._highlightWorker.getRuleCounters()
+        rowCounters = list()
+        for rowId in sorted(self._setsDict.keys()):
+            if Sets.LINE_COLOR_MAP in rowId:
+                regex = self._setsDict[rowId].entries["regex"].var.get()
+                rowCounters.append((rowId,regex,ruleCounters.get(TF.createLineColorTagName(regex))))
+        return rowCounters
+
+    def _updateRuleCounters(self):
+        "Show hits, cumulative and per line time of each rule. Updated while the view is open"
+
+        for rowId, regex, counter in self._getLineColorRuleCounters():
+            text = ""
+            if counter and counter.isUsed():
+                text = "Hits %d/%d, %.1f ms total, %.1f us avg, p99 < %.1f us" % \
+                        (counter.hits,counter.evaluations,counter.totalNs()/1e6,counter.meanNs()/1000,counter.percentileNs(99)/1000)
+            self._setsDict[rowId].countersLabel.config(text=text)
+
+        self._ruleCountersJob = self._view.after(self.RULE_COUNTERS_UPDATE_MS,self._updateRuleCounters)
+
+    def _resetRuleCounters(self):
+        self._highlightWorker.resetRuleCounters()
+
+    def _exportRuleCounters(self):
+        fileName = filedialog.asksaveasfilename(parent=self._view,title="Export line color stats",\
+                                                defaultextension=".csv",filetypes=(("CSV files","*.csv"),))
+        if not fileName:
+            return
+
+        try:
+            with open(fileName,"w",newline="") as file:
+                writer = csv.writer(file)
+                writer.writerow(["Regex","Evaluations","Hits","Total time (ms)","Mean (us)","P99 (us)"])
+                for _, regex, counter in self._getLineColorRuleCounters():
+                    if counter:
+                        writer.writerow([regex,counter.evaluations,counter.hits,"%.3f" % (counter.totalNs()/1e6),\
+                                         "%.3f" % (counter.meanNs()/1000),"%.3f" % (counter.percentileNs(99)/1000)])
+                    else:
+                        writer.writerow([regex,0,0,"","",""])
+        except OSError as e:
+            traceLog(LogLevel.ERROR,"Not able to export line color stats: " + str(e))
+
     ####################################
     # Entry Validation
 
@@ -834,6 +952,14 @@ class OptionsView:
                 validationStatus = entry.data.validation.status
 
 
+            # Filter regex is used by Python, not by tkinter
+            if rowId == Sets.FILTER_INCLUDE_REGEX or rowId == Sets.FILTER_EXCLUDE_REGEX:
+                try:
+                    re.compile(varIn)
+                    validationStatus = self.ENTRY_VALIDATION_OK
+                except re.error:
+                    validationStatus = self.ENTRY_VALIDATION_FAILED
+
             # Check font family
             if rowId == Sets.TEXTAREA_FONT_FAMILY:
                 if self._isValidFontFamily(varIn):
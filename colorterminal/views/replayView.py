@@ -0,0 +1,110 @@
+import os
+
+import tkinter as tk
+
+from traceLog import traceLog,LogLevel
+import settings as Sets
+import replay
+
+class ReplayView:
+    "Controls for the replay of a saved log file: pause, speed, seek and progress"
+
+    SPEEDS = ["0.5", "1", "2", "5", "10", "100", "Max"]
+
+    def __init__(self,settings,root,filePathFull):
+        self._settings = settings
+        self._root = root
+        self._filePathFull = filePathFull
+
+        self._engine:replay.ReplayEngine = None
+        self._seeking = False
+
+        self._view = tk.Toplevel(self._root,padx=10,pady=10)
+        self._view.title("Replay: " + os.path.basename(filePathFull))
+        self._view.protocol("WM_DELETE_WINDOW", self._onClosing)
+        self._view.iconbitmap(self._settings.get(Sets.ICON_PATH_FULL))
+
+        self._pauseButton = tk.Button(self._view,text="Pause",command=self._pauseButtonCommand,width=8)
+        self._pauseButton.grid(row=0,column=0,padx=(0,10))
+
+        speedLabel = tk.Label(self._view,text="Speed")
+        speedLabel.grid(row=0,column=1)
+
+        self._speedVar = tk.StringVar(self._view)
+        self._speedVar.set(self._settings.get(Sets.REPLAY_SPEED))
+        speedOption = tk.OptionMenu(self._view,self._speedVar,*self.SPEEDS,command=self._updateSpeed)
+        speedOption.grid(row=0,column=2,padx=(0,10))
+
+        self._progressLabel = tk.Label(self._view,text="Waiting for replay to start",width=40,anchor=tk.W)
+        self._progressLabel.grid(row=0,column=3,sticky=tk.W)
+
+        # Seek is done when the slider is released
+        self._seekScale = tk.Scale(self._view,from_=0,to=1000,orient=tk.HORIZONTAL,showvalue=False,length=500)
+        self._seekScale.grid(row=1,column=0,columnspan=4,sticky=tk.W+tk.E,pady=(10,0))
+        self._seekScale.bind("<ButtonPress-1>",self._seekStart)
+        self._seekScale.bind("<ButtonRelease-1>",self._seekEnd)
+
+        self._updateJob = self._view.after(50,self._updateProgress)
+
+    ##############
+    # Internal
+
+    def _onClosing(self):
+        # Replay continues until disconnect
+        self._view.after_cancel(self._updateJob)
+        self._view.destroy()
+
+    def _getSpeed(self):
+        speedString = self._speedVar.get()
+        if speedString == "Max":
+            return replay.SPEED_MAX
+        return float(speedString)
+
+    def _updateSpeed(self,*args):
+        self._settings.setOption(Sets.REPLAY_SPEED,self._speedVar.get())
+        if self._engine:
+            self._engine.setSpeed(self._getSpeed())
+
+    def _pauseButtonCommand(self):
+        if self._engine:
+            if self._engine.isPaused():
+                self._engine.resume()
+                self._pauseButton.config(text="Pause")
+            else:
+                self._engine.pause()
+                self._pauseButton.config(text="Resume")
+
+    def _seekStart(self,event):
+        self._seeking = True
+
+    def _seekEnd(self,event):
+        self._seeking = False
+        if self._engine:
+            self._engine.seek(self._seekScale.get()/1000)
+
+    def _updateProgress(self):
+
+        engine = replay.getActiveEngine(self._filePathFull)
+
+        # Engine is created when the reader opens the replay source
+        if engine and engine is not self._engine:
+            self._engine = engine
+            self._engine.setSpeed(self._getSpeed())
+            traceLog(LogLevel.DEBUG,"Replay view linked to replay engine")
+
+        if engine:
+            (position,total,offset) = engine.getProgress()
+            minutes, seconds = divmod(offset,60)
+            hours, minutes = divmod(int(minutes),60)
+            progressText = "Line %d of %d (%02d:%02d:%06.3f)" % (position,total,hours,minutes,seconds)
+            if engine.isDone():
+                progressText += " Done"
+            self._progressLabel.config(text=progressText)
+
+            if not self._seeking and total > 0:
+                self._seekScale.set(int(1000*position/total))
+
+        elif self._engine:
+            self._progressLabel.config(text="Replay stopped")
+
+        self._updateJob = self._view.after(200,self._updateProgress)
@@ -6,6 +6,31 @@ import tkinter as tk
 
 from traceLog import traceLog,LogLevel
 import settings as Sets
+import stageQueues
+from customTypes import LineKind
+
+################################
+# GUI refresh
+#
+# The worker runs on the Tk event loop. Producers must not call Tk from their threads (the GUI thread can be
+# waiting for them in stopWorker, and a Tk call from another thread waits for the GUI thread), so the put hook
+# of the GUI queue only sets a flag. The GUI looks for the flag on a timer (a flag test, no Tk call),
+# and starts a refresh when it is set.
+# Trade-off between latency and idle wake-ups: While lines arrive, the flag is checked every wake-up check
+# (10 ms). Each check that finds nothing doubles the interval, up to the idle wake-up check (100 ms).
+# So an idle window wakes up 10 times per second, and the first line after a quiet period can take up to
+# the idle wake-up check to show. Lines that follow are shown within the wake-up check.
+#
+# Each refresh (frame) adds as many lines as fit in the frame budget, based on the measured time per line.
+# Lines left are kept in the queue (where the oldest are dropped on overflow), and the next frame is run
+# right after Tk has handled input and redraw. So the window stays responsive when lines arrive faster than shown.
+
+# Time per line used before the first frame is measured (s)
+_INITIAL_LINE_TIME = 0.00002
+# Lines per frame is never below this, so a slow frame does not stop the view
+_MIN_FRAME_LINES = 50
+# Line counts in the status bar are updated at least this often, also when no lines are shown (s)
+_STATUS_UPDATE_INTERVAL = 0.1
 
 class GuiWorker:
 
@@ -15,13 +40,20 @@ class GuiWorker:
         self._root = mainView.root
         
         self._textArea = mainView.textFrame.textArea
+        # Changed together with the text area
+        self._lineStore = mainView.textFrame.lineStore
         
         self._highlightWorker = None
         self._logWriterWorker = None
+        self._lineRenderer = None
 
         self._scrollingEnabled = True
 
-        self.guiQueue = queue.Queue()
+        # Last line in window is a partial line, which is replaced by the next line
+        self._partialLineShown = False
+
+        # Display path. If the GUI is stopped (search, options save) the oldest lines are dropped
+        self.guiQueue = stageQueues.DropOldestQueue(self._settings.get(Sets.QUEUE_DISPLAY_MAX_LINES))
 
         self.guiEvent = threading.Event()
         self.guiEvent.set() # wait will not block
@@ -30,19 +62,34 @@ class GuiWorker:
 
         self._updateGuiFlag = False        
 
+        # Set by the queue put hook, from the thread doing the put
+        self._inputReady = threading.Event()
+        # Records taken from the queue but not yet shown (rest of a list larger than a frame)
+        self._pendingRecords = list()
+        # Average time to show one line (s)
+        self._lineTime = _INITIAL_LINE_TIME
+        self._lastStatusUpdate = 0
+        # Current interval (ms) of the flag check, backs off while no lines arrive
+        self._wakeupCheck = 0
+
     ##############
     # Public Interface
 
     def linkWorkers(self,workers):
         self._highlightWorker = workers.highlightWorker
         self._logWriterWorker = workers.logWriterWorker
+        self._lineRenderer = workers.processWorker.lineRenderer
 
     def startWorker(self):
 
         if self._highlightWorker != None and self._logWriterWorker != None:
             if not self._updateGuiFlag:
                 self._cancelGuiJob()
+                self._partialLineShown = False
                 self._updateGuiFlag = True
+                self.guiQueue.setPutHook(self._inputReady.set)
+                # Lines put while stopped are shown at once
+                self._inputReady.set()
                 self._updateGuiJob = self._root.after(50,self._waitForInput)
             # else:
             #     traceLog(LogLevel.ERROR,"Not able to start gui thread. Thread already enabled")
@@ -51,10 +98,11 @@ class GuiWorker:
 
 
     def stopWorker(self):
-        "Will block until GUI worker is done. GUI queue is always emptied before stop."
+        "Will block until GUI worker is done. Lines not shown stay in the GUI queue until start."
 
         self._cancelGuiJob()
         self._updateGuiFlag = False
+        self.guiQueue.setPutHook(None)
         self.guiEvent.wait()
 
     def enableScrolling(self):
@@ -66,73 +114,204 @@ class GuiWorker:
     ##############
     # Internal
 
-    def _insertLine(self,newLine):
+    def _lineSegments(self,line,prefixLength,tags):
+        """Split line at tag borders: [(text, tagNames)]. Tag positions are in the payload, after the prefix.
+        Tags with end None cover the whole line, including the newline (background fills the line)"""
+
+        lineLength = len(line)
+        ranges = list()
+        for tagName, start, end in tags:
+            if end is None:
+                ranges.append((0,lineLength,tagName))
+            else:
+                ranges.append((prefixLength + start,prefixLength + end,tagName))
+
+        borders = sorted(set([0,lineLength] + [start for start,_,_ in ranges] + [end for _,end,_ in ranges]))
+
+        segments = list()
+        for segmentStart, segmentEnd in zip(borders,borders[1:]):
+            tagNames = list()
+            for start, end, tagName in ranges:
+                if start <= segmentStart and segmentEnd <= end and tagName not in tagNames:
+                    tagNames.append(tagName)
+            segments.append((line[segmentStart:segmentEnd],tuple(tagNames)))
+        return segments
+
+    def _renderBatch(self,records):
+        """Lines to add to the window for records: (clear window, lines to delete from end, new lines).
+        New lines are (line, payload, prefixLength, tags). Partial lines and hide info lines
+        replace the last line, also when it was added in the same batch"""
+
+        clearWindow = False
+        deleteFromEnd = 0
+        newLines = list()
+
+        def replaceLastLine():
+            nonlocal deleteFromEnd
+            if newLines:
+                newLines.pop()
+            else:
+                deleteFromEnd += 1
+
+        for record in records:
+            # Filter changed, lines in window are replaced by the lines that follow
+            if record.kind == LineKind.RESET:
+                clearWindow = True
+                deleteFromEnd = 0
+                newLines = list()
+                self._partialLineShown = False
+                continue
+
+            # A partial line is grown in place, and finally replaced by the completed line
+            if self._partialLineShown:
+                if record.updatePreviousLine:
+                    replaceLastLine()
+                replaceLastLine()
+            elif record.updatePreviousLine:
+                replaceLastLine()
+
+            self._partialLineShown = record.kind == LineKind.PARTIAL
+
+            # Line records are only rendered here
+            prefix = self._lineRenderer.prefix(record)
+            newLines.append((prefix + record.payload + "\n",record.payload,len(prefix),record.tags))
+
+        return clearWindow, deleteFromEnd, newLines
+
+    def _insertLines(self,newLines):
+        "Add lines at end of window with a single insert. Text of lines next to each other with the same tags is joined"
+
+        # [(tagNames, texts)]
+        runs = list()
+        for line, payload, prefixLength, tags in newLines:
+            if tags:
+                segments = self._lineSegments(line,prefixLength,tags)
+            else:
+                segments = ((line,()),)
+            for text, tagNames in segments:
+                if runs and runs[-1][0] == tagNames:
+                    runs[-1][1].append(text)
+                else:
+                    runs.append((tagNames,[text]))
+
+        insertArgs = list()
+        for tagNames, texts in runs:
+            insertArgs.append("".join(texts))
+            insertArgs.append(tagNames)
+
+        self._textArea.insert(tk.END,*insertArgs)
+        self._lineStore.extend([(payload,prefixLength) for _, payload, prefixLength, _ in newLines])
+
+    def _deleteLastLines(self,count):
+        count = min(count,len(self._lineStore))
+        if count > 0:
+            firstDeletedLine = len(self._lineStore) - count + 1
+            self._textArea.delete("%d.0" % firstDeletedLine,"end-1c")
+            for _ in range(count):
+                self._lineStore.deleteLast()
+
+    def _trimLines(self):
+        """Limit number of lines in window. Deleting lines at the top makes Tk move all lines and tags,
+        so lines are deleted in large steps: Down to max line buffer minus trim lines, when max is passed"""
+        maxLines = self._settings.get(Sets.TEXTAREA_MAX_LINE_BUFFER)
+        if len(self._lineStore) > maxLines:
+            trimLines = min(self._settings.get(Sets.TEXTAREA_TRIM_LINES),maxLines // 2)
+            linesToDelete = len(self._lineStore) - maxLines + trimLines
+            self._textArea.delete(1.0,"%d.0" % (linesToDelete + 1))
+            self._lineStore.deleteFirst(linesToDelete)
 
-        # Control window scolling
-        bottomVisibleLine = int(self._textArea.index("@0,%d" % self._textArea.winfo_height()).split(".")[0])
-        endLine = int(self._textArea.index(tk.END).split(".")[0])
+    ##############
+    # Main Worker
 
-        self._textArea.insert(tk.END, newLine)
-        if self._scrollingEnabled and (bottomVisibleLine >= (endLine-2)):
-            self._textArea.see(tk.END)
+    def _takeRecords(self,maxLines):
+        "Take up to maxLines records, first the records pending, then from the queue"
 
-        # Limit number of lines in window
-        if (endLine-1) > self._settings.get(Sets.TEXTAREA_MAX_LINE_BUFFER):
-            self._textArea.delete(1.0,2.0)
+        receivedLines = self._pendingRecords
+        self._pendingRecords = list()
 
-    def _updateLastLine(self,newLine):
-        lastline = self._textArea.index("end-2c").split(".")[0]
-        self._textArea.delete(lastline + ".0",lastline +".0+1l")
-        self._textArea.insert(lastline + ".0", newLine)
-        # I don't think there is a need for scrolling?
+        while len(receivedLines) < maxLines:
+            try:
+                msg = self.guiQueue.get_nowait()
+            except queue.Empty:
+                break
+            self.guiQueue.task_done()
+            # Lines arrive as a list per batch
+            if isinstance(msg,list):
+                receivedLines.extend(msg)
+            else:
+                receivedLines.append(msg)
 
-    ##############
-    # Main Worker
+        # Rest of a large list is shown in the next frame
+        if len(receivedLines) > maxLines:
+            self._pendingRecords = receivedLines[maxLines:]
+            del receivedLines[maxLines:]
+
+        return receivedLines
 
     def _updateGUI(self):
+        "Show lines for one frame. Returns True if there are more lines to show"
+
+        frameBudget = self._settings.get(Sets.GUI_FRAME_BUDGET) / 1000
+        maxLines = max(int(frameBudget / self._lineTime),_MIN_FRAME_LINES)
 
-        receivedLines = list()
+        frameStart = time.perf_counter()
+        receivedLines = self._takeRecords(maxLines)
 
-        lastline = 0
+        if receivedLines:
+            self._showRecords(receivedLines)
+            lineTime = (time.perf_counter() - frameStart) / len(receivedLines)
+            self._lineTime = self._lineTime * 0.7 + lineTime * 0.3
 
-        lastLineAtStart = int(self._textArea.index("end-2c").split(".")[0])
-        linesInserted = 0
+        return bool(self._pendingRecords) or not self.guiQueue.empty()
 
-        try:
-            # We make sure that the queue is empty before continuing (was used with reloadLineBuffer. Likely not needed anymore)
-            while True:
-                receivedLines.append(self.guiQueue.get_nowait())
-                self.guiQueue.task_done()
+    def _showRecords(self,receivedLines):
 
+        # Line count is known from the line store, so the window is only asked for the scroll position
+        # (an empty window has one empty line)
+        lastLineAtStart = max(len(self._lineStore),1)
 
-        except queue.Empty:
+        clearWindow, deleteFromEnd, newLines = self._renderBatch(receivedLines)
 
-            # Open text widget for editing
-            self._textArea.config(state=tk.NORMAL)
+        # Scroll with new lines only if the end of the window is shown
+        bottomVisibleLine = int(self._textArea.index("@0,%d" % self._textArea.winfo_height()).split(".")[0])
+        scrollToEnd = self._scrollingEnabled and bottomVisibleLine >= lastLineAtStart
 
-            for msg in receivedLines:
-                if msg.updatePreviousLine:
-                    self._updateLastLine(msg.line)
-                else:
-                    self._insertLine(msg.line)
-                    linesInserted += 1
+        # Open text widget for editing
+        self._textArea.config(state=tk.NORMAL)
 
-                # Highlight/color text
-                lastline = self._textArea.index("end-2c").split(".")[0]
-                for lineTag in msg.lineTags:
-                    self._textArea.tag_add(lineTag[0],lastline + "." + str(lineTag[1]),lastline + "." + str(lineTag[2]))
+        if clearWindow:
+            self._textArea.delete(1.0,tk.END)
+            self._lineStore.clear()
+        elif deleteFromEnd:
+            self._deleteLastLines(deleteFromEnd)
 
-            # Disable text widget edit
-            self._textArea.config(state=tk.DISABLED)
+        if newLines:
+            self._insertLines(newLines)
 
-        lastLineAtEnd = int(self._textArea.index("end-2c").split(".")[0])
+        self._trimLines()
 
-        if receivedLines:
-            self._mainView.bottomFrame.updateWindowBufferLineCount(lastline)
-            self._mainView.bottomFrame.updateLogFileLineCount(self._logWriterWorker.linesInLogFile)
+        # Disable text widget edit
+        self._textArea.config(state=tk.DISABLED)
+
+        if scrollToEnd:
+            self._textArea.see(tk.END)
 
-            numberOfLinesDeleted = linesInserted - (lastLineAtEnd - lastLineAtStart)
-            self._mainView.textFrame.searchLinesAdded(numberOfLinesAdded=linesInserted,numberOfLinesDeleted=numberOfLinesDeleted,lastLine=lastLineAtEnd)
+        lastLineAtEnd = max(len(self._lineStore),1)
+
+        self._updateStatus()
+
+        if clearWindow:
+            linesInserted = len(newLines)
+        else:
+            linesInserted = len(newLines) - deleteFromEnd
+        numberOfLinesDeleted = linesInserted - (lastLineAtEnd - lastLineAtStart)
+        self._mainView.textFrame.searchLinesAdded(numberOfLinesAdded=linesInserted,numberOfLinesDeleted=numberOfLinesDeleted,lastLine=lastLineAtEnd)
+
+    def _updateStatus(self):
+        self._lastStatusUpdate = time.monotonic()
+        droppedLines = self.guiQueue.droppedLines + self._highlightWorker.highlightQueue.droppedLines
+        self._mainView.bottomFrame.updateWindowBufferLineCount(max(len(self._lineStore),1),droppedLines)
+        self._mainView.bottomFrame.updateLogFileLineCount(self._logWriterWorker.linesInLogFile)
 
     def _cancelGuiJob(self):
         if self._updateGuiJob:
@@ -142,6 +321,24 @@ class GuiWorker:
     def _waitForInput(self):
         self.guiEvent.clear()
         if self._updateGuiFlag:
-            self._updateGUI()
-            self._updateGuiJob = self._root.after(100,self._waitForInput)
+            moreLines = False
+            hadInput = self._inputReady.is_set() or self._pendingRecords
+            if hadInput:
+                # Cleared before the queue is read, so a put during the frame sets it again
+                self._inputReady.clear()
+                moreLines = self._updateGUI()
+
+            if moreLines:
+                # Next frame when Tk has handled input and redraw
+                self._inputReady.set()
+                self._updateGuiJob = self._root.after(1,self._waitForInput)
+            else:
+                # Log file line count changes also when no lines are shown
+                if time.monotonic() - self._lastStatusUpdate >= _STATUS_UPDATE_INTERVAL:
+                    self._updateStatus()
+                if hadInput:
+                    self._wakeupCheck = self._settings.get(Sets.GUI_WAKEUP_CHECK)
+                else:
+                    self._wakeupCheck = min(max(self._wakeupCheck,1) * 2,self._settings.get(Sets.GUI_IDLE_WAKEUP_CHECK))
+                self._updateGuiJob = self._root.after(self._wakeupCheck,self._waitForInput)
         self.guiEvent.set()
@@ -0,0 +1,92 @@
+import multiprocessing
+
+import ruleEngine
+
+################################
+# Process pool for line color rules
+#
+# With many line color rules, matching the rules is the main cost of the highlight stage,
+# and one thread can only use one core (GIL). The pool matches batches of lines in worker processes.
+#
+# Each task holds (rules version, rule set, lines). Workers keep the rule engine of the last version,
+# so rules are only compiled again after an update. Rule set is the arguments of ruleEngine.RuleEngine.
+# Results are returned in the same order as the lines, one list of (tagName, start, end) per line.
+# When rule counters are used, each task also returns the counters of its lines, which are added to the counters given.
+#
+# This module (and ruleEngine) has no other imports from ColorTerminal, so worker processes start fast.
+# "spawn" is used on all platforms (as on Windows), so workers never inherit GUI state from a fork.
+
+# Rule engine of worker process: (version, engine, rule counters)
+_workerEngine = (None, None, None)
+
+def _locateColorTagsInChunk(task):
+    "Run in worker process. Returns (tags of each line, rule counters or None)"
+    global _workerEngine
+
+    version, ruleSet, countRules, lines = task
+
+    if _workerEngine[0] != version:
+        ruleCounters = dict() if countRules else None
+        _workerEngine = (version, ruleEngine.RuleEngine(*ruleSet,ruleCounters=ruleCounters), ruleCounters)
+
+    _, engine, ruleCounters = _workerEngine
+    results = engine.locateLines(lines)
+
+    if ruleCounters is None:
+        return results, None
+
+    # Counters are sent once, and counting starts again from zero
+    usedCounters = dict()
+    for tagName, counter in ruleCounters.items():
+        if counter.isUsed():
+            usedCounters[tagName] = counter.copy()
+            counter.reset()
+    return results, usedCounters
+
+class HighlightPool:
+
+    def __init__(self,processes,chunkSize):
+        self.processes = processes
+        self._chunkSize = max(chunkSize,1)
+
+        self._pool = None
+
+        # (version, rule set, count rules). Replaced as one object, so a task never gets the version of other rules
+        self._ruleSet = (0, ([],), False)
+
+    ##############
+    # Public Interface
+
+    def start(self):
+        if self._pool is None:
+            self._pool = multiprocessing.get_context("spawn").Pool(self.processes)
+
+    def close(self):
+        "Stop worker processes. Will block until they are done"
+        if self._pool is not None:
+            self._pool.terminate()
+            self._pool.join()
+            self._pool = None
+
+    def isStarted(self):
+        return self._pool is not None
+
+    def setRules(self,rules,allMatches=False,maxSpans=64,countRules=False):
+        "Rules as list of (tagName, regex), see ruleEngine. Tasks sent after this use the new rules"
+        self._ruleSet = (self._ruleSet[0] + 1, (list(rules),allMatches,maxSpans), countRules)
+
+    def locateColorTags(self,lines,ruleCounters=None):
+        """Returns one list of (tagName, start, end) per line, in the same order as lines.
+        Rule counters of the workers are added to ruleCounters (dict of ruleEngine.RuleCounter by tagName)"""
+
+        version, ruleSet, countRules = self._ruleSet
+        tasks = [(version, ruleSet, countRules, lines[index:index+self._chunkSize]) \
+                    for index in range(0,len(lines),self._chunkSize)]
+
+        results = list()
+        for chunkResults, chunkCounters in self._pool.imap(_locateColorTagsInChunk,tasks):
+            results.extend(chunkResults)
+            if chunkCounters and ruleCounters is not None:
+                for tagName, counter in chunkCounters.items():
+                    ruleCounters.setdefault(tagName,ruleEngine.RuleCounter()).merge(counter)
+        return results
@@ -1,12 +1,18 @@
 
-import queue
+import os
 import threading
+import collections
 
 import re
 
 from traceLog import traceLog,LogLevel
 import settings as Sets
-from customTypes import PrintLine
+import stageQueues
+import ruleEngine
+import lineFilter
+import timeStamp
+from customTypes import LineKind,LineRecord
+from workers import highlightPool
 
 # from frames import textFrame
 
@@ -20,21 +26,37 @@ class HighlightWorker():
 
         self._lineColorMap = dict()
 
+        # Built from the line color map on each start. Replaced, never changed, so a batch always uses one set of rules
+        self._ruleEngine = ruleEngine.RuleEngine([])
+        self._fileNamePattern = None
+
+        # Counters of each line color rule by tagName (ruleEngine.RuleCounter). Kept when the rules are reloaded
+        self._ruleCounters = dict()
+
         self._guiWorker = None
 
+        # Built from settings on each start, replaced in the same way as the rule engine
+        self._lineFilter = lineFilter.LineFilter()
+        self._hideLinesFlag = self._settings.get(Sets.FILTER_HIDE_LINES) == Sets.FILTER_ON
         self._consecutiveLinesHidden = 0
 
-        ################
-        # Temp setup for testing
-        self._hideLineMap = list()
-        self._hideLineMap.append("GUI::.*")
-        self._hideLineMap.append("Main::.*")
-        self._hideLinesFlag = False
-        ################
+        # Lines received (also hidden lines), so the view can be shown again when the filter changes,
+        # without reading the port again. Partial lines are not kept, they are replaced by the completed line
+        self._history = collections.deque(maxlen=max(self._settings.get(Sets.FILTER_HISTORY_LINES),0))
+        self._rerenderRequested = False
 
         self._highlightFlag = False
 
-        self.highlightQueue = queue.Queue()
+        # Optional process pool for line color rules (see linkWorkers)
+        self._highlightPool = None
+        self._usePool = False
+
+        # Highlight runs in the process thread when the stages are fused (see linkWorkers)
+        self._fused = False
+        self._highlightThread = None
+
+        # Display path. If the view falls behind, the oldest lines are dropped from the view (they are still logged)
+        self.highlightQueue = stageQueues.DropOldestQueue(self._settings.get(Sets.QUEUE_DISPLAY_MAX_LINES))
 
 
     ##############
@@ -42,6 +64,17 @@ class HighlightWorker():
 
     def linkWorkers(self,workers):
         self._guiWorker = workers.guiWorker
+
+        # Pipeline topology
+        if workers.topology.fuseHighlight:
+            self._fused = True
+            self.highlightQueue = stageQueues.InlineStage(self._settings.get(Sets.QUEUE_DISPLAY_MAX_LINES))
+
+        if workers.topology.highlightPool:
+            poolProcesses = self._settings.get(Sets.HIGHLIGHT_POOL_PROCESSES)
+            if poolProcesses <= 0:
+                poolProcesses = os.cpu_count() or 1
+            self._highlightPool = highlightPool.HighlightPool(poolProcesses,self._settings.get(Sets.HIGHLIGHT_POOL_CHUNK_SIZE))
     
     def startWorker(self):
 
@@ -49,10 +82,18 @@ class HighlightWorker():
             if not self._highlightFlag:
 
                 self._reloadLineColorMap()
+                filterChanged = self._reloadLineFilter()
 
                 self._highlightFlag = True
-                self._highlightThread = threading.Thread(target=self._highlightWorker,daemon=True,name="Highlight")
-                self._highlightThread.start()
+                if self._fused:
+                    # Lines waiting since stop are highlighted here, new lines in the thread putting them
+                    self.highlightQueue.resume(self._highlightItems)
+                else:
+                    self._highlightThread = threading.Thread(target=self._highlightWorker,daemon=True,name="Highlight")
+                    self._highlightThread.start()
+
+                if filterChanged:
+                    self._requestRerender()
                 # print("Highlight worker started")
             else:
                 traceLog(LogLevel.ERROR,"Not able to start higlight thread. Thread already enabled")
@@ -63,6 +104,12 @@ class HighlightWorker():
         "Stop highlight worker. Will block until thread is done"
 
         if self._highlightFlag:
+            if self._fused:
+                # Nothing is waiting in the queue while resumed
+                self.highlightQueue.pause()
+                self._highlightFlag = False
+                return
+
             if emptyQueue:
                 self.highlightQueue.join()
 
@@ -71,12 +118,29 @@ class HighlightWorker():
             if self._highlightThread.is_alive():
                 self._highlightThread.join()
 
+    def closePool(self):
+        "Stop highlight pool processes. Will block until they are done"
+        if self._highlightPool:
+            self._highlightPool.close()
+
     def toggleHideLines(self):
-        if self._hideLinesFlag:
-            self._hideLinesFlag = False
-        else:
-            self._hideLinesFlag = True
-                
+        "Turn line filter on or off. Returns new state. View is shown again from history"
+        self._hideLinesFlag = not self._hideLinesFlag
+        self._requestRerender()
+        return self._hideLinesFlag
+
+    def getRuleCounters(self):
+        "Copy of the counters of each line color rule: dict of ruleEngine.RuleCounter by tagName"
+        return {tagName:counter.copy() for tagName,counter in list(self._ruleCounters.items())}
+
+    def resetRuleCounters(self):
+        for counter in list(self._ruleCounters.values()):
+            counter.reset()
+
+    def clearHistory(self):
+        "Lines received until now are not shown again when the filter changes"
+        self._history.clear()
+
 
     ##############
     # Internal
@@ -84,101 +148,190 @@ class HighlightWorker():
     def _reloadLineColorMap(self):
         self._lineColorMap = self._mainView.textFrame.getLineColorMap()
 
-    def _locateLineTags(self,line):
-        # Locate highlights
-        highlights = list()
-        for lineColorRowId in self._lineColorMap.keys():            
-            match = re.search(self._lineColorMap[lineColorRowId]["regex"],line)
-            if match:
-                highlights.append((self._lineColorMap[lineColorRowId]["tagName"],match.start(),match.end()))
-
-        match = re.search(Sets.connectLineRegex,line)
-        if match:
-            highlights.append((Sets.CONNECT_COLOR_TAG,"0","0+1l"))
-
-        match = re.search(Sets.disconnectLineRegex,line)
-        if match:
-            highlights.append((Sets.DISCONNECT_COLOR_TAG,"0","0+1l"))
-            
-            fileNameRegex = self._settings.get(Sets.LOG_FILE_BASE_NAME) + ".*" + Sets.LOG_FILE_TYPE
-            fileNameMatch = re.search(fileNameRegex,line)
+        rules = [(self._lineColorMap[rowId]["tagName"],self._lineColorMap[rowId]["regex"]) for rowId in self._lineColorMap.keys()]
+
+        allMatches = self._settings.get(Sets.HIGHLIGHT_ALL_MATCHES)
+        maxSpans = self._settings.get(Sets.HIGHLIGHT_MAX_SPANS_PER_LINE)
+
+        countRules = self._settings.get(Sets.HIGHLIGHT_RULE_COUNTERS)
+
+        # Counters of rules no longer used are removed
+        tagNames = set(tagName for tagName,_ in rules)
+        for tagName in list(self._ruleCounters.keys()):
+            if tagName not in tagNames:
+                del self._ruleCounters[tagName]
+
+        newRuleEngine = ruleEngine.RuleEngine(rules,allMatches,maxSpans,self._ruleCounters if countRules else None)
+        for tagName,regex,error in newRuleEngine.invalidRules:
+            traceLog(LogLevel.WARNING,"Line color regex not valid, rule skipped: %s (%s)" % (regex, error))
+
+        # Log file name in disconnect lines (link)
+        self._fileNamePattern = re.compile(re.escape(self._settings.get(Sets.LOG_FILE_BASE_NAME)) + ".*" + re.escape(Sets.LOG_FILE_TYPE))
+        self._ruleEngine = newRuleEngine
+
+        self._usePool = False
+        if self._highlightPool and len(rules) >= self._settings.get(Sets.HIGHLIGHT_POOL_MIN_RULES):
+            # Workers build the new rule engine on their next task
+            self._highlightPool.setRules(rules,allMatches,maxSpans,countRules)
+            self._usePool = True
+
+    def _reloadLineFilter(self):
+        "Returns True if lines may be shown differently with the new filter"
+
+        newLineFilter = lineFilter.LineFilter(self._settings.get(Sets.FILTER_INCLUDE_REGEX),self._settings.get(Sets.FILTER_EXCLUDE_REGEX))
+        for regex,error in newLineFilter.invalidPatterns:
+            traceLog(LogLevel.WARNING,"Filter regex not valid, not used: %s (%s)" % (regex, error))
+
+        hideLinesFlag = self._settings.get(Sets.FILTER_HIDE_LINES) == Sets.FILTER_ON
+
+        filterChanged = newLineFilter.config != self._lineFilter.config or hideLinesFlag != self._hideLinesFlag
+
+        self._lineFilter = newLineFilter
+        self._hideLinesFlag = hideLinesFlag
+
+        return filterChanged
+
+    def _requestRerender(self):
+        self._rerenderRequested = True
+        # Empty batch wakes the highlight stage, so the history is shown in order with new lines
+        if self._fused:
+            # The inline stage runs the highlight stage in the thread doing the put. The history is not shown from
+            # the GUI thread (filter and tag of the whole window), so the put is done in a thread of its own.
+            # The inline stage serializes it with the puts of the process thread
+            threading.Thread(target=self.highlightQueue.put,args=([],),daemon=True,name="Rerender").start()
+        else:
+            self.highlightQueue.put([])
+
+    def _startPool(self):
+        "Start pool processes on first use. Falls back to highlight thread if not possible"
+        if not self._highlightPool.isStarted():
+            try:
+                self._highlightPool.start()
+                traceLog(LogLevel.INFO,"Highlight pool started with %d processes" % self._highlightPool.processes)
+            except Exception as e:
+                traceLog(LogLevel.ERROR,"Not able to start highlight pool. Using highlight thread: " + str(e))
+                self._highlightPool = None
+                self._usePool = False
+
+    def _locateBatchColorTags(self,newRecords):
+        "Color tags of each record. None for records handled in this thread"
+
+        if self._usePool:
+            self._startPool()
+
+        if not self._usePool:
+            return [None]*len(newRecords)
+
+        return self._highlightPool.locateColorTags([record.payload for record in newRecords],self._ruleCounters)
+
+    def _locateLineTags(self,record,colorTags=None):
+        # Locate highlights. Positions are in the payload, timestamp and port are not part of it
+        if colorTags is None:
+            highlights = self._ruleEngine.locate(record.payload)
+        else:
+            highlights = list(colorTags)
+
+        # Status lines are known from their kind, so no regex is needed to find them
+        if record.kind == LineKind.CONNECT:
+            highlights.append((Sets.CONNECT_COLOR_TAG,0,None))
+
+        elif record.kind == LineKind.DISCONNECT:
+            highlights.append((Sets.DISCONNECT_COLOR_TAG,0,None))
+
+            fileNameMatch = self._fileNamePattern.search(record.payload)
             if fileNameMatch:
-                # print("File name: " + fileNameMatch.group(0))
                 highlights.append((Sets.LOG_FILE_LINK_TAG,fileNameMatch.start(),fileNameMatch.end()))
 
-
         return highlights
 
-    def _getHideLineColorTags(self):
-        highlights = list()
-        highlights.append((Sets.HIDELINE_COLOR_TAG,"0","0+1l"))
-        return highlights
+    def _isHidden(self,record):
+        # Only complete lines are hidden. Partial lines are always shown (and not counted as hidden lines)
+        return self._hideLinesFlag and record.kind == LineKind.LINE and self._lineFilter.isHidden(record.payload)
 
-    def _hideLines(self,line):
+    def _filterRecords(self,records):
+        "Records to show. Each run of hidden lines is shown as one hide info line with the number of lines"
 
-        if self._hideLinesFlag:
-            tempConsecutiveLinesHidden = 0
+        shownRecords = list()
+        for record in records:
 
-            for keys in self._hideLineMap:
-                match = re.search(keys,line)
-                if match:
-                    tempConsecutiveLinesHidden = 1
-                    break
+            if not self._isHidden(record):
+                if record.kind != LineKind.PARTIAL:
+                    self._consecutiveLinesHidden = 0
+                shownRecords.append(record)
+                continue
 
-            if tempConsecutiveLinesHidden == 1:
-                self._consecutiveLinesHidden += 1
+            self._consecutiveLinesHidden += 1
+
+            # Hide info line replaces the previous hide info line, when more than one line in a row is hidden
+            hiddenRecord = LineRecord(LineKind.HIDDEN,record.timestamp,record.delta,"Lines hidden: " + str(self._consecutiveLinesHidden),record.port,\
+                                      [(Sets.HIDELINE_COLOR_TAG,0,None)],self._consecutiveLinesHidden > 1)
+
+            # Within a batch only the last count is sent, so the GUI does not update the line once per hidden line
+            if shownRecords and shownRecords[-1].kind == LineKind.HIDDEN:
+                hiddenRecord.updatePreviousLine = shownRecords[-1].updatePreviousLine
+                shownRecords[-1] = hiddenRecord
             else:
-                self._consecutiveLinesHidden = 0
-        else:
-            self._consecutiveLinesHidden = 0
+                shownRecords.append(hiddenRecord)
 
-        return self._consecutiveLinesHidden
+        return shownRecords
 
-    def _getTimeStamp(self,line):
+    def _tagRecords(self,records):
+        "Add highlight tags to records. Hide info lines already have their tag"
 
-        # This is based on the settings of ColorTerminal
-        # If you load a log file from another program, this might not work
+        records = [record for record in records if record.kind != LineKind.HIDDEN]
+        if records:
+            batchColorTags = self._locateBatchColorTags(records)
+            for record,colorTags in zip(records,batchColorTags):
+                record.tags = self._locateLineTags(record,colorTags)
 
-        match = re.search(Sets.timeStampRegex,line)
-        if match:
-            return match.group(0)
-        else:
-            return ""
+    def _rerenderHistory(self):
+        "Records to show all lines in history again with the current filter, starting with a window clear"
+
+        self._consecutiveLinesHidden = 0
+
+        # Only lines that fit in the window are tagged
+        shownRecords = self._filterRecords(list(self._history))[-self._settings.get(Sets.TEXTAREA_MAX_LINE_BUFFER):]
+        self._tagRecords(shownRecords)
+
+        return [LineRecord(LineKind.RESET,timeStamp.now(),0,"")] + shownRecords
 
     ##############
     # Main Worker
 
     def _highlightWorker(self):
 
+        batchSize = self._settings.get(Sets.PIPELINE_HIGHLIGHT_BATCH_SIZE)
+        batchAge = self._settings.get(Sets.PIPELINE_HIGHLIGHT_BATCH_AGE)/1000
+
         while self._highlightFlag:
 
             ######
-            # Get new line from queue
-            newLine = ""
-            try:
-                newLine = self.highlightQueue.get(True,0.2)
-                self.highlightQueue.task_done()
+            # Get new lines from queue
+            items = self.highlightQueue.getBatch(batchSize,batchAge,0.2)
 
-            except queue.Empty:
-                pass
+            if items or self._rerenderRequested:
+                self._highlightItems(items)
 
-            ######
-            # Process new line
-            if newLine:
-            
-                consecutiveLinesHidden = self._hideLines(newLine)
-                if consecutiveLinesHidden == 0:
-                    lineTags = self._locateLineTags(newLine)
-                    pLine = PrintLine(newLine,lineTags)
-                else:
-                    hideInfoLine = self._getTimeStamp(newLine) + " Lines hidden: " + str(consecutiveLinesHidden) + "\n"
-                    lineTags = self._getHideLineColorTags()
-                    if consecutiveLinesHidden > 1:
-                        pLine = PrintLine(hideInfoLine,lineTags,True)
-                    else:
-                        pLine = PrintLine(hideInfoLine,lineTags,False)
+    def _highlightItems(self,items):
+        "Highlight queue items and forward them to the GUI as one list. Runs in the process thread when the stages are fused"
+
+        # Items are batches of line records from the process stage, or single records (connect and disconnect lines)
+        newRecords = list()
+        for item in items:
+            if isinstance(item,list):
+                newRecords.extend(item)
+            else:
+                newRecords.append(item)
 
-                self._guiWorker.guiQueue.put(pLine)
+        self._history.extend([record for record in newRecords if record.kind != LineKind.PARTIAL])
 
-                
+        if self._rerenderRequested:
+            # New lines are part of the history, so they are shown as well
+            self._rerenderRequested = False
+            self._guiWorker.guiQueue.put(self._rerenderHistory())
 
+        elif newRecords:
+            # Hidden lines are not tagged
+            shownRecords = self._filterRecords(newRecords)
+            self._tagRecords(shownRecords)
+            self._guiWorker.guiQueue.put(shownRecords)
@@ -1,13 +1,17 @@
 
 import os
+import re
+import contextlib
 
 import queue
 import threading
+import asyncio
 
 import datetime
 
 from traceLog import traceLog,LogLevel
 import settings as Sets
+import stageQueues
 
 
 class LogWriterWorker:
@@ -19,17 +23,43 @@ class LogWriterWorker:
         self._logFlag = False
 
         self._logThread = None
-        self.logQueue = queue.Queue()
+        self._logFuture = None
+        self.logQueue = stageQueues.SpillQueue(self._settings.get(Sets.QUEUE_LOG_MEMORY_LINES),"log")
+
+        self._ports = list()
+
+        # Log lines arrive as line records and are rendered here
+        self._lineRenderer = None
+
+        # Only set when the asyncio I/O engine is used
+        self._ioLoop = None
+        self._logEvent = None
+
+        self._filenames = dict()
+        self._fullFilenames = dict()
+        self._fileStack = None
+        self._files = dict()
 
         self.linesInLogFile = 0
-        self.lastLogFileInfo = ""
+        self.lastLogFileInfos = list()
+
+    def linkWorkers(self,workers):
+        self._ioLoop = workers.ioLoop
+        self._lineRenderer = workers.processWorker.lineRenderer
+
+    def setPorts(self,ports):
+        "Ports in connection. A log file is written for each port"
+        self._ports = list(ports)
 
     def startWorker(self):
 
         if not self._logFlag:
             self._logFlag = True
-            self._logThread = threading.Thread(target=self._logWriterWorker,daemon=True,name="Log")
-            self._logThread.start()
+            if self._ioLoop:
+                self._logFuture = self._ioLoop.runCoroutine(self._logWriterCoroutine())
+            else:
+                self._logThread = threading.Thread(target=self._logWriterWorker,daemon=True,name="Log")
+                self._logThread.start()
         else:
             traceLog(LogLevel.ERROR,"Not able to start log thread. Thread already enabled")
 
@@ -44,35 +74,117 @@ class LogWriterWorker:
 
             self._logFlag = False
 
+            if self._logFuture:
+                self._ioLoop.call(self._wakeLogWriter)
+                self._logFuture.result()
+                self._logFuture = None
+
             if self._logThread:
                 if self._logThread.is_alive():
                     self._logThread.join()
 
-    def _logWriterWorker(self):
+    def _getPortFileTag(self,port):
+        # Port names can contain path separators (/dev/ttyUSB0) and URL characters (socket://host:port)
+        return re.sub(r"[^\w.-]+","_",port).strip("_")
+
+    def _openLogFiles(self):
 
         timestamp = datetime.datetime.now().strftime(self._settings.get(Sets.LOG_FILE_TIMESTAMP))
 
-        filename = self._settings.get(Sets.LOG_FILE_BASE_NAME) + timestamp + Sets.LOG_FILE_TYPE
-        fullFilename = os.path.join(self._settings.get(Sets.CT_HOMEPATH_FULL),self._settings.get(Sets.LOG_FILE_PATH),filename)
+        # One log file per port. Port is only added to the file name when more than one port is connected
+        self._filenames = dict()
+        self._fullFilenames = dict()
+        for port in self._ports:
+            filename = self._settings.get(Sets.LOG_FILE_BASE_NAME) + timestamp
+            if len(self._ports) > 1:
+                filename += "_" + self._getPortFileTag(port)
+            # Binary ports are captured without any changes to the data
+            if self._settings.isBinary(port):
+                filename += Sets.LOG_FILE_BINARY_TYPE
+            else:
+                filename += Sets.LOG_FILE_TYPE
+
+            self._filenames[port] = filename
+            self._fullFilenames[port] = os.path.join(self._settings.get(Sets.CT_HOMEPATH_FULL),self._settings.get(Sets.LOG_FILE_PATH),filename)
 
-        os.makedirs(os.path.dirname(fullFilename), exist_ok=True)
+            os.makedirs(os.path.dirname(self._fullFilenames[port]), exist_ok=True)
 
-        self._mainView.bottomFrame.updateLogFileInfo("Saving to log file: " + filename,"black",useRootAfter=True)
+        self._mainView.bottomFrame.updateLogFileInfo("Saving to log file: " + ", ".join(self._filenames.values()),"black",useRootAfter=True)
 
         self.linesInLogFile = 0
 
         # line buffering can be enabled with "buffering=1". Not sure if it is too much IO
-        with open(fullFilename,"a") as file:
+        self._fileStack = contextlib.ExitStack()
+        self._files = dict()
+        for port in self._ports:
+            if self._settings.isBinary(port):
+                self._files[port] = self._fileStack.enter_context(open(self._fullFilenames[port],"ab"))
+            else:
+                self._files[port] = self._fileStack.enter_context(open(self._fullFilenames[port],"a"))
+
+    def _closeLogFiles(self):
+
+        self._fileStack.close()
+
+        self.lastLogFileInfos = list()
+        for port in self._ports:
+            filesize = os.path.getsize(self._fullFilenames[port])
+            self.lastLogFileInfos.append(self._filenames[port] + " (Size " + "{:.3f}".format(filesize/1024) + "KB)")
+
+        self._mainView.bottomFrame.updateLogFileInfo("Log file saved: " + ", ".join(self.lastLogFileInfos),"green",useRootAfter=True)
+
+    def _writeLogItem(self,port,logItem):
+        # Line records arrive as a list per batch. Binary ports send raw chunks
+        if isinstance(logItem,bytes):
+            self._files[port].write(logItem)
+        else:
+            self._files[port].writelines(self._lineRenderer.renderLines(logItem))
+            self.linesInLogFile += len(logItem)
+
+    def _logWriterWorker(self):
+
+        self._openLogFiles()
+
+        batchSize = self._settings.get(Sets.PIPELINE_LOG_BATCH_SIZE)
+        batchAge = self._settings.get(Sets.PIPELINE_LOG_BATCH_AGE)/1000
+
+        try:
             while self._logFlag:
+                for port,logItem in self.logQueue.getBatch(batchSize,batchAge,0.2):
+                    self._writeLogItem(port,logItem)
+        finally:
+            self._closeLogFiles()
+
+    ##############
+    # Event Loop Writer
+    # Used with the asyncio I/O engine. The writer is woken up by the log queue put hook instead of polling
+
+    def _wakeLogWriter(self):
+        # Event is created when the coroutine starts
+        if self._logEvent:
+            self._logEvent.set()
+
+    async def _logWriterCoroutine(self):
+
+        self._logEvent = asyncio.Event()
+        self.logQueue.setPutHook(self._ioLoop.createWakeup(self._logEvent.set))
+        # Items put before the hook was set
+        self._logEvent.set()
+
+        self._openLogFiles()
+
+        try:
+            while self._logFlag:
+                await self._logEvent.wait()
+                self._logEvent.clear()
+
                 try:
-                    logLine = self.logQueue.get(True,0.2)
-                    self.logQueue.task_done()
-                    file.write(logLine)
-                    self.linesInLogFile += 1
+                    while True:
+                        port,logItem = self.logQueue.get_nowait()
+                        self._writeLogItem(port,logItem)
+                        self.logQueue.task_done()
                 except queue.Empty:
                     pass
-
-        filesize = os.path.getsize(fullFilename)
-        self.lastLogFileInfo = filename + " (Size " + "{:.3f}".format(filesize/1024) + "KB)"
-
-        self._mainView.bottomFrame.updateLogFileInfo("Log file saved: " + self.lastLogFileInfo,"green",useRootAfter=True)
+        finally:
+            self.logQueue.setPutHook(None)
+            self._closeLogFiles()
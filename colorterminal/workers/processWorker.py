@@ -1,12 +1,35 @@
 
-import queue
 import threading
 import string
-
-import datetime
+import heapq
+import itertools
 
 from traceLog import traceLog,LogLevel
 import settings as Sets
+import stageQueues
+import timeStamp
+import lineRenderer
+from customTypes import LineKind,LineRecord
+
+################################
+# Non-printable characters
+# ASCII control characters (except whitespace) are replaced with \uNNNN (NNNN is the decimal code)
+
+_nonprintable = set([chr(i) for i in range(128)]).difference(string.printable)
+_nonprintableTable = str.maketrans({character:"\\u%04d" % ord(character) for character in _nonprintable})
+
+def cleanLine(data):
+    "Replace non-printable characters and remove trailing whitespace"
+    stripped = data.rstrip(string.whitespace)
+    # Most lines are clean. isprintable is also false for tabs and non-ASCII control characters, they just take the slow path
+    if stripped.isprintable():
+        return stripped
+    return stripped.translate(_nonprintableTable).rstrip()
+
+def cleanLines(datas):
+    "Same as cleanLine for a list of lines, without a function call per line. Only lines that are not clean are translated"
+    stripped = [data.rstrip(string.whitespace) for data in datas]
+    return [data if data.isprintable() else data.translate(_nonprintableTable).rstrip() for data in stripped]
 
 class ProcessWorker:
 
@@ -15,12 +38,17 @@ class ProcessWorker:
         self._processFlag = False
 
         self._processThread = None
-        self.processQueue = queue.Queue()
+        # Everything passing through the process stage is logged, so nothing can be dropped
+        self.processQueue = stageQueues.SpillQueue(self._settings.get(Sets.QUEUE_LOG_MEMORY_LINES),"process")
 
         self._highlightWorker = None
         self._logWriterWorker = None
 
-        self._nonprintable = set([chr(i) for i in range(128)]).difference(string.printable)
+        self._multiplePorts = False
+
+        # Lines leave this stage as line records. The sinks (GUI and log writer) use this renderer to make the text
+        self.lineRenderer = lineRenderer.LineRenderer()
+
 
     ##############
     # Public Interface
@@ -55,64 +83,80 @@ class ProcessWorker:
         self._highlightWorker = workers.highlightWorker
         self._logWriterWorker = workers.logWriterWorker
 
+    def setPorts(self,ports):
+        "Ports in connection. Lines are tagged with their port when more than one text port is connected"
+        # Binary ports are shown in their own hex view, and send no lines
+        textPorts = [port for port in ports if not self._settings.isBinary(port)]
+        self._multiplePorts = len(textPorts) > 1
+        self.lineRenderer.setPorts(textPorts)
+
+    def showsPartialLines(self):
+        "Partial lines are only shown when one text port is connected. Readers flush incomplete lines otherwise"
+        return not self._multiplePorts
+
+    def setClockAnchor(self,clockAnchor):
+        "Wall-clock anchor of the connection. Used to convert arrival timestamps for display"
+        self.lineRenderer.setClockAnchor(clockAnchor)
+
     ##############
     # Main Worker
 
     def _processWorker(self):
 
         # Create connect line
-        timestamp = datetime.datetime.now()
-        timeString = Sets.timeStampBracket[0] + timestamp.strftime("%H:%M:%S") + Sets.timeStampBracket[1]
-        connectLine = timeString + Sets.CONNECT_LINE_TEXT
-        self._highlightWorker.highlightQueue.put(connectLine)
+        self._highlightWorker.highlightQueue.put(LineRecord(LineKind.CONNECT,timeStamp.now(),0,Sets.CONNECT_LINE_PAYLOAD))
 
         lastTimestamp = 0
 
-        while self._processFlag:
-            try:
-                line = self.processQueue.get(True,0.2)
-                self.processQueue.task_done()
-
-                # Timestamp
-                micros = int(line.timestamp.microsecond/1000)
-                timeString = Sets.timeStampBracket[0] + line.timestamp.strftime("%H:%M:%S") + "." + '{:03d}'.format(micros) + Sets.timeStampBracket[1]
+        batchSize = self._settings.get(Sets.PIPELINE_PROCESS_BATCH_SIZE)
+        batchAge = self._settings.get(Sets.PIPELINE_PROCESS_BATCH_AGE)/1000
 
-                # Timedelta
-                if not lastTimestamp:
-                    lastTimestamp = line.timestamp
-
-                timedelta = line.timestamp - lastTimestamp
-
-                hours, remainder = divmod(timedelta.seconds, 3600)
-                minutes, seconds = divmod(remainder, 60)
+        while self._processFlag:
 
-                hourstring = ""
-                if hours != 0:
-                    hourstring = "{:02d}:".format(hours)
+            # The readers hand over lists of lines
+            batches = self.processQueue.getBatch(batchSize,batchAge,0.2)
+            if not batches:
+                continue
 
-                minutstring = ""
-                if minutes != 0:
-                    minutstring = "{:02d}:".format(minutes)
+            # Lines from several ports are merged into one timeline ordered by arrival time
+            if self._multiplePorts:
+                lines = list(heapq.merge(*batches,key=lambda line: line.timestamp))
+            else:
+                lines = list(itertools.chain.from_iterable(batches))
 
-                if minutstring:
-                    secondstring = "{:02d}.{:03d}".format(seconds, int(timedelta.microseconds/1000))
-                else:
-                    secondstring = "{:2d}.{:03d}".format(seconds, int(timedelta.microseconds/1000))
+            # Remove non-printable characters
+            cleanDatas = cleanLines([line.data for line in lines])
 
-                timeDeltaString = Sets.timeDeltaBracket[0] + hourstring + minutstring + secondstring + Sets.timeDeltaBracket[1]
+            newRecords = list()
 
-                lastTimestamp = line.timestamp
+            for line,cleanData in zip(lines,cleanDatas):
 
-                # Remove non-printable characters
-                newData = line.data.translate({ord(character):"\\u%04d" % ord(character) for character in self._nonprintable})
-                # Replace newline
-                newData = newData.rstrip() + "\n"
+                # Partial lines grow the last line in the window. With several ports the last line
+                # can belong to another port, so only completed lines are shown. The readers then flush
+                # incomplete lines as completed lines after the port timeout.
+                if line.partial and self._multiplePorts:
+                    continue
 
-                # Construct newLine string
-                newLine = timeString + " " + timeDeltaString + " " + newData
+                # Timedelta (timestamps are monotonic nanoseconds, see timeStamp)
+                if not lastTimestamp:
+                    lastTimestamp = line.timestamp
 
-                self._highlightWorker.highlightQueue.put(newLine)
-                self._logWriterWorker.logQueue.put(newLine)
+                delta = line.timestamp - lastTimestamp
 
-            except queue.Empty:
-                pass
\ No newline at end of file
+                # Delta of the completed line is relative to the previous completed line
+                if line.partial:
+                    newRecords.append(LineRecord(LineKind.PARTIAL,line.timestamp,delta,cleanData,line.port))
+                else:
+                    lastTimestamp = line.timestamp
+                    newRecords.append(LineRecord(LineKind.LINE,line.timestamp,delta,cleanData,line.port))
+
+            # One batch to highlight. Log queue items are (port, list of records), as each port has its own log file
+            # Partial lines are only shown, the completed line is logged
+            self._highlightWorker.highlightQueue.put(newRecords)
+
+            logRecords = dict()
+            for record in newRecords:
+                if record.kind == LineKind.LINE:
+                    logRecords.setdefault(record.port,list()).append(record)
+            for port,portRecords in logRecords.items():
+                self._logWriterWorker.logQueue.put((port,portRecords))
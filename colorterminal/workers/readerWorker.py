@@ -1,18 +1,106 @@
 import threading
 import serial
 import serial.tools.list_ports
-import datetime
 
 from traceLog import traceLog,LogLevel
+import settings as Sets
+import transports
+import ringBuffer
+import timeStamp
 from customTypes import ConnectState,SerialLine
 
+class LineSplitter:
+    """Collects raw serial data in a reusable buffer and splits it into lines in bulk.
+    The buffer only holds the incomplete line, so only new data is searched for a newline.
+    An incomplete line longer than maxLineLength bytes is broken into lines (0 is no limit)"""
+
+    def __init__(self,port="",maxLineLength=0):
+        self._port = port
+        self._maxLineLength = maxLineLength
+        self._buffer = bytearray()
+        # Number of bytes of the incomplete line already returned by partial()
+        self._partialLength = 0
+
+    def feed(self,data,timestamp):
+        "Add data to buffer. Returns list of completed lines, all stamped with timestamp"
+
+        searchStart = len(self._buffer)
+        self._buffer += data
+
+        lines = list()
+
+        end = self._buffer.rfind(b"\n",searchStart)
+        if end >= 0:
+            # Decode all complete lines in one go. A newline is never part of a multi-byte
+            # utf-8 character, so this gives the same result as decoding line by line.
+            with memoryview(self._buffer) as view:
+                text = str(view[:end],encoding="utf-8",errors="backslashreplace")
+            del self._buffer[:end+1]
+            self._partialLength = 0
+
+            lines = [SerialLine(lineData,timestamp,self._port) for lineData in text.split("\n")]
+
+        if self._maxLineLength > 0 and len(self._buffer) > self._maxLineLength:
+            lines.extend(self._breakLongLine(timestamp))
+
+        return lines
+
+    def flush(self,timestamp):
+        "Return any incomplete line left in the buffer (same behavior as readline timeout)"
+
+        if not self._buffer:
+            return []
+
+        text = self._buffer.decode(encoding="utf-8",errors="backslashreplace")
+        self._buffer.clear()
+        self._partialLength = 0
+
+        return [SerialLine(text,timestamp,self._port)]
+
+    def _breakLongLine(self,timestamp):
+        "Lines of max length from the incomplete line. The rest (at most max length) stays in the buffer"
+
+        lines = list()
+        while len(self._buffer) > self._maxLineLength:
+            end = self._maxLineLength
+            # Do not break inside a multi-byte utf-8 character (continuation bytes are 10xxxxxx)
+            while end > self._maxLineLength - 3 and (self._buffer[end] & 0xC0) == 0x80:
+                end -= 1
+            # Max length shorter than the character, the character is broken
+            if end <= 0:
+                end = self._maxLineLength
+            text = self._buffer[:end].decode(encoding="utf-8",errors="backslashreplace")
+            del self._buffer[:end]
+            lines.append(SerialLine(text,timestamp,self._port))
+
+        self._partialLength = 0
+        return lines
+
+    def hasNewPartial(self):
+        "True if the incomplete line has grown since it was last returned by partial()"
+        return len(self._buffer) != self._partialLength
+
+    def partial(self,timestamp):
+        "Return the incomplete line without removing it from the buffer. Only returned again once it has grown"
+
+        if not self.hasNewPartial():
+            return []
+
+        text = self._buffer.decode(encoding="utf-8",errors="backslashreplace")
+        self._partialLength = len(self._buffer)
+
+        return [SerialLine(text,timestamp,self._port,partial=True)]
+
 class ReaderWorker:
+    "Reads from one port. A reader is created for each port in the connection"
 
-    def __init__(self,settings,mainView):
+    def __init__(self,settings,mainView,port):
         self._settings = settings
         self._mainView = mainView
         self._root = mainView.root
 
+        self.port = port
+
         self._readFlag = False
 
         self._readerThread = None
@@ -20,6 +108,22 @@ class ReaderWorker:
         self._connectController = None
 
         self._processWorker = None
+        self._logWriterWorker = None
+
+        # Only set when the asyncio I/O engine is used
+        self._ioLoop = None
+        self._eventLoopSerial = None
+        self._eventLoopFileDescriptor = None
+        self._splitter = None
+        self._idleHandle = None
+        self._portTimeout = None
+
+        self._highThroughput = self._settings.isHighThroughput(port)
+
+        # Binary ports skip line handling. Raw data is kept in ring buffer for the hex view
+        self.ringBuffer = None
+        if self._settings.isBinary(port):
+            self.ringBuffer = ringBuffer.RingBuffer(self._settings.get(Sets.CONNECTION_BINARY_BUFFER_SIZE))
 
 
     ##############
@@ -30,8 +134,11 @@ class ReaderWorker:
         if self._processWorker:
             if not self._readFlag:
                 self._readFlag = True
-                self._readerThread = threading.Thread(target=self._readerWorker,daemon=True,name="Reader")
-                self._readerThread.start()
+                if self._ioLoop:
+                    self._ioLoop.call(self._startEventLoopReader)
+                else:
+                    self._readerThread = threading.Thread(target=self._readerWorker,daemon=True,name="Reader " + self.port)
+                    self._readerThread.start()
             else:
                 traceLog(LogLevel.ERROR,"Not able to start reader thread. Thread already enabled")
         else:
@@ -44,6 +151,9 @@ class ReaderWorker:
         if self._readFlag:
             self._readFlag = False
 
+            if self._ioLoop:
+                self._ioLoop.callAndWait(self._stopEventLoopReader)
+
             if self._readerThread:
                 if self._readerThread.is_alive():
                     self._readerThread.join()
@@ -53,36 +163,232 @@ class ReaderWorker:
 
     def linkWorkers(self,workers):
         self._processWorker = workers.processWorker
+        self._logWriterWorker = workers.logWriterWorker
+        self._ioLoop = workers.ioLoop
+
+    ##############
+    # Read Loops
+    # Line and bulk loops put lists of SerialLine on the process queue. Binary loop bypasses the process stage
+    # All transports (serial, network, file, pty, command) are read through the same loops
+
+    def _partialLineTimeout(self):
+        "Idle time in seconds before an incomplete line is shown. 0 when it is flushed as a completed line after the port timeout"
+        # Partial lines are not shown when several text ports are connected (see ProcessWorker)
+        if not self._processWorker.showsPartialLines():
+            return 0
+        return self._settings.get(Sets.CONNECTION_PARTIAL_LINE_TIMEOUT)/1000
+
+    def _readLines(self,ser):
+
+        while self._readFlag:
+
+            line = ser.readline()
+            timestamp = timeStamp.now()
+
+            if line:
+                inLine = SerialLine(line.decode(encoding="utf-8",errors="backslashreplace"),timestamp,self.port)
+                self._processWorker.processQueue.put([inLine])
+
+    def _readBulk(self,ser):
+
+        splitter = LineSplitter(self.port,self._settings.get(Sets.CONNECTION_MAX_LINE_LENGTH))
+
+        # Partial line streaming: When an incomplete line has been idle for partialTimeout, it is shown.
+        # The line is kept in the splitter until the newline arrives, and is then sent again as a complete line.
+        partialTimeout = self._partialLineTimeout()
+        portTimeout = ser.timeout
+
+        try:
+            while self._readFlag:
+
+                # Block until at least one byte (or timeout), then drain everything waiting
+                data = ser.read(ser.in_waiting or 1)
+                # One timestamp per chunk. Lines are completed when their newline arrives,
+                # so this is the same arrival time a readline() call would have given.
+                timestamp = timeStamp.now()
+
+                if data:
+                    lines = splitter.feed(data,timestamp)
+                elif partialTimeout > 0:
+                    lines = splitter.partial(timestamp)
+                else:
+                    lines = splitter.flush(timestamp)
+
+                if lines:
+                    self._processWorker.processQueue.put(lines)
 
+                # Short timeout only while there is something new to show (changing timeout can reconfigure the port)
+                if partialTimeout > 0:
+                    timeout = partialTimeout if splitter.hasNewPartial() else portTimeout
+                    if ser.timeout != timeout:
+                        ser.timeout = timeout
+        finally:
+            # Keep incomplete line, also if the source is closed
+            lines = splitter.flush(timeStamp.now())
+            if lines:
+                self._processWorker.processQueue.put(lines)
+
+    def _readBinary(self,ser):
+
+        while self._readFlag:
+
+            # Read directly into ring buffer. Only the binary log gets a copy of each chunk
+            data = self.ringBuffer.readFrom(ser,ser.in_waiting or 1)
+
+            if data:
+                self._logWriterWorker.logQueue.put((self.port,bytes(data)))
 
     ##############
     # Main Worker
 
+    def _openTransport(self):
+        return transports.openTransport(self.port,self._settings.getPortSettings(self.port))
+
+    def _reportConnected(self,ser):
+        connectInfo = str(ser.name)
+        if self.ringBuffer:
+            connectInfo += " (binary)"
+        elif self._highThroughput:
+            connectInfo += " (high-throughput)"
+        self._root.after(10,self._connectController.readerConnected,connectInfo)
+
+    def _openFailed(self,error):
+        traceLog(LogLevel.ERROR,str(error))
+        # In case other threads are still starting up,
+        # wait for 2 sec
+        # Then change program state to disconnecting
+        self._root.after(2000,self._connectController.changeAppState,ConnectState.DISCONNECTING)
+
+    def _readFailed(self,error):
+        traceLog(LogLevel.ERROR,"Serial read error: " + str(error))
+        # Change program state to disconnecting
+        self._root.after(10,self._connectController.changeAppState,ConnectState.DISCONNECTING)
+
     def _readerWorker(self):
 
         try:
-            with serial.Serial(self._mainView.controlFrame.getSerialPortVar(), 115200, timeout=1) as ser:
+            ser = self._openTransport()
+        except serial.SerialException as e:
+            self._openFailed(e)
+            return
+
+        self._readTransport(ser)
+
+    def _readTransport(self,ser):
+
+        with ser:
+
+            self._reportConnected(ser)
+
+            try:
+                if self.ringBuffer:
+                    self._readBinary(ser)
+                elif self._settings.get(Sets.CONNECTION_READ_MODE) == Sets.READ_MODE_LINE and not self._highThroughput:
+                    self._readLines(ser)
+                else:
+                    self._readBulk(ser)
+
+            except serial.SerialException as e:
+                self._readFailed(e)
+
+    ##############
+    # Event Loop Reader
+    # Used with the asyncio I/O engine. The port is read when its file descriptor is readable,
+    # so an idle port costs nothing. Always reads in bulk. Runs on the I/O loop thread.
+
+    def _getFileDescriptor(self,ser):
+        try:
+            return ser.fileno()
+        except (AttributeError,OSError,ValueError,serial.SerialException):
+            return None
+
+    def _startEventLoopReader(self):
+
+        try:
+            ser = self._openTransport()
+        except serial.SerialException as e:
+            self._openFailed(e)
+            return
+
+        fileDescriptor = self._getFileDescriptor(ser)
+        if fileDescriptor is None:
+            traceLog(LogLevel.DEBUG,"No file descriptor for " + self.port + ". Using reader thread")
+            self._readerThread = threading.Thread(target=self._readTransport,args=(ser,),daemon=True,name="Reader " + self.port)
+            self._readerThread.start()
+            return
+
+        # Reads must never block the loop
+        self._portTimeout = ser.timeout
+        ser.timeout = 0
+
+        self._eventLoopSerial = ser
+        self._eventLoopFileDescriptor = fileDescriptor
+        self._splitter = LineSplitter(self.port,self._settings.get(Sets.CONNECTION_MAX_LINE_LENGTH))
+        self._idleHandle = None
+
+        self._ioLoop.loop.add_reader(fileDescriptor,self._onReadable)
+
+        self._reportConnected(ser)
+
+    def _stopEventLoopReader(self):
+
+        if self._eventLoopSerial:
+            self._ioLoop.loop.remove_reader(self._eventLoopFileDescriptor)
 
-                self._root.after(10,self._connectController.changeAppState,ConnectState.CONNECTED,str(ser.name))
+            if self._idleHandle:
+                self._idleHandle.cancel()
+                self._idleHandle = None
 
-                try:
-                    while self._readFlag:
+            # Keep incomplete line
+            if self._splitter:
+                lines = self._splitter.flush(timeStamp.now())
+                if lines:
+                    self._processWorker.processQueue.put(lines)
 
-                        line = ser.readline()
-                        timestamp = datetime.datetime.now()
+            self._eventLoopSerial.close()
+            self._eventLoopSerial = None
 
-                        if line:
-                            inLine = SerialLine(line.decode(encoding="utf-8",errors="backslashreplace"),timestamp)
-                            self._processWorker.processQueue.put(inLine)
+    def _onReadable(self):
 
-                except serial.SerialException as e:
-                    traceLog(LogLevel.ERROR,"Serial read error: " + str(e))
-                    # Change program state to disconnecting
-                    self._root.after(10,self._connectController.changeAppState,ConnectState.DISCONNECTING)
+        ser = self._eventLoopSerial
+
+        try:
+            if self.ringBuffer:
+                data = self.ringBuffer.readFrom(ser,max(ser.in_waiting,1))
+                if data:
+                    self._logWriterWorker.logQueue.put((self.port,bytes(data)))
+
+            else:
+                data = ser.read(max(ser.in_waiting,1))
+                if data:
+                    lines = self._splitter.feed(data,timeStamp.now())
+                    if lines:
+                        self._processWorker.processQueue.put(lines)
+                    self._scheduleIdle()
 
         except serial.SerialException as e:
-            traceLog(LogLevel.ERROR,str(e))
-            # In case other threads are still starting up,
-            # wait for 2 sec
-            # Then change program state to disconnecting
-            self._root.after(2000,self._connectController.changeAppState,ConnectState.DISCONNECTING)
+            self._stopEventLoopReader()
+            self._readFailed(e)
+
+    def _scheduleIdle(self):
+        "Incomplete line is shown (partial line streaming) or flushed when the port has been idle"
+
+        if self._idleHandle:
+            self._idleHandle.cancel()
+            self._idleHandle = None
+
+        if self._splitter.hasNewPartial():
+            partialTimeout = self._partialLineTimeout()
+            if partialTimeout > 0:
+                self._idleHandle = self._ioLoop.loop.call_later(partialTimeout,self._onIdle,True)
+            else:
+                self._idleHandle = self._ioLoop.loop.call_later(self._portTimeout,self._onIdle,False)
+
+    def _onIdle(self,partial):
+        self._idleHandle = None
+        if partial:
+            lines = self._splitter.partial(timeStamp.now())
+        else:
+            lines = self._splitter.flush(timeStamp.now())
+        if lines:
+            self._processWorker.processQueue.put(lines)
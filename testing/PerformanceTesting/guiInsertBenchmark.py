@@ -0,0 +1,110 @@
+#####################################
+# GUI insert benchmark
+# Lines per second added to a text widget, for one GUI update of a batch of lines:
+#   Per line: insert, index and see per line, one tag_add per tag and line, trim one line at a time (old GuiWorker)
+#   Batch: one insert with text and tags of all lines (tag positions found in Python), trim and see once (GuiWorker now)
+# Needs a display. The window is created, but not shown, so only the text widget update is timed.
+# With "show", the text widget is shown and the redraw of the visible lines is timed too.
+#
+# Run from repository root: python testing/PerformanceTesting/guiInsertBenchmark.py [show]
+
+import os
+import sys
+import time
+
+import tkinter as tk
+
+sys.path.insert(0,os.path.join(os.path.dirname(os.path.abspath(__file__)),"..","..","colorterminal"))
+
+import lineStore
+from workers import guiWorker
+
+batchSizes = [100, 1000, 5000]
+batchCount = 20
+maxLines = 4000 # Window line buffer
+show = "show" in sys.argv[1:]
+
+prefix = "[12:34:56.789] ( 0.001) "
+
+def makeLines(count):
+    "(line, payload, prefixLength, tags). One line in ten has a line color, one in five a highlight"
+    lines = list()
+    for i in range(count):
+        payload = "Main::function line %d value %d" % (i, i * 7)
+        tags = list()
+        if i % 10 == 0:
+            tags.append(("LineColorMap_0",0,None))
+        if i % 5 == 0:
+            tags.append(("LineColorMap_1",0,4))
+        lines.append((prefix + payload + "\n",payload,len(prefix),tags))
+    return lines
+
+def insertPerLine(textArea,store,lines):
+    for line, payload, prefixLength, tags in lines:
+        bottomVisibleLine = int(textArea.index("@0,%d" % textArea.winfo_height()).split(".")[0])
+        endLine = int(textArea.index(tk.END).split(".")[0])
+        textArea.insert(tk.END,line)
+        store.append(payload,prefixLength)
+        if bottomVisibleLine >= (endLine-2):
+            textArea.see(tk.END)
+        if (endLine-1) > maxLines:
+            textArea.delete(1.0,2.0)
+            store.deleteFirst()
+
+        lastline = textArea.index("end-2c").split(".")[0]
+        for tagName, start, end in tags:
+            if end is None:
+                textArea.tag_add(tagName,lastline + ".0",lastline + ".0+1l")
+            else:
+                textArea.tag_add(tagName,"%s.%d" % (lastline,prefixLength + start),"%s.%d" % (lastline,prefixLength + end))
+
+class _Settings:
+    def get(self,key):
+        return maxLines if key == guiWorker.Sets.TEXTAREA_MAX_LINE_BUFFER else 1000
+
+def insertBatch(worker,textArea,store,lines):
+    bottomVisibleLine = int(textArea.index("@0,%d" % textArea.winfo_height()).split(".")[0])
+    scrollToEnd = bottomVisibleLine >= len(store)
+    worker._insertLines(lines)
+    worker._trimLines()
+    if scrollToEnd:
+        textArea.see(tk.END)
+
+root = tk.Tk()
+if not show:
+    root.withdraw()
+
+for batchSize in batchSizes:
+    lines = makeLines(batchSize)
+
+    results = list()
+    for name in ("per line", "batch"):
+        textArea = tk.Text(root)
+        if show:
+            textArea.pack()
+        textArea.tag_configure("LineColorMap_0",background="yellow")
+        textArea.tag_configure("LineColorMap_1",foreground="red")
+        store = lineStore.LineStore()
+
+        # Only the insert methods of the worker are used
+        worker = guiWorker.GuiWorker.__new__(guiWorker.GuiWorker)
+        worker._settings = _Settings()
+        worker._textArea = textArea
+        worker._lineStore = store
+
+        start = time.perf_counter()
+        for _ in range(batchCount):
+            if name == "per line":
+                insertPerLine(textArea,store,lines)
+            else:
+                insertBatch(worker,textArea,store,lines)
+            root.update()
+        elapsed = time.perf_counter() - start
+
+        assert int(textArea.index("end-2c").split(".")[0]) == len(store)
+        results.append(batchSize * batchCount / elapsed)
+        textArea.destroy()
+
+    print("Batch: %5d lines  per line: %9.0f lines/s  batch: %9.0f lines/s (x%.1f)" % (batchSize, results[0], results[1], results[1]/results[0]))
+
+root.destroy()
@@ -0,0 +1,62 @@
+#####################################
+# Highlight pool benchmark
+# Line color rule matching in the highlight thread (rule engine) compared to the highlight pool with different
+# number of processes. Both use the rule engine, so the result is the gain of the pool alone.
+# The pool only helps when the rule matching costs more than sending the lines to the worker processes,
+# so the result depends on the number of rules and the number of cores.
+#
+# Run from repository root: python testing/PerformanceTesting/highlightPoolBenchmark.py
+
+import os
+import sys
+import time
+
+sys.path.insert(0,os.path.join(os.path.dirname(os.path.abspath(__file__)),"..","..","colorterminal"))
+
+import ruleEngine
+from workers import highlightPool
+
+numberOfLines = 20000
+numberOfRules = 150
+batchSize = 2000
+chunkSize = 250
+
+rules = [("tag%d" % i, "Module%d::.*(error|warning)" % i) for i in range(numberOfRules)]
+lines = ["[12:34:56.789] ( 0.001) Module%d::Function line %d warning\n" % (i % (numberOfRules*2), i) for i in range(numberOfLines)]
+
+def threadMatch(engine):
+    "Same as the highlight thread"
+    return engine.locateLines(lines)
+
+def poolMatch(pool):
+    result = list()
+    for index in range(0,numberOfLines,batchSize):
+        result.extend(pool.locateColorTags(lines[index:index+batchSize]))
+    return result
+
+if __name__ == "__main__":
+
+    print("Lines: %d, rules: %d, cores: %d" % (numberOfLines, numberOfRules, os.cpu_count()))
+
+    # Rules are compiled once, when they are set
+    engine = ruleEngine.RuleEngine(rules)
+
+    start = time.perf_counter()
+    expected = threadMatch(engine)
+    threadTime = time.perf_counter() - start
+    print("Thread:       %8.0f ns/line" % (threadTime/numberOfLines*1e9))
+
+    for processes in sorted({1, 2, 4, os.cpu_count()}):
+        pool = highlightPool.HighlightPool(processes,chunkSize)
+        pool.setRules(rules)
+        pool.start()
+        # First tasks compile the rules
+        pool.locateColorTags(lines[:chunkSize*processes])
+
+        start = time.perf_counter()
+        result = poolMatch(pool)
+        poolTime = time.perf_counter() - start
+        pool.close()
+
+        assert result == expected
+        print("Pool %2d:      %8.0f ns/line (x%.1f)" % (processes, poolTime/numberOfLines*1e9, threadTime/poolTime))
@@ -0,0 +1,118 @@
+#####################################
+# Pipeline benchmark
+# Per-line overhead of the hand-off between pipeline stages (no work is done on the lines).
+# Three stage threads (process, highlight, gui) are connected by stage queues, like the real pipeline.
+#   Per line: One put/get per line in every stage (old protocol)
+#   Batch:    Reader puts chunks of lines, every stage uses getBatch and forwards one list
+# Last, the line limits of the stage queues are checked for the item shapes of the display and log queues.
+#
+# Run from repository root: python testing/PerformanceTesting/pipelineBenchmark.py
+
+import os
+import sys
+import time
+import queue
+import threading
+
+sys.path.insert(0,os.path.join(os.path.dirname(os.path.abspath(__file__)),"..","..","colorterminal"))
+
+import stageQueues
+
+numberOfLines = 200000
+linesPerChunk = 50 # Lines per reader chunk
+batchSize = 2000
+batchAge = 0.005
+
+numberOfStages = 3
+
+def perLineStage(inQueue,outQueue):
+    while True:
+        line = inQueue.get()
+        inQueue.task_done()
+        outQueue.put(line)
+        if line is None:
+            break
+
+def batchStage(inQueue,outQueue):
+    while True:
+        items = inQueue.getBatch(batchSize,batchAge,0.2)
+        if not items:
+            continue
+        lines = list()
+        for item in items:
+            lines.extend(item)
+        outQueue.put(lines)
+        if lines[-1] is None:
+            break
+
+def runPipeline(stage,putLines):
+    queues = [stageQueues.StageQueue() for _ in range(numberOfStages+1)]
+    threads = [threading.Thread(target=stage,args=(queues[i],queues[i+1]),daemon=True) for i in range(numberOfStages)]
+    for thread in threads:
+        thread.start()
+
+    start = time.perf_counter()
+    putLines(queues[0])
+
+    # Last queue is the "gui", count lines until end marker
+    count = 0
+    done = False
+    while not done:
+        item = queues[-1].get()
+        items = item if isinstance(item,list) else [item]
+        for line in items:
+            if line is None:
+                done = True
+            else:
+                count += 1
+    duration = time.perf_counter() - start
+
+    for thread in threads:
+        thread.join()
+
+    return count, duration
+
+lines = ["[12:34:56.789] ( 0.001) Line number %d\n" % i for i in range(numberOfLines)]
+
+def putSingleLines(firstQueue):
+    for line in lines:
+        firstQueue.put(line)
+    firstQueue.put(None)
+
+def putChunks(firstQueue):
+    for i in range(0,numberOfLines,linesPerChunk):
+        firstQueue.put(lines[i:i+linesPerChunk])
+    firstQueue.put([None])
+
+perLineCount, perLineTime = runPipeline(perLineStage,putSingleLines)
+batchCount, batchTime = runPipeline(batchStage,putChunks)
+
+assert perLineCount == batchCount == numberOfLines
+
+print("Lines: %d, stages: %d" % (numberOfLines, numberOfStages))
+print("Per line:  %8.0f ns/line" % (perLineTime/numberOfLines*1e9))
+print("Batch:     %8.0f ns/line (x%.1f)" % (batchTime/numberOfLines*1e9, perLineTime/batchTime))
+
+##############
+# Queue limits
+
+maxLines = 10000
+linesPerItem = 1000
+
+displayQueue = stageQueues.DropOldestQueue(maxLines)
+for i in range(50):
+    displayQueue.put(lines[:linesPerItem])
+assert sum(len(item) for item in displayQueue.queue) == maxLines
+
+# Log queue items are (port, list of records) and (port, binary data)
+logQueue = stageQueues.SpillQueue(maxLines,"log")
+for i in range(50):
+    logQueue.put(("COM1",lines[:linesPerItem]))
+    logQueue.put(("COM2",b"\x00" * 100))
+memoryLines = sum(len(item[1]) if isinstance(item[1],list) else 1 for item in logQueue.queue)
+assert memoryLines <= maxLines + linesPerItem
+assert logQueue.qsize() == 100
+items = [logQueue.get_nowait() for _ in range(logQueue.qsize())]
+assert [item[0] for item in items] == ["COM1","COM2"] * 50
+
+print("Queue limits: display queue %d lines, log queue %d lines in memory, %d items spilled" % (maxLines, memoryLines, logQueue.spilledItems))
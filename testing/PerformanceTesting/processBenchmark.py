@@ -0,0 +1,69 @@
+#####################################
+# Process benchmark
+# Per-line cost of removing non-printable characters in the process stage.
+# Compares the old per-line dict comprehension with the precompiled table (cleanLine) and batch version (cleanLines).
+# Run for clean log lines and for lines where every 10th line has a control character.
+#
+# Run from repository root: python testing/PerformanceTesting/processBenchmark.py
+
+import os
+import sys
+import time
+import string
+
+sys.path.insert(0,os.path.join(os.path.dirname(os.path.abspath(__file__)),"..","..","colorterminal"))
+
+from workers.processWorker import cleanLine, cleanLines
+
+logFile = os.path.join(os.path.dirname(os.path.abspath(__file__)),"..","log_example_small.txt")
+
+numberOfLines = 20000
+batchSize = 100
+
+nonprintable = set([chr(i) for i in range(128)]).difference(string.printable)
+
+def oldCleanLine(data):
+    return data.translate({ord(character):"\\u%04d" % ord(character) for character in nonprintable}).rstrip()
+
+def loadLines(dirtyEvery):
+    with open(logFile,"r",encoding="utf-8",errors="backslashreplace") as file:
+        fileLines = file.readlines()
+    lines = list()
+    for i in range(numberOfLines):
+        line = fileLines[i % len(fileLines)]
+        if dirtyEvery and i % dirtyEvery == 0:
+            line = "\x1b[0m" + line
+        lines.append(line)
+    return lines
+
+def timePerLine(function,lines):
+    start = time.perf_counter()
+    function(lines)
+    return (time.perf_counter() - start)/len(lines)*1e9
+
+def runOld(lines):
+    for line in lines:
+        oldCleanLine(line)
+
+def runNew(lines):
+    for line in lines:
+        cleanLine(line)
+
+def runBatch(lines):
+    for i in range(0,len(lines),batchSize):
+        cleanLines(lines[i:i+batchSize])
+
+for name, dirtyEvery in [("clean lines",0), ("every 10th line with control character",10)]:
+    lines = loadLines(dirtyEvery)
+
+    # Same result for all versions
+    assert [oldCleanLine(line) for line in lines] == [cleanLine(line) for line in lines] == cleanLines(lines)
+
+    oldTime = timePerLine(runOld,lines)
+    newTime = timePerLine(runNew,lines)
+    batchTime = timePerLine(runBatch,lines)
+
+    print("%s (%d lines)" % (name, numberOfLines))
+    print("  dict per line:          %8.0f ns/line" % oldTime)
+    print("  cleanLine:              %8.0f ns/line (x%.1f)" % (newTime, oldTime/newTime))
+    print("  cleanLines (batch %3d): %8.0f ns/line (x%.1f)" % (batchSize, batchTime, oldTime/batchTime))
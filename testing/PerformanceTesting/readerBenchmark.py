@@ -0,0 +1,96 @@
+#####################################
+# Reader benchmark
+# Compares readline() per line with bulk reads split by LineSplitter.
+# Data is read from an in-memory port so no hardware is needed. Like pyserial,
+# the in-memory port uses the io.RawIOBase readline(), which reads one byte at a time.
+#
+# Run from repository root: python testing/PerformanceTesting/readerBenchmark.py
+
+import os
+import io
+import sys
+import time
+
+sys.path.insert(0,os.path.join(os.path.dirname(os.path.abspath(__file__)),"..","..","colorterminal"))
+
+from workers.readerWorker import LineSplitter
+from customTypes import SerialLine
+import timeStamp
+
+logFile = os.path.join(os.path.dirname(os.path.abspath(__file__)),"..","log_example_small.txt")
+
+numberOfLines = 20000
+
+# 8N1 framing: 10 bits per byte
+baudRates = [115200, 921600, 3000000]
+
+class MemorySerial(io.RawIOBase):
+    def __init__(self,data):
+        self._data = data
+        self._pos = 0
+
+    def readable(self):
+        return True
+
+    @property
+    def in_waiting(self):
+        return len(self._data) - self._pos
+
+    def read(self,size=1):
+        chunk = self._data[self._pos:self._pos+size]
+        self._pos += len(chunk)
+        return chunk
+
+def loadData():
+    with open(logFile,"rb") as file:
+        lines = file.readlines()
+    data = bytearray()
+    i = 0
+    while i < numberOfLines:
+        data += lines[i % len(lines)]
+        i += 1
+    return bytes(data)
+
+def readLines(data):
+    ser = MemorySerial(data)
+    count = 0
+    start = time.perf_counter()
+    while True:
+        line = ser.readline()
+        if not line:
+            break
+        SerialLine(line.decode(encoding="utf-8",errors="backslashreplace"),timeStamp.now())
+        count += 1
+    duration = time.perf_counter() - start
+    return count, duration
+
+def readBulk(data):
+    ser = MemorySerial(data)
+    splitter = LineSplitter()
+    count = 0
+    start = time.perf_counter()
+    while True:
+        chunk = ser.read(ser.in_waiting or 1)
+        if not chunk:
+            break
+        count += len(splitter.feed(chunk,timeStamp.now()))
+    duration = time.perf_counter() - start
+    return count, duration
+
+data = loadData()
+averageLineLength = len(data) / numberOfLines
+
+lineCount, lineTime = readLines(data)
+bulkCount, bulkTime = readBulk(data)
+
+lineRate = lineCount / lineTime
+bulkRate = bulkCount / bulkTime
+
+print("Lines: %d, average line length: %.1f bytes" % (numberOfLines, averageLineLength))
+print("readline(): %10.0f lines/sec" % lineRate)
+print("bulk:       %10.0f lines/sec (x%.1f)" % (bulkRate, bulkRate/lineRate))
+print("")
+print("Required line rate for a saturated port:")
+for baudRate in baudRates:
+    required = (baudRate / 10) / averageLineLength
+    print("  %8d baud: %8.0f lines/sec. readline() headroom x%.2f, bulk headroom x%.2f" % (baudRate, required, lineRate/required, bulkRate/required))
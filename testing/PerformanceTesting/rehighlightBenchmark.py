@@ -0,0 +1,86 @@
+#####################################
+# Re-highlight benchmark
+# Time to add the tags of a new line color rule to all lines already in a text widget:
+#   Tk search: textArea.search(regex, ..., regexp=True) loop over the widget, one tag_add per match (old TextFrame)
+#   Line store: Rule engine on the lines kept in Python, tags added with one tag_add per tag and chunk (TextFrame now)
+# In the application the line store work is split: Tags are found in a thread, and added in chunks by the GUI thread.
+# Here both parts are timed in one go. Needs a display (tkinter window is created, but not shown).
+#
+# Run from repository root: python testing/PerformanceTesting/rehighlightBenchmark.py
+
+import os
+import sys
+import time
+
+import tkinter as tk
+
+sys.path.insert(0,os.path.join(os.path.dirname(os.path.abspath(__file__)),"..","..","colorterminal"))
+
+import lineStore
+import ruleEngine
+
+lineCounts = [10000, 100000]
+chunkLines = 2000 # Same as TextFrame.REHIGHLIGHT_CHUNK_LINES
+
+prefix = "[12:34:56.789] ( 0.001) "
+regex = "WDT|ERROR"
+tagName = "LineColorMap_benchmark"
+
+def tkSearch(textArea):
+    countVar = tk.StringVar()
+    start = 1.0
+    while True:
+        pos = textArea.search(regex,start,stopindex=tk.END,count=countVar,nocase=False,regexp=True)
+        if not pos:
+            break
+        textArea.tag_add(tagName,pos,pos + "+" + countVar.get() + "c")
+        start = pos + "+1c"
+
+def storeHighlight(textArea,store):
+    engine = ruleEngine.RuleEngine([(tagName,regex)])
+    firstSequence, entries = store.snapshot()
+    for chunkStart in range(0,len(entries),chunkLines):
+        chunkEntries = entries[chunkStart:chunkStart+chunkLines]
+        chunk = [(firstSequence+chunkStart+index,entry,tags) \
+                    for index,(entry,tags) in enumerate(zip(chunkEntries,engine.locateLines([payload for payload,_ in chunkEntries]))) if tags]
+        indexes = list()
+        for lineNumber, (sequence, entry, tags) in store.findLines(chunk):
+            for _, start, end in tags:
+                indexes.append("%d.%d" % (lineNumber,entry[1] + start))
+                indexes.append("%d.%d" % (lineNumber,entry[1] + end))
+        if indexes:
+            textArea.tag_add(tagName,*indexes)
+
+root = tk.Tk()
+root.withdraw()
+
+for lineCount in lineCounts:
+    textArea = tk.Text(root)
+    store = lineStore.LineStore()
+
+    # One line in ten has a match
+    payloads = ["Main::function line %d %s" % (i, "ERROR" if i % 10 == 0 else "ok") for i in range(lineCount)]
+    textArea.insert(tk.END,"".join([prefix + payload + "\n" for payload in payloads]))
+    store.extend([(payload,len(prefix)) for payload in payloads])
+
+    start = time.perf_counter()
+    tkSearch(textArea)
+    root.update()
+    tkTime = time.perf_counter() - start
+    tkRanges = len(textArea.tag_ranges(tagName))//2
+
+    textArea.tag_delete(tagName)
+
+    start = time.perf_counter()
+    storeHighlight(textArea,store)
+    root.update()
+    storeTime = time.perf_counter() - start
+    storeRanges = len(textArea.tag_ranges(tagName))//2
+
+    assert tkRanges == storeRanges
+
+    print("Lines: %6d, tags: %5d  Tk search: %7.3f s  line store: %7.3f s (x%.1f)" % (lineCount, storeRanges, tkTime, storeTime, tkTime/storeTime))
+
+    textArea.destroy()
+
+root.destroy()
@@ -0,0 +1,110 @@
+#####################################
+# Rule engine benchmark
+# Line color rule matching per line with re.search(regex, line) for each rule (old highlight worker)
+# compared to the rule engine (precompiled patterns, literal scan and combined prefilter).
+# Run for lines where no rule matches (most lines) and for lines where one rule matches.
+# With the literal scan, only the rule with the literal of a line is searched, so lines where one rule matches
+# should take about the same time for any number of rules.
+# All matches mode is run for lines where one rule matches several times.
+# Then the cost of counting rule searches (rule counters) is shown.
+# Last, the rule engine is checked against re.search on random rule sets, including rules that can not be combined
+# in the prefilter (groups, backreferences, conditional groups, inline flags).
+#
+# Run from repository root: python testing/PerformanceTesting/ruleEngineBenchmark.py
+
+import os
+import random
+import re
+import sys
+import time
+
+sys.path.insert(0,os.path.join(os.path.dirname(os.path.abspath(__file__)),"..","..","colorterminal"))
+
+import ruleEngine
+
+numberOfLines = 20000
+ruleCounts = [10, 50, 150, 500]
+
+def oldLocate(rules,line):
+    highlights = list()
+    for tagName, regex in rules:
+        match = re.search(regex,line)
+        if match:
+            highlights.append((tagName,match.start(),match.end()))
+    return highlights
+
+for ruleCount in ruleCounts:
+    rules = [("tag%d" % i, "Module%d::.*(error|warning)" % i) for i in range(ruleCount)]
+    engine = ruleEngine.RuleEngine(rules)
+
+    for name, lineFormat in [("no match","Other%d::Function line %d info"), ("one match","Module%d::Function line %d warning")]:
+        lines = [lineFormat % (i % ruleCount, i) for i in range(numberOfLines)]
+
+        start = time.perf_counter()
+        oldResult = [oldLocate(rules,line) for line in lines]
+        oldTime = (time.perf_counter() - start)/numberOfLines*1e9
+
+        start = time.perf_counter()
+        newResult = engine.locateLines(lines)
+        newTime = (time.perf_counter() - start)/numberOfLines*1e9
+
+        assert oldResult == newResult
+
+        print("Rules: %3d, %-9s  re.search: %8.0f ns/line  rule engine: %8.0f ns/line (x%.1f)" % (ruleCount, name, oldTime, newTime, oldTime/newTime))
+
+# All matches mode, one rule matches 5 times in each line
+for ruleCount in ruleCounts:
+    rules = [("tag%d" % i, "ERR%d" % i) for i in range(ruleCount)]
+    firstEngine = ruleEngine.RuleEngine(rules)
+    allEngine = ruleEngine.RuleEngine(rules,allMatches=True)
+    lines = [" ".join(["ERR%d" % (i % ruleCount)]*5) + " line %d" % i for i in range(numberOfLines)]
+
+    start = time.perf_counter()
+    firstEngine.locateLines(lines)
+    firstTime = (time.perf_counter() - start)/numberOfLines*1e9
+
+    start = time.perf_counter()
+    allResult = allEngine.locateLines(lines)
+    allTime = (time.perf_counter() - start)/numberOfLines*1e9
+
+    assert all(len(highlights) == 5 for highlights in allResult)
+
+    print("Rules: %3d, 5 matches  first match: %8.0f ns/line  all matches: %8.0f ns/line" % (ruleCount, firstTime, allTime))
+
+# Cost of rule counters (Highlight_ruleCounters), half of the lines match one rule
+for ruleCount in ruleCounts:
+    rules = [("tag%d" % i, "Module%d::.*(error|warning)" % i) for i in range(ruleCount)]
+    engine = ruleEngine.RuleEngine(rules)
+    ruleCounters = dict()
+    countingEngine = ruleEngine.RuleEngine(rules,ruleCounters=ruleCounters)
+    lines = [("Module%d::Function line %d warning" if i % 2 else "Other%d::Function line %d info") % (i % ruleCount, i) for i in range(numberOfLines)]
+
+    start = time.perf_counter()
+    engine.locateLines(lines)
+    engineTime = (time.perf_counter() - start)/numberOfLines*1e9
+
+    start = time.perf_counter()
+    countingEngine.locateLines(lines)
+    countingTime = (time.perf_counter() - start)/numberOfLines*1e9
+
+    assert sum(counter.hits for counter in ruleCounters.values()) == numberOfLines//2
+
+    print("Rules: %3d, counters  off: %8.0f ns/line  on: %8.0f ns/line" % (ruleCount, engineTime, countingTime))
+
+# Equivalence on random rule sets (with more than 16 rules with a literal, the literal scan is used)
+equivalenceRegexes = ["Main::", "ERR", "(x)", "(a)(?(1)b|c)", "(a)\\1", "(?P<n>b)(?P=n)", "(?i)err", "x+y", "(ab|cd)e",
+                      "^Main", "b$", "Mod[0-9]::.*err", "a(?=b)", "(?<=a)c", "[abc]{2}", "(?:ab)*c", "cab|abc"]
+equivalenceParts = ["Main::", "ERR", "err", "x", "y", "a", "b", "c", "d", "e", "Mod3::", " "]
+randomGenerator = random.Random(1)
+for _ in range(500):
+    rules = [("tag%d" % i, randomGenerator.choice(equivalenceRegexes)) for i in range(randomGenerator.randint(1,30))]
+    for allMatches in (False, True):
+        engine = ruleEngine.RuleEngine(rules,allMatches)
+        for _ in range(20):
+            line = "".join(randomGenerator.choice(equivalenceParts) for _ in range(randomGenerator.randint(0,10)))
+            if allMatches:
+                # Rule matches without regard to the merge of spans
+                assert set(tagName for tagName,_,_ in engine.locate(line)) <= set(tagName for tagName,_,_ in oldLocate(rules,line))
+            else:
+                assert engine.locate(line) == oldLocate(rules,line), (rules, line)
+print("Equivalence with re.search: OK")
@@ -0,0 +1,114 @@
+#####################################
+# Pipeline topology benchmark
+# Time per line from the process queue to the GUI queue, with the real process and highlight workers,
+# for each pipeline topology (Pipeline_topology setting) and number of line color rules.
+# Max line rate is the rate a topology can sustain. The best topology for a port is the fastest one,
+# and any topology is fine when the line rate of the port is well below its max line rate.
+#
+# Run from repository root: python testing/PerformanceTesting/topologyBenchmark.py
+
+import os
+import sys
+import time
+import queue
+import tempfile
+
+sys.path.insert(0,os.path.join(os.path.dirname(os.path.abspath(__file__)),"..","..","colorterminal"))
+
+import settings as Sets
+import stageQueues
+import timeStamp
+from customTypes import SerialLine, PipelineTopology
+from workers import processWorker, highlightWorker
+
+numberOfLines = 20000
+linesPerChunk = 50 # Lines per reader chunk
+ruleCounts = [0, 10, 50, 150]
+
+topologies = {
+    Sets.TOPOLOGY_SPLIT:    PipelineTopology(fuseHighlight=False, highlightPool=False),
+    Sets.TOPOLOGY_FUSED:    PipelineTopology(fuseHighlight=True,  highlightPool=False),
+    Sets.TOPOLOGY_PROCESS:  PipelineTopology(fuseHighlight=False, highlightPool=True),
+}
+
+class TextFrameStub:
+    def __init__(self,lineColorMap):
+        self._lineColorMap = lineColorMap
+    def getLineColorMap(self):
+        return self._lineColorMap
+
+class MainViewStub:
+    def __init__(self,lineColorMap):
+        self.textFrame = TextFrameStub(lineColorMap)
+
+class LogWriterStub:
+    def __init__(self):
+        self.logQueue = queue.Queue()
+
+class GuiStub:
+    def __init__(self):
+        self.guiQueue = stageQueues.StageQueue()
+
+class WorkersStub:
+    pass
+
+def runTopology(settings,topology,lineColorMap,chunks):
+
+    workers = WorkersStub()
+    workers.topology = topology
+    workers.processWorker = processWorker.ProcessWorker(settings)
+    workers.highlightWorker = highlightWorker.HighlightWorker(settings,MainViewStub(lineColorMap))
+    workers.logWriterWorker = LogWriterStub()
+    workers.guiWorker = GuiStub()
+
+    workers.processWorker.linkWorkers(workers)
+    workers.highlightWorker.linkWorkers(workers)
+
+    workers.highlightWorker.startWorker()
+    workers.processWorker.startWorker()
+
+    # Wait for connect line (and pool start)
+    workers.guiWorker.guiQueue.get()
+    if topology.highlightPool:
+        workers.processWorker.processQueue.put(chunks[0])
+        workers.guiWorker.guiQueue.get()
+
+    start = time.perf_counter()
+    for chunk in chunks:
+        workers.processWorker.processQueue.put(chunk)
+
+    count = 0
+    while count < numberOfLines:
+        count += len(workers.guiWorker.guiQueue.get())
+    duration = time.perf_counter() - start
+
+    workers.processWorker.stopWorker()
+    workers.highlightWorker.stopWorker()
+    workers.highlightWorker.closePool()
+
+    return duration
+
+if __name__ == "__main__":
+
+    settings = Sets.Settings(os.path.join(tempfile.mkdtemp(),"CTsettings.json"))
+    settings.reload()
+    settings.setOption(Sets.HIGHLIGHT_POOL_MIN_RULES,0)
+
+    now = timeStamp.now()
+    lines = [SerialLine("Module%d::Function line %d warning\r\n" % (i % 300, i),now + i*1000) for i in range(numberOfLines)]
+    chunks = [lines[i:i+linesPerChunk] for i in range(0,numberOfLines,linesPerChunk)]
+
+    print("Lines: %d, cores: %d" % (numberOfLines, os.cpu_count()))
+
+    for ruleCount in ruleCounts:
+        lineColorMap = {Sets.LINE_COLOR_MAP + "%03d" % i: {"regex":"Module%d::.*(error|warning)" % i, "color":"red", "tagName":"tag%d" % i} \
+                            for i in range(ruleCount)}
+
+        results = dict()
+        for name, topology in topologies.items():
+            results[name] = runTopology(settings,topology,lineColorMap,chunks)
+
+        best = min(results,key=results.get)
+        print("Rules: %3d" % ruleCount)
+        for name, duration in results.items():
+            print("    %-8s %8.0f ns/line, max line rate %8.0f lines/s%s" % (name, duration/numberOfLines*1e9, numberOfLines/duration, " (best)" if name == best else ""))
@@ -0,0 +1,96 @@
+#####################################
+# Window trim benchmark
+# Lines per second added to a full text widget (max line buffer lines, with tags), when lines are added in frames:
+#   Per line: delete(1.0,2.0) for each line added (old GuiWorker)
+#   Per frame: one delete per frame, down to the max line buffer
+#   Trim lines: one delete when the max line buffer is passed, down to max minus trim lines (GuiWorker now)
+# Search results of deleted lines: del results[0] per result (old Search) against one slice delete (Search now).
+# The search results part is timed first. The text widget part needs a display (window is created, but not shown).
+# With "show", the text widget is shown and the redraw of the visible lines is timed too.
+#
+# Run from repository root: python testing/PerformanceTesting/trimBenchmark.py [show]
+
+import os
+import sys
+import time
+
+import tkinter as tk
+
+sys.path.insert(0,os.path.join(os.path.dirname(os.path.abspath(__file__)),"..","..","colorterminal"))
+
+import search
+
+maxLines = 4000
+trimLines = 1000
+frameLines = 50
+frameCount = 400
+show = "show" in sys.argv[1:]
+
+prefix = "[12:34:56.789] ( 0.001) "
+
+##############
+# Search results
+
+def deleteResultsPerItem(results,count):
+    for _ in range(count):
+        del results[0]
+
+def deleteResultsSlice(results,count):
+    del results[:count]
+
+resultCount = 20000
+for name, deleteResults in (("del results[0]", deleteResultsPerItem), ("del results[:n]", deleteResultsSlice)):
+    results = [search.Search.Result(line,0,5) for line in range(resultCount)]
+    start = time.perf_counter()
+    while results:
+        deleteResults(results,trimLines)
+    elapsed = time.perf_counter() - start
+    print("Search results %d, deleted %d at a time, %-16s %8.3f ms" % (resultCount, trimLines, name + ":", elapsed * 1000))
+
+##############
+# Text widget
+
+def addFrame(textArea,lineNumber,mode):
+    text = "".join([prefix + "Main::function line %d value %d\n" % (lineNumber + i, i) for i in range(frameLines)])
+    textArea.insert(tk.END,text)
+    # Tags on the frame, so a delete at the top has tag ranges to move
+    textArea.tag_add("LineColorMap_0","end-%dl linestart" % (frameLines + 1),"end-%dl lineend" % (frameLines + 1))
+
+    lines = int(textArea.index("end-2c").split(".")[0])
+    if mode == "per line":
+        for _ in range(max(lines - maxLines,0)):
+            textArea.delete(1.0,2.0)
+    elif mode == "per frame":
+        if lines > maxLines:
+            textArea.delete(1.0,"%d.0" % (lines - maxLines + 1))
+    else:
+        if lines > maxLines:
+            textArea.delete(1.0,"%d.0" % (lines - maxLines + trimLines + 1))
+    textArea.see(tk.END)
+
+root = tk.Tk()
+if not show:
+    root.withdraw()
+
+for mode in ("per line", "per frame", "trim lines"):
+    textArea = tk.Text(root)
+    if show:
+        textArea.pack()
+    textArea.tag_configure("LineColorMap_0",background="yellow")
+
+    # Full buffer
+    textArea.insert(tk.END,"".join([prefix + "Main::function line %d\n" % i for i in range(maxLines)]))
+    for line in range(1,maxLines,10):
+        textArea.tag_add("LineColorMap_0","%d.0" % line,"%d.0+1l" % line)
+    root.update()
+
+    start = time.perf_counter()
+    for frame in range(frameCount):
+        addFrame(textArea,frame * frameLines,mode)
+        root.update()
+    elapsed = time.perf_counter() - start
+
+    print("Buffer %d lines, frames of %d lines, trim %-10s %9.0f lines/s" % (maxLines, frameLines, mode + ":", frameLines * frameCount / elapsed))
+    textArea.destroy()
+
+root.destroy()